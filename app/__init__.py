@@ -1,17 +1,55 @@
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 import os
 from dotenv import load_dotenv
 
+# Before the imports below: prometheus_client reads PROMETHEUS_MULTIPROC_DIR
+# when it is imported
 load_dotenv()
 
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from app.cache import ResponseCache
+from app.demand import DemandRecorder
+from app.metrics import Metrics
+
 db = SQLAlchemy()
 limiter = Limiter(
     key_func=get_remote_address,
     default_limits=["200 per day", "50 per hour"]
 )
+cache = ResponseCache()
+demand = DemandRecorder()
+metrics = Metrics()
+
+def engine_options(database_uri):
+    """SQLAlchemy connection pool settings from the environment.
+
+    DB_MAX_CONNECTIONS caps the connections of every web worker combined:
+    each of the GUNICORN_WORKERS processes gets an equal share, split
+    between its pool and its overflow.
+    """
+    options = {
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true',
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+    if database_uri.startswith('sqlite'):
+        return options
+    
+    pool_size = int(os.getenv('DB_POOL_SIZE', 5))
+    max_overflow = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    max_connections = os.getenv('DB_MAX_CONNECTIONS')
+    if max_connections:
+        per_worker = max(1, int(max_connections) // int(os.getenv('GUNICORN_WORKERS', 1)))
+        pool_size = min(pool_size, per_worker)
+        max_overflow = min(max_overflow, per_worker - pool_size)
+    
+    options.update({
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', 30)),
+    })
+    return options
 
 def create_app():
     app = Flask(__name__)
@@ -19,12 +57,27 @@ def create_app():
     # Configuration
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///grocery_prices.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-key-change-in-production')
     app.config['REDIS_URL'] = os.getenv('REDIS_URL', 'redis://localhost:6379/0')
+    app.config['RATELIMIT_ENABLED'] = os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true'
+    app.config['CACHE_ENABLED'] = os.getenv('CACHE_ENABLED', 'true').lower() == 'true'
+    app.config['CACHE_DEFAULT_TTL'] = int(os.getenv('CACHE_DEFAULT_TTL', 300))
+    app.config['HTTP_CACHE_MAX_AGE'] = int(os.getenv('HTTP_CACHE_MAX_AGE', 300))
+    app.config['DEMAND_TRACKING_ENABLED'] = os.getenv('DEMAND_TRACKING_ENABLED', 'true').lower() == 'true'
+    app.config['DEMAND_FLUSH_SECONDS'] = int(os.getenv('DEMAND_FLUSH_SECONDS', 30))
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    app.config['SERVER_TIMING'] = os.getenv('SERVER_TIMING', 'false').lower() == 'true'
     
     # Initialize extensions
     db.init_app(app)
     limiter.init_app(app)
+    cache.init_app(app)
+    demand.init_app(app)
+    metrics.init_app(app)
+    if app.config['METRICS_ENABLED']:
+        # Prometheus scrapes more often than the default limits allow
+        limiter.exempt(metrics.metrics_view)
     
     # Register blueprints
     from app.api import api_bp
@@ -1,7 +1,12 @@
 from flask import jsonify, request
 from app.api import api_bp
-from app.models import Product, Store
+from app.models import Product, Store, PriceSummary, ScrapeCycle
+from app.api.pagination import keyset_page, ndjson_response
+from app.cache import cached_response, conditional_response
+from app.timeseries import RESOLUTIONS, get_price_history as get_product_history
+from app.basket import optimize_basket, parse_basket
 from app import limiter, db
+from datetime import datetime, timedelta
 import logging
 
 logger = logging.getLogger(__name__)
@@ -26,20 +31,33 @@ def get_categories():
 @api_bp.route('/products/category/<category>')
 @limiter.limit("20 per minute")
 def get_products_by_category(category):
-    """Get all products in a specific category"""
+    """Get all products in a specific category, cheapest first.
+    
+    Pass the returned next_cursor as ?cursor= for the next page, or
+    ?format=ndjson to stream the whole category. ?sort=value ranks by
+    price per kg, litre or item instead, grouped by that unit.
+    """
     limit = min(int(request.args.get('limit', 100)), 500)
+    query = Product.query.filter(
+        Product.category == category,
+        Product.is_active == True
+    )
+    sort = request.args.get('sort', 'price')
     
     try:
-        products = Product.query.filter(
-            Product.category == category,
-            Product.is_active == True
-        ).order_by(Product.price.asc()).limit(limit).all()
+        if request.args.get('format') == 'ndjson':
+            return ndjson_response(query, sort)
+        
+        products, next_cursor = keyset_page(query, request.args.get('cursor'), limit, sort)
         
         return jsonify({
             'category': category,
-            'products': [product.to_dict() for product in products],
-            'count': len(products)
+            'products': products,
+            'count': len(products),
+            'next_cursor': next_cursor
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error fetching products for category {category}: {e}")
         return jsonify({'error': 'Failed to fetch products'}), 500
@@ -47,20 +65,28 @@ def get_products_by_category(category):
 @api_bp.route('/products/brand/<brand>')
 @limiter.limit("20 per minute")
 def get_products_by_brand(brand):
-    """Get all products from a specific brand"""
+    """Get all products from a specific brand, cheapest first (paged like categories)"""
     limit = min(int(request.args.get('limit', 100)), 500)
+    query = Product.query.filter(
+        Product.brand.ilike(f'%{brand}%'),
+        Product.is_active == True
+    )
+    sort = request.args.get('sort', 'price')
     
     try:
-        products = Product.query.filter(
-            Product.brand.ilike(f'%{brand}%'),
-            Product.is_active == True
-        ).order_by(Product.price.asc()).limit(limit).all()
+        if request.args.get('format') == 'ndjson':
+            return ndjson_response(query, sort)
+        
+        products, next_cursor = keyset_page(query, request.args.get('cursor'), limit, sort)
         
         return jsonify({
             'brand': brand,
-            'products': [product.to_dict() for product in products],
-            'count': len(products)
+            'products': products,
+            'count': len(products),
+            'next_cursor': next_cursor
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error fetching products for brand {brand}: {e}")
         return jsonify({'error': 'Failed to fetch products'}), 500
@@ -68,61 +94,124 @@ def get_products_by_brand(brand):
 @api_bp.route('/products/promotions')
 @limiter.limit("10 per minute")
 def get_promotional_products():
-    """Get all products currently on promotion"""
+    """Get all products currently on promotion, cheapest first (paged like categories)"""
     limit = min(int(request.args.get('limit', 50)), 200)
+    query = Product.query.filter(
+        Product.promotion.isnot(None),
+        Product.is_active == True
+    )
+    sort = request.args.get('sort', 'price')
     
     try:
-        products = Product.query.filter(
-            Product.promotion.isnot(None),
-            Product.is_active == True
-        ).order_by(Product.price.asc()).limit(limit).all()
+        if request.args.get('format') == 'ndjson':
+            return ndjson_response(query, sort)
+        
+        products, next_cursor = keyset_page(query, request.args.get('cursor'), limit, sort)
         
         return jsonify({
-            'promotions': [product.to_dict() for product in products],
-            'count': len(products)
+            'promotions': products,
+            'count': len(products),
+            'next_cursor': next_cursor
         })
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Error fetching promotional products: {e}")
         return jsonify({'error': 'Failed to fetch promotions'}), 500
 
 @api_bp.route('/stats')
 @limiter.limit("5 per minute")
+@conditional_response
+@cached_response(ttl=3600)
 def get_database_stats():
     """Get comprehensive database statistics"""
     try:
-        total_products = Product.query.filter_by(is_active=True).count()
+        totals = PriceSummary.get('all')
         total_stores = Store.query.filter_by(is_active=True).count()
         
         # Categories stats
-        categories = db.session.query(
-            Product.category, 
-            db.func.count(Product.id),
-            db.func.min(Product.price),
-            db.func.max(Product.price),
-            db.func.avg(Product.price)
-        ).filter(
-            Product.is_active == True,
-            Product.category.isnot(None)
-        ).group_by(Product.category).all()
-        
         category_stats = []
-        for cat, count, min_price, max_price, avg_price in categories:
+        for summary in PriceSummary.for_scope('category'):
+            stats = summary.to_dict()
             category_stats.append({
-                'category': cat,
-                'product_count': count,
-                'price_range': {
-                    'min': float(min_price) if min_price else 0,
-                    'max': float(max_price) if max_price else 0,
-                    'avg': round(float(avg_price), 2) if avg_price else 0
-                }
+                'category': summary.key,
+                'product_count': stats['product_count'],
+                'price_range': stats['price_range']
             })
         
         return jsonify({
-            'total_products': total_products,
+            'total_products': totals.product_count if totals else 0,
             'total_stores': total_stores,
             'categories': category_stats,
-            'last_updated': Product.query.filter_by(is_active=True).order_by(Product.last_updated.desc()).first().last_updated.isoformat() if total_products > 0 else None
+            'last_updated': totals.last_updated.isoformat() if totals and totals.last_updated else None
         })
     except Exception as e:
         logger.error(f"Error fetching stats: {e}")
-        return jsonify({'error': 'Failed to fetch statistics'}), 500
\ No newline at end of file
+        return jsonify({'error': 'Failed to fetch statistics'}), 500
+
+@api_bp.route('/products/<int:product_id>/history')
+@limiter.limit("30 per minute")
+def get_price_history(product_id):
+    """Get a product's price history at the cheapest stored resolution"""
+    resolution = request.args.get('resolution', 'auto')
+    if resolution not in ('auto',) + RESOLUTIONS:
+        return jsonify({'error': f'resolution must be one of auto, {", ".join(RESOLUTIONS)}'}), 400
+    
+    try:
+        until = datetime.fromisoformat(request.args['until']) if 'until' in request.args else datetime.utcnow()
+        if 'since' in request.args:
+            since = datetime.fromisoformat(request.args['since'])
+        else:
+            since = until - timedelta(days=min(int(request.args.get('days', 30)), 3650))
+    except ValueError:
+        return jsonify({'error': 'since/until must be ISO dates and days an integer'}), 400
+    
+    try:
+        product = db.session.get(Product, product_id)
+        if product is None:
+            return jsonify({'error': 'Product not found'}), 404
+        
+        points = get_product_history(product_id, since, until, resolution)
+        return jsonify({
+            'product_id': product_id,
+            'since': since.isoformat(),
+            'until': until.isoformat(),
+            'resolution': resolution,
+            'history': points,
+            'count': len(points)
+        })
+    except Exception as e:
+        logger.error(f"Error fetching price history for product {product_id}: {e}")
+        return jsonify({'error': 'Failed to fetch price history'}), 500
+
+@api_bp.route('/scrape/progress')
+@limiter.limit("30 per minute")
+def get_scrape_progress():
+    """Progress of the latest (or ?cycle_id=) scrape cycle with per-store throughput"""
+    try:
+        cycle_id = request.args.get('cycle_id', type=int)
+        cycle = db.session.get(ScrapeCycle, cycle_id) if cycle_id else ScrapeCycle.latest()
+        if cycle is None:
+            return jsonify({'error': 'No scrape cycle found'}), 404
+        return jsonify(cycle.progress())
+    except Exception as e:
+        logger.error(f"Error fetching scrape progress: {e}")
+        return jsonify({'error': 'Failed to fetch scrape progress'}), 500
+
+@api_bp.route('/basket', methods=['POST'])
+@limiter.limit("20 per minute")
+def get_basket_prices():
+    """Cheapest single store and cheapest split over at most max_stores for a basket.
+    
+    Body: {"items": [{"term": "milk", "quantity": 2}, {"canonical_id": 12}], "max_stores": 2}
+    """
+    try:
+        items, max_stores = parse_basket(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        return jsonify(optimize_basket(items, max_stores))
+    except Exception as e:
+        logger.error(f"Error optimizing basket of {len(items)} items: {e}")
+        return jsonify({'error': 'Failed to price basket'}), 500
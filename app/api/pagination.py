@@ -0,0 +1,90 @@
+from flask import Response, stream_with_context
+from app.models import Product
+from app.serializers import product_columns, product_rows, serialize_product
+from sqlalchemy import and_, or_
+import base64
+import json
+
+STREAM_BATCH_SIZE = 1000
+
+# ?sort= orders and the columns each one seeks on, with their cursor types.
+# 'value' ranks by price per kg, litre or item and leaves out products whose
+# size could not be parsed; products are grouped by base unit first, since
+# a price per kg and a price per litre do not compare.
+SORTS = {
+    'price': ((Product.price, float), (Product.id, int)),
+    'value': ((Product.base_unit, str), (Product.price_per_unit, float), (Product.id, int)),
+}
+
+
+def sort_columns(sort):
+    if sort not in SORTS:
+        raise ValueError(f"Invalid sort '{sort}', expected one of: {', '.join(SORTS)}")
+    return SORTS[sort]
+
+
+def sorted_query(query, sort='price'):
+    """Order a Product query by a SORTS key"""
+    columns = sort_columns(sort)
+    if sort == 'value':
+        query = query.filter(Product.price_per_unit.isnot(None))
+    return query.order_by(*(column.asc() for column, _ in columns))
+
+
+def encode_cursor(*values):
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort='price'):
+    """Decode a cursor into its sort values, raising ValueError if it is malformed"""
+    columns = sort_columns(sort)
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if len(values) != len(columns):
+            raise ValueError
+        return tuple(cast(value) for (_, cast), value in zip(columns, values))
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+
+def keyset_page(query, cursor=None, limit=100, sort='price'):
+    """One page of a Product query in sort order, plus the next page's cursor.
+
+    Each page seeks past the previous page's last sort values, e.g.
+    (price, id), instead of using OFFSET, so deep pages cost the same as
+    the first one.
+    """
+    columns = [column for column, _ in sort_columns(sort)]
+    query = sorted_query(query, sort)
+    if cursor:
+        values = decode_cursor(cursor, sort)
+        # (a, b, c) > (x, y, z) spelled out, which every backend can index
+        query = query.filter(or_(*(
+            and_(*(column == value for column, value in zip(columns[:depth], values)),
+                 columns[depth] > values[depth])
+            for depth in range(len(columns))
+        )))
+
+    rows = product_rows(query, limit + 1)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(*(getattr(rows[-1], column.key) for column in columns))
+    return [serialize_product(row) for row in rows], next_cursor
+
+
+def ndjson_response(query, sort='price'):
+    """Stream every row of a Product query as newline-delimited JSON.
+
+    Rows are fetched STREAM_BATCH_SIZE at a time from a server-side cursor,
+    so memory per request stays flat however many products match.
+    """
+    rows = product_columns(sorted_query(query, sort)).yield_per(STREAM_BATCH_SIZE)
+
+    def generate():
+        for row in rows:
+            yield json.dumps(serialize_product(row)) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
@@ -1,15 +1,24 @@
 from flask import jsonify, request
 from app.api import api_bp
-from app.models import Product, Store
+from app.models import Product, Store, CanonicalProduct
+from app.serializers import serialize_products, value_sort_key
+from app.cache import cached_response, conditional_response
+from app.demand import records_demand, split_terms
 from app import limiter
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Terms one /api/prices/batch request may resolve
+MAX_BATCH_TERMS = 20
+
 @api_bp.route('/prices')
 @limiter.limit("30 per minute")
+@records_demand('product')
+@conditional_response
+@cached_response(ttl=3600)
 def get_prices():
-    """Get product prices with optional search query"""
+    """Get product prices with optional search query; ?sort=value ranks by unit price"""
     query = request.args.get('product', '').strip()
     limit = min(int(request.args.get('limit', 50)), 100)
     
@@ -17,8 +26,9 @@ def get_prices():
         return jsonify({'error': 'Product query required'}), 400
     
     try:
-        products = Product.search_products(query, limit=limit)
-        results = [product.to_dict() for product in products]
+        results = serialize_products(Product.search_query(query), limit=limit)
+        if request.args.get('sort') == 'value':
+            results.sort(key=value_sort_key)
         
         return jsonify({
             'products': results,
@@ -29,8 +39,69 @@ def get_prices():
         logger.error(f"Error searching products: {e}")
         return jsonify({'error': 'Search failed'}), 500
 
+@api_bp.route('/prices/batch')
+@limiter.limit("30 per minute")
+@records_demand('terms', many=True)
+@conditional_response
+@cached_response(ttl=3600)
+def get_prices_batch():
+    """The top product at every store for each of several searches, in one query.
+    
+    ?terms=milk,bread,eggs (or repeated ?terms=); each term's products come
+    cheapest store first.
+    """
+    terms = split_terms(request.args.getlist('terms'))
+    
+    if not terms:
+        return jsonify({'error': 'At least one term required'}), 400
+    if len(terms) > MAX_BATCH_TERMS:
+        return jsonify({'error': f'At most {MAX_BATCH_TERMS} terms per request'}), 400
+    
+    try:
+        results = [{
+            'query': term,
+            'products': products,
+            'count': len(products),
+            'cheapest_store': products[0]['store'] if products else None
+        } for term, products in zip(terms, Product.cheapest_by_store(terms))]
+        
+        return jsonify({
+            'results': results,
+            'count': len(results)
+        })
+    except Exception as e:
+        logger.error(f"Error batch searching {len(terms)} terms: {e}")
+        return jsonify({'error': 'Batch search failed'}), 500
+
+@api_bp.route('/compare')
+@limiter.limit("30 per minute")
+@records_demand('q')
+@conditional_response
+@cached_response(ttl=3600)
+def compare_products():
+    """One row per matching canonical product with every store's price"""
+    query = request.args.get('q', '').strip()
+    limit = min(int(request.args.get('limit', 20)), 50)
+    
+    if not query:
+        return jsonify({'error': 'Search query required'}), 400
+    
+    try:
+        results = CanonicalProduct.compare(query, limit=limit)
+        
+        return jsonify({
+            'products': results,
+            'count': len(results),
+            'query': query
+        })
+    except Exception as e:
+        logger.error(f"Error comparing products: {e}")
+        return jsonify({'error': 'Comparison failed'}), 500
+
 @api_bp.route('/stores')
 @limiter.limit("10 per minute")
+@conditional_response
+@cached_response(ttl=3600)
 def get_stores():
     """Get list of active stores"""
     try:
@@ -44,14 +115,16 @@ def get_stores():
 
 @api_bp.route('/trending')
 @limiter.limit("10 per minute")
+@conditional_response
+@cached_response(ttl=600)
 def get_trending():
     """Get trending/recently updated products"""
     limit = min(int(request.args.get('limit', 10)), 20)
     
     try:
-        products = Product.get_trending(limit=limit)
+        products = serialize_products(Product.trending_query(), limit=limit)
         return jsonify({
-            'products': [product.to_dict() for product in products],
+            'products': products,
             'count': len(products)
         })
     except Exception as e:
@@ -0,0 +1,91 @@
+"""Move long-dead products and their price history out of the hot tables.
+
+Ingestion deactivates products a store stops returning, but keeps the
+rows so a product that comes back keeps its id and history. Once a
+product has been inactive and unscraped for ARCHIVE_AFTER_DAYS it is
+copied to archived_products, its raw history and rollup buckets to
+archived_price_history, and the originals are deleted - in chunks, each
+chunk one transaction of INSERT ... SELECT and DELETE statements.
+"""
+from app import db
+from app.models import (Product, PriceHistory, PriceHistoryRollup, CanonicalProduct, ArchivedProduct,
+                        ArchivedPriceHistory)
+from sqlalchemy import delete, func, insert, literal, select, update
+from datetime import datetime, timedelta
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER_DAYS = int(os.getenv('PRODUCT_ARCHIVE_AFTER_DAYS', 90))
+# Products per transaction, under SQLite's bound parameter limit
+BATCH_SIZE = 500
+
+ARCHIVED_COLUMNS = ('id', 'name', 'brand', 'category', 'store_id', 'price', 'unit', 'quantity', 'base_unit',
+                    'price_per_unit', 'store_url', 'search_term', 'canonical_id', 'last_updated')
+
+
+def archive_dead_products(now=None, batch_size=BATCH_SIZE):
+    """Archive inactive products last updated before the cutoff; returns how many"""
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=ARCHIVE_AFTER_DAYS)
+
+    archived = 0
+    while True:
+        ids = db.session.scalars(
+            select(Product.id).where(Product.is_active == False, Product.last_updated < cutoff)
+            .order_by(Product.id).limit(batch_size)
+        ).all()
+        if not ids:
+            break
+        try:
+            _archive_batch(ids, now)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error archiving {len(ids)} products from id {ids[0]}: {e}")
+            db.session.rollback()
+            raise
+        archived += len(ids)
+
+    logger.info(f"Archived {archived} products inactive since before {cutoff:%Y-%m-%d}")
+    return archived
+
+
+def _archive_batch(ids, now):
+    products = Product.__table__
+    history = PriceHistory.__table__
+    rollups = PriceHistoryRollup.__table__
+    archive = ArchivedPriceHistory.__table__
+    connection = db.session.connection()
+
+    connection.execute(insert(ArchivedProduct.__table__).from_select(
+        ARCHIVED_COLUMNS + ('archived_at',),
+        select(*[products.c[name] for name in ARCHIVED_COLUMNS], literal(now)).where(products.c.id.in_(ids))
+    ))
+    connection.execute(insert(archive).from_select(
+        ('product_id', 'resolution', 'recorded_at', 'price'),
+        select(history.c.product_id, literal('raw'), history.c.recorded_at, history.c.price)
+        .where(history.c.product_id.in_(ids))
+    ))
+    connection.execute(insert(archive).from_select(
+        ('product_id', 'resolution', 'recorded_at', 'price', 'min_price', 'max_price'),
+        select(rollups.c.product_id, rollups.c.resolution, rollups.c.bucket_start, rollups.c.close_price,
+               rollups.c.min_price, rollups.c.max_price).where(rollups.c.product_id.in_(ids))
+    ))
+
+    # Canonical products stop counting the products leaving them
+    canonical = CanonicalProduct.__table__
+    counts = connection.execute(
+        select(products.c.canonical_id, func.count()).where(products.c.id.in_(ids), products.c.canonical_id.isnot(None))
+        .group_by(products.c.canonical_id)
+    ).all()
+    if counts:
+        connection.execute(
+            update(canonical).where(canonical.c.id == db.bindparam('canonical'))
+            .values(product_count=canonical.c.product_count - db.bindparam('removed')),
+            [{'canonical': canonical_id, 'removed': removed} for canonical_id, removed in counts]
+        )
+
+    connection.execute(delete(history).where(history.c.product_id.in_(ids)))
+    connection.execute(delete(rollups).where(rollups.c.product_id.in_(ids)))
+    connection.execute(delete(products).where(products.c.id.in_(ids)))
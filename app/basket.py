@@ -0,0 +1,274 @@
+"""Shopping basket optimisation: where to buy a list of items.
+
+A basket item is either a search term the scheduler scrapes ('milk') or a
+canonical product id from /api/compare. The cheapest product for every item
+at every store is read in one statement (a row_number() window per item
+and store). A term matches packs of every size, so its products are
+ranked by price per unit within the unit most of them are sold by, and
+costed at the term's usual pack size; a canonical product is one size
+and is ranked by price. The costs form an items x stores matrix, from
+which each store's basket total and the cheapest split over at most k
+stores are computed as array operations.
+"""
+from itertools import combinations
+import logging
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional, the optimiser falls back to pure Python
+    np = None
+
+logger = logging.getLogger(__name__)
+
+MAX_ITEMS = 100
+MAX_QUANTITY = 99
+DEFAULT_SPLIT_STORES = 2
+# Store subsets grow combinatorially with the split size
+MAX_SPLIT_STORES = 5
+
+
+def parse_basket(payload):
+    """Validate a basket request body into ([(kind, key, quantity)], k).
+
+    Raises ValueError with a message for the client.
+    """
+    from app.demand import normalize_term
+
+    if not isinstance(payload, dict) or not isinstance(payload.get('items'), list):
+        raise ValueError("Body must be a JSON object with an 'items' list")
+    if not payload['items'] or len(payload['items']) > MAX_ITEMS:
+        raise ValueError(f'A basket holds 1 to {MAX_ITEMS} items')
+
+    items = {}
+    for entry in payload['items']:
+        if isinstance(entry, str):
+            entry = {'term': entry}
+        if not isinstance(entry, dict):
+            raise ValueError('Each item must be a term or an object')
+        quantity = entry.get('quantity', 1)
+        if not isinstance(quantity, (int, float)) or isinstance(quantity, bool) or not 0 < quantity <= MAX_QUANTITY:
+            raise ValueError(f'Quantities must be numbers above 0 and at most {MAX_QUANTITY}')
+        if entry.get('canonical_id') is not None:
+            try:
+                key = ('canonical', int(entry['canonical_id']))
+            except (TypeError, ValueError):
+                raise ValueError('canonical_id must be an integer')
+        else:
+            term = normalize_term(str(entry.get('term') or ''))
+            if not term:
+                raise ValueError("Each item needs a 'term' or a 'canonical_id'")
+            key = ('term', term)
+        # Repeated items add up
+        items[key] = items.get(key, 0) + quantity
+
+    k = payload.get('max_stores', DEFAULT_SPLIT_STORES)
+    if not isinstance(k, int) or isinstance(k, bool) or not 1 <= k <= MAX_SPLIT_STORES:
+        raise ValueError(f'max_stores must be an integer from 1 to {MAX_SPLIT_STORES}')
+    return [(kind, key, quantity) for (kind, key), quantity in items.items()], k
+
+
+def reference_sizes(terms):
+    """{term: (base_unit, quantity)}: the unit most of a term's products are sold in, and its commonest pack"""
+    from app import db
+    from app.models import Product
+    from collections import Counter
+    from sqlalchemy import select
+
+    rows = db.session.execute(
+        select(Product.search_term, Product.base_unit, Product.quantity, db.func.count(Product.id))
+        .where(Product.search_term.in_(terms), Product.is_active == True,
+               Product.base_unit.isnot(None), Product.quantity > 0)
+        .group_by(Product.search_term, Product.base_unit, Product.quantity)
+    )
+    units, packs = {}, {}
+    for term, base_unit, quantity, count in rows:
+        units.setdefault(term, Counter())[base_unit] += count
+        packs.setdefault((term, base_unit), Counter())[quantity] += count
+
+    sizes = {}
+    for term, counts in units.items():
+        # Ties go to the alphabetically first unit and the smaller pack
+        base_unit = min(counts, key=lambda unit: (-counts[unit], unit))
+        pack_counts = packs[(term, base_unit)]
+        sizes[term] = (base_unit, min(pack_counts, key=lambda quantity: (-pack_counts[quantity], quantity)))
+    return sizes
+
+
+def cheapest_products(items, sizes=None):
+    """{(kind, key): {store name: (product_id, name, price, cost)}} in one query.
+
+    `cost` is what the item costs at that store: the price of a canonical
+    product, or a term's price per unit times its reference pack size from
+    `sizes` (reference_sizes, looked up when not given).
+    """
+    from app import db
+    from app.models import Product, Store
+    from sqlalchemy import String, cast, literal, select, tuple_, union_all
+
+    terms = [key for kind, key, _ in items if kind == 'term']
+    canonical_ids = [key for kind, key, _ in items if kind == 'canonical']
+    if sizes is None:
+        sizes = reference_sizes(terms) if terms else {}
+
+    def ranked(kind, key, condition, order_by):
+        rank = db.func.row_number().over(partition_by=(key, Product.store_id), order_by=order_by)
+        return select(
+            literal(kind).label('kind'), cast(key, String).label('item_key'), Store.name.label('store'),
+            Product.id, Product.name, Product.price, Product.price_per_unit, rank.label('rank')
+        ).join(Store, Store.id == Product.store_id).where(condition, Product.is_active == True)
+
+    parts = []
+    if sizes:
+        measured = tuple_(Product.search_term, Product.base_unit).in_(
+            [(term, base_unit) for term, (base_unit, _) in sizes.items()]
+        )
+        parts.append(ranked('term', Product.search_term, measured,
+                            (Product.price_per_unit, Product.price, Product.id)))
+    unmeasured = [term for term in terms if term not in sizes]
+    if unmeasured:
+        parts.append(ranked('term', Product.search_term, Product.search_term.in_(unmeasured),
+                            (Product.price, Product.id)))
+    if canonical_ids:
+        parts.append(ranked('canonical', Product.canonical_id, Product.canonical_id.in_(canonical_ids),
+                            (Product.price, Product.id)))
+    candidates = (parts[0] if len(parts) == 1 else union_all(*parts)).subquery()
+
+    offers = {}
+    for row in db.session.execute(select(candidates).where(candidates.c.rank == 1)):
+        key = int(row.item_key) if row.kind == 'canonical' else row.item_key
+        cost = row.price
+        if row.kind == 'term' and key in sizes:
+            cost = row.price_per_unit * sizes[key][1]
+        offers.setdefault((row.kind, key), {})[row.store] = (row.id, row.name, row.price, cost)
+    return offers
+
+
+def store_totals(costs, quantities):
+    """Per-store basket total and number of items the store lacks"""
+    if np is None:
+        totals, missing = [], []
+        for store in range(len(costs[0]) if costs else 0):
+            prices = [row[store] for row in costs]
+            missing.append(sum(1 for price in prices if price is None))
+            totals.append(sum(price * quantity for price, quantity in zip(prices, quantities) if price is not None))
+        return totals, missing
+
+    available = np.isfinite(costs)
+    totals = np.where(available, costs, 0.0).T @ quantities
+    return totals.tolist(), (~available).sum(axis=0).tolist()
+
+
+def best_split(costs, quantities, max_stores):
+    """Cheapest way to buy the basket from at most `max_stores` stores.
+
+    Every store subset up to that size is scored at once: a (subsets x
+    stores) mask broadcast against the cost matrix gives each item's
+    cheapest price within each subset. Subsets covering more items win,
+    then the cheaper total. Returns (store indexes, per-item store index or
+    -1, total, items missing).
+    """
+    store_count = len(costs[0]) if len(costs) else 0
+    subsets = [subset for size in range(1, min(max_stores, store_count) + 1)
+               for subset in combinations(range(store_count), size)]
+    if not subsets:
+        return (), [-1] * len(costs), 0.0, len(costs)
+
+    if np is None:
+        best = None
+        for subset in subsets:
+            picks, total, missing = [], 0.0, 0
+            for row, quantity in zip(costs, quantities):
+                offers = [(row[store], store) for store in subset if row[store] is not None]
+                if offers:
+                    price, store = min(offers)
+                    picks.append(store)
+                    total += price * quantity
+                else:
+                    picks.append(-1)
+                    missing += 1
+            if best is None or (missing, total) < (best[3], best[2]):
+                best = (subset, picks, total, missing)
+        return best
+
+    mask = np.zeros((len(subsets), store_count), dtype=bool)
+    for index, subset in enumerate(subsets):
+        mask[index, list(subset)] = True
+    # (subsets, items, stores): prices outside the subset become inf
+    within = np.where(mask[:, None, :], costs[None, :, :], np.inf)
+    picks = within.argmin(axis=2)
+    cheapest = np.take_along_axis(within, picks[:, :, None], axis=2)[:, :, 0]
+    covered = np.isfinite(cheapest)
+    missing = (~covered).sum(axis=1)
+    totals = np.where(covered, cheapest, 0.0) @ quantities
+    # Fewest missing items first, then lowest total, then fewest stores
+    best = np.lexsort((mask.sum(axis=1), totals, missing))[0]
+    return (subsets[best], np.where(covered[best], picks[best], -1).tolist(),
+            float(totals[best]), int(missing[best]))
+
+
+def optimize_basket(items, max_stores=DEFAULT_SPLIT_STORES):
+    """The cheapest single store and the cheapest split for a parsed basket"""
+    from app.models import Store
+
+    terms = [key for kind, key, _ in items if kind == 'term']
+    sizes = reference_sizes(terms) if terms else {}
+    offers = cheapest_products(items, sizes)
+    stores = sorted(store.name for store in Store.get_active_stores())
+    labels = [f'canonical:{key}' if kind == 'canonical' else key for kind, key, _ in items]
+
+    if np is None:
+        costs = [[offers.get((kind, key), {}).get(store, (None, None, None, None))[3] for store in stores]
+                 for kind, key, _ in items]
+        quantities = [quantity for _, _, quantity in items]
+    else:
+        costs = np.full((len(items), len(stores)), np.inf)
+        for row, (kind, key, _) in enumerate(items):
+            for column, store in enumerate(stores):
+                offer = offers.get((kind, key), {}).get(store)
+                if offer is not None:
+                    costs[row, column] = offer[3]
+        quantities = np.array([quantity for _, _, quantity in items], dtype=float)
+
+    totals, missing = store_totals(costs, quantities)
+    ranking = sorted(range(len(stores)), key=lambda store: (missing[store], totals[store]))
+    by_store = [{
+        'store': stores[store],
+        'total': round(totals[store], 2),
+        'missing': [labels[row] for row, (kind, key, _) in enumerate(items)
+                    if stores[store] not in offers.get((kind, key), {})]
+    } for store in ranking]
+
+    subset, picks, split_total, split_missing = best_split(costs, quantities, max_stores)
+    assignments = []
+    for row, ((kind, key, quantity), store) in enumerate(zip(items, picks)):
+        if store < 0:
+            assignments.append({'item': labels[row], 'quantity': quantity, 'store': None})
+            continue
+        product_id, name, price, cost = offers[(kind, key)][stores[store]]
+        assignment = {
+            'item': labels[row], 'quantity': quantity, 'store': stores[store],
+            'product_id': product_id, 'product': name, 'price': price,
+            'line_total': round(cost * quantity, 2)
+        }
+        if kind == 'term' and key in sizes:
+            # Costed per unit: the line total is for `quantity` reference packs
+            base_unit, pack = sizes[key]
+            assignment.update({'cost': round(cost, 2), 'base_unit': base_unit, 'pack_quantity': pack})
+        assignments.append(assignment)
+
+    single = by_store[0] if by_store else None
+    return {
+        'items': len(items),
+        'single_store': single,
+        'stores': by_store,
+        'split': {
+            'stores': [stores[store] for store in subset],
+            'total': round(split_total, 2),
+            # Only comparable when both leave out the same number of items
+            'savings': (round(single['total'] - split_total, 2)
+                        if single and len(single['missing']) == split_missing else None),
+            'assignments': assignments,
+            'missing': [entry['item'] for entry in assignments if entry['store'] is None]
+        },
+        'max_stores': max_stores
+    }
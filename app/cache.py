@@ -0,0 +1,253 @@
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, current_app, json, request
+from datetime import timezone
+from app.metrics import RESPONSE_CACHE
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'comparaid:'
+GENERATION_KEY = KEY_PREFIX + 'cache:generation'
+
+
+class LRUCache:
+    """Small thread-safe in-process cache with per-entry expiry"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def incr(self, key):
+        with self._lock:
+            value = (self._data.get(key, (0, None))[0] or 0) + 1
+            self._data[key] = (value, None)
+            return value
+
+
+class ResponseCache:
+    """Cache for JSON API responses, in Redis when reachable.
+
+    Keys include a data generation number which PriceUpdateScheduler bumps
+    after every store/term refresh, so cached responses are dropped as soon
+    as the data they were built from changes. When Redis is unreachable the
+    cache falls back to an in-process LRU and retries Redis periodically.
+    """
+
+    RETRY_SECONDS = 30
+
+    def __init__(self, app=None):
+        self.local = LRUCache()
+        self.hits = 0
+        self.misses = 0
+        self._redis = None
+        self._redis_url = None
+        self._redis_down_until = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_ENABLED', True)
+        app.config.setdefault('CACHE_DEFAULT_TTL', 300)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('HTTP_CACHE_MAX_AGE', 300)
+        self.local.max_entries = app.config['CACHE_MAX_ENTRIES']
+        self._redis_url = app.config.get('REDIS_URL')
+        app.extensions['response_cache'] = self
+
+    def set_client(self, client):
+        """Use an existing Redis client (or None for the in-process cache only)"""
+        self._redis = client
+        self._redis_url = None
+        self._redis_down_until = 0.0
+
+    @property
+    def backend(self):
+        return 'redis' if self._client() is not None else 'local'
+
+    def _client(self):
+        if self._redis_down_until > time.monotonic():
+            return None
+        if self._redis is None and self._redis_url:
+            try:
+                import redis
+                client = redis.Redis.from_url(self._redis_url, socket_timeout=0.25,
+                                              socket_connect_timeout=0.25)
+                client.ping()
+                self._redis = client
+            except Exception as e:
+                self._mark_down(e)
+        return self._redis
+
+    def _mark_down(self, error):
+        logger.warning(f"Redis cache unavailable, using in-process cache: {error}")
+        self._redis_down_until = time.monotonic() + self.RETRY_SECONDS
+
+    def generation(self):
+        client = self._client()
+        if client is not None:
+            try:
+                return int(client.get(GENERATION_KEY) or 0)
+            except Exception as e:
+                self._mark_down(e)
+        return self.local.get(GENERATION_KEY) or 0
+
+    def bump_generation(self):
+        """Invalidate every cached response"""
+        generation = self.local.incr(GENERATION_KEY)
+        client = self._client()
+        if client is not None:
+            try:
+                generation = client.incr(GENERATION_KEY)
+            except Exception as e:
+                self._mark_down(e)
+        return generation
+
+    def get(self, key):
+        client = self._client()
+        if client is not None:
+            try:
+                return client.get(key)
+            except Exception as e:
+                self._mark_down(e)
+        return self.local.get(key)
+
+    def set(self, key, value, ttl):
+        client = self._client()
+        if client is not None:
+            try:
+                client.set(key, value, ex=ttl)
+                return
+            except Exception as e:
+                self._mark_down(e)
+        self.local.set(key, value, ttl)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'backend': self.backend,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 4) if total else 0.0
+        }
+
+
+def normalize_args(pairs):
+    """Canonical form of request arguments: sorted, trimmed, lowercase, single-spaced"""
+    return '&'.join(sorted(f'{key}={" ".join(str(value).lower().split())}' for key, value in pairs))
+
+
+def cache_key(generation):
+    """Key for the current request's response at a data generation"""
+    parts = [request.endpoint, normalize_args(request.args.items(multi=True))]
+    if request.view_args:
+        parts.append(normalize_args(request.view_args.items()))
+    digest = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+    return f'{KEY_PREFIX}resp:{generation}:{request.endpoint}:{digest}'
+
+
+def data_version():
+    """(generation, last scrape time) marking the current state of the data.
+
+    Reads the cache generation and the small stores table, never products.
+    """
+    from app.models import Store
+    from app import db
+
+    cache = current_app.extensions.get('response_cache')
+    generation = cache.generation() if cache else 0
+    last_scraped = db.session.query(db.func.max(Store.last_scraped)).scalar()
+    return generation, last_scraped
+
+
+def conditional_response(view):
+    """Answer If-None-Match / If-Modified-Since with 304 before running a view.
+
+    The ETag comes from the endpoint, its normalized arguments and the data
+    version, so it changes exactly when a scrape writes new data.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        generation, last_scraped = data_version()
+        version = f'{generation}:{last_scraped.isoformat() if last_scraped else ""}'
+        etag = hashlib.sha1(cache_key(version).encode('utf-8')).hexdigest()
+        last_modified = last_scraped.replace(microsecond=0, tzinfo=timezone.utc) if last_scraped else None
+
+        not_modified = request.if_none_match.contains(etag) if request.if_none_match else (
+            last_modified is not None and request.if_modified_since is not None
+            and last_modified <= request.if_modified_since
+        )
+        if not_modified:
+            response = Response(status=304)
+        else:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        response.headers['Cache-Control'] = f"public, max-age={current_app.config['HTTP_CACHE_MAX_AGE']}"
+        return response
+    return wrapper
+
+
+def cached_response(ttl=None, cached_flag=None):
+    """Cache a view's successful JSON response.
+
+    `cached_flag` names a boolean field in the payload that is set to True
+    when the response is served from the cache.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = current_app.extensions.get('response_cache')
+            if cache is None or not current_app.config['CACHE_ENABLED']:
+                return view(*args, **kwargs)
+
+            key = cache_key(cache.generation())
+            body = cache.get(key)
+            if body is not None:
+                cache.hits += 1
+                RESPONSE_CACHE.labels('hit').inc()
+                if cached_flag:
+                    payload = json.loads(body)
+                    payload[cached_flag] = True
+                    body = json.dumps(payload)
+                response = Response(body, mimetype='application/json')
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            cache.misses += 1
+            RESPONSE_CACHE.labels('miss').inc()
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and response.is_json:
+                cache.set(key, response.get_data(), ttl or current_app.config['CACHE_DEFAULT_TTL'])
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,264 @@
+"""Search demand recording and demand-driven refresh planning.
+
+Requests to /search, /api/prices and /api/prices/batch count their terms
+in an in-process buffer that is flushed to the search_demand table in one
+bulk upsert every few seconds, so recording costs a dict update per
+request. The scheduler
+then spends each store's request budget on the (store, term) pairs that are
+most overdue relative to how popular the term is: hot terms come round
+every few hours, cold ones every few days.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, request
+import atexit
+import logging
+import math
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# A pair is never refreshed sooner than MIN_TERM_HOURS, and one left longer
+# than MAX_TERM_HOURS jumps the queue whatever its popularity
+MIN_TERM_HOURS = float(os.getenv('DEMAND_MIN_TERM_HOURS', 6))
+MAX_TERM_HOURS = float(os.getenv('DEMAND_MAX_TERM_HOURS', 168))
+# Popularity every candidate term is credited with, so unsearched curated
+# terms still come round
+POPULARITY_FLOOR = 1.0
+# Terms outside the curated list need this many searches to be scraped
+MIN_SEARCHES = int(os.getenv('DEMAND_MIN_SEARCHES', 3))
+
+# The score period this process last rescaled search_demand to
+_rescaled_period = None
+
+
+def normalize_term(query):
+    """Canonical search term: lowercase word tokens, single-spaced"""
+    from app.search import tokenize
+    return ' '.join(tokenize(query or ''))[:100]
+
+
+class DemandRecorder:
+    """Buffer search term counts in memory and flush them in bulk"""
+
+    def __init__(self, app=None):
+        self._counts = Counter()
+        self._last_seen = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('DEMAND_TRACKING_ENABLED', True)
+        app.config.setdefault('DEMAND_FLUSH_SECONDS', 30)
+        app.config.setdefault('DEMAND_FLUSH_SIZE', 500)
+        app.extensions['search_demand'] = self
+        atexit.register(self._flush_at_exit, app)
+
+    def record(self, query):
+        term = normalize_term(query)
+        if len(term) < 2:
+            return
+        with self._lock:
+            self._counts[term] += 1
+            self._last_seen[term] = datetime.utcnow()
+            due = (len(self._counts) >= current_app.config['DEMAND_FLUSH_SIZE'] or
+                   time.monotonic() - self._last_flush >= current_app.config['DEMAND_FLUSH_SECONDS'])
+        if due:
+            self.flush()
+
+    def _take(self):
+        with self._lock:
+            counts, last_seen = self._counts, self._last_seen
+            self._counts, self._last_seen = Counter(), {}
+            self._last_flush = time.monotonic()
+        return counts, last_seen
+
+    def flush(self):
+        """Write buffered counts with one upsert; needs an app context"""
+        counts, last_seen = self._take()
+        if not counts:
+            return 0
+        try:
+            _upsert_demand(counts, last_seen)
+        except Exception as e:
+            logger.error(f"Could not flush search demand for {len(counts)} terms: {e}")
+            from app import db
+            db.session.rollback()
+            # Keep the counts for the next flush rather than losing them
+            with self._lock:
+                self._counts.update(counts)
+                for term, seen in last_seen.items():
+                    self._last_seen.setdefault(term, seen)
+            return 0
+        return len(counts)
+
+    def _flush_at_exit(self, app):
+        if self._counts:
+            with app.app_context():
+                self.flush()
+
+
+def _upsert_demand(counts, last_seen):
+    global _rescaled_period
+    from app import db
+    from app.models import SearchDemand
+    from app.models.search_demand import demand_weight, score_period
+    from sqlalchemy.dialects import postgresql, sqlite
+
+    period = score_period(datetime.utcnow())
+    if period != _rescaled_period:
+        SearchDemand.rescale_scores(period)
+
+    rows = [{
+        'term': term,
+        'search_count': count,
+        'score': count * demand_weight(last_seen[term], period),
+        'score_period': period,
+        'first_searched_at': last_seen[term],
+        'last_searched_at': last_seen[term],
+    } for term, count in counts.items()]
+
+    inserts = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+    dialect_insert = inserts.get(db.engine.dialect.name)
+    if dialect_insert is None:
+        for row in rows:
+            demand = db.session.get(SearchDemand, row['term'])
+            if demand is None:
+                db.session.add(SearchDemand(**row))
+            else:
+                demand.search_count += row['search_count']
+                demand.score += row['score']
+                demand.score_period = period
+                demand.last_searched_at = row['last_searched_at']
+        db.session.commit()
+        _rescaled_period = period
+        return
+
+    statement = dialect_insert(SearchDemand.__table__)
+    statement = statement.on_conflict_do_update(
+        index_elements=['term'],
+        set_={
+            'search_count': SearchDemand.__table__.c.search_count + statement.excluded.search_count,
+            'score': SearchDemand.__table__.c.score + statement.excluded.score,
+            'score_period': statement.excluded.score_period,
+            'last_searched_at': statement.excluded.last_searched_at,
+        }
+    )
+    db.session.connection().execute(statement, rows)
+    db.session.commit()
+    _rescaled_period = period
+
+
+def split_terms(values):
+    """Distinct non-empty search terms from comma-separated argument values, in order"""
+    terms, seen = [], set()
+    for value in values:
+        for term in value.split(','):
+            term = term.strip()
+            if term and term.lower() not in seen:
+                seen.add(term.lower())
+                terms.append(term)
+    return terms
+
+
+def records_demand(arg, many=False):
+    """Count the request argument `arg` as a search, including cache hits and 304s.
+
+    With `many`, every comma-separated value of every `arg` counts as a search.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            recorder = current_app.extensions.get('search_demand')
+            if recorder is not None and current_app.config['DEMAND_TRACKING_ENABLED']:
+                try:
+                    if many:
+                        for term in split_terms(request.args.getlist(arg)):
+                            recorder.record(term)
+                    else:
+                        recorder.record(request.args.get(arg, ''))
+                except Exception as e:
+                    logger.error(f"Could not record search demand: {e}")
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def refresh_priority(age_hours, popularity):
+    """How much refreshing a pair now is worth; higher goes first.
+
+    With a fixed request budget, demand-weighted staleness is lowest when a
+    term's refresh interval is proportional to 1/sqrt(popularity), which is
+    what ranking by age * sqrt(popularity) converges to.
+    """
+    if age_hours < MIN_TERM_HOURS:
+        return None
+    if age_hours >= MAX_TERM_HOURS:
+        return float('inf')
+    return age_hours * math.sqrt(popularity + POPULARITY_FLOOR)
+
+
+def select_pairs(terms, last_scraped, store_names, budget, now):
+    """Pick up to `budget` (store, term) pairs per store, highest priority first.
+
+    `terms` maps term -> popularity; `last_scraped` maps (store, term) ->
+    last successful scrape. Never-scraped and long-overdue pairs come
+    first, ties go to the more popular term, then to the earlier one in
+    `terms`.
+    """
+    pairs = []
+    for store_name in store_names:
+        ranked = []
+        for index, (term, popularity) in enumerate(terms.items()):
+            scraped = last_scraped.get((store_name, term))
+            if scraped is None:
+                priority = float('inf')
+            else:
+                priority = refresh_priority((now - scraped).total_seconds() / 3600.0, popularity)
+            if priority is not None:
+                ranked.append((priority, popularity, -index, term))
+        ranked.sort(reverse=True)
+        pairs.extend((store_name, term) for _, _, _, term in ranked[:budget])
+
+    # Interleave stores so every store starts work immediately
+    order = {term: index for index, term in enumerate(sorted(terms, key=lambda t: -terms[t]))}
+    return sorted(pairs, key=lambda pair: order[pair[1]])
+
+
+def plan_refresh(store_names, curated_terms, budget, now=None, max_terms=500):
+    """Choose this cycle's (store, term) pairs from search demand and data age"""
+    from app import db
+    from app.models import SearchDemand, ScrapeJob
+
+    now = now or datetime.utcnow()
+    recorder = current_app.extensions.get('search_demand')
+    if recorder is not None:
+        recorder.flush()
+
+    curated = set(curated_terms)
+    terms = dict.fromkeys(curated_terms, 0.0)
+    for demand in SearchDemand.top(limit=max_terms):
+        if demand.term in curated or demand.search_count >= MIN_SEARCHES:
+            terms[demand.term] = demand.popularity(now)
+
+    # Anything scraped before this counts as never scraped
+    horizon = now - timedelta(hours=MAX_TERM_HOURS * 2)
+    last_scraped = {
+        (store_name, term): finished_at
+        for store_name, term, finished_at in db.session.query(
+            ScrapeJob.store_name, ScrapeJob.search_term, db.func.max(ScrapeJob.finished_at)
+        ).filter(
+            ScrapeJob.status == 'done',
+            ScrapeJob.finished_at >= horizon
+        ).group_by(ScrapeJob.store_name, ScrapeJob.search_term)
+    }
+
+    pairs = select_pairs(terms, last_scraped, store_names, budget, now)
+    logger.info(f"Planned {len(pairs)} scrapes from {len(terms)} candidate terms "
+                f"({len(terms.keys() - curated)} from search demand)")
+    return pairs
@@ -0,0 +1,312 @@
+from app import db, cache
+from app.models import Product, PriceHistory, PriceSummary
+from app.matching import match_products
+from app.scraper.records import as_records, validate_batch
+from app.metrics import record_ingestion
+from sqlalchemy import select, insert, update, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import datetime
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+# A product missing from a store/term result set is only deactivated once
+# no ingestion run has returned it for this long, so items another search
+# term still finds, and one-off gaps in a store's results, stay active
+SWEEP_GRACE_MS = int(float(os.getenv('PRODUCT_SWEEP_GRACE_HOURS', 48)) * 3600 * 1000)
+
+_UPSERT_DIALECTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def ingest_products(store_id, search_term, products_data, batch_size=BATCH_SIZE):
+    """Save a store/search term result set in batches.
+
+    The result set (ScrapedProduct records, or their dicts) is validated
+    once up front: products without a name or a positive price are
+    counted in stats['rejected'] and never saved. Each batch resolves
+    existing products with one query, upserts all products with one
+    INSERT ... ON CONFLICT statement and writes the PriceHistory rows for
+    new products and changed prices in one bulk insert, then commits once.
+    Products not yet matched to a canonical product are then matched, in a
+    transaction of their own so a matching failure never loses prices.
+
+    Every product saved is stamped with this run's generation. Once all
+    batches are in, the store/term's products that no run has stamped
+    within the sweep grace period are deactivated in one statement -
+    unless the result set was empty or a batch failed, when the missing
+    products may still exist upstream.
+    """
+    stats = {'inserted': 0, 'updated': 0, 'price_changes': 0, 'failed': 0, 'matched': 0, 'deactivated': 0,
+             'rejected': 0}
+    search_term = search_term.lower()
+    generation = new_generation()
+
+    # Later duplicates of a product name win, as they did with per-row saves
+    by_name = {}
+    for product in as_records(products_data):
+        by_name[product.name] = product
+    items, rejected = validate_batch(list(by_name.values()))
+    stats['rejected'] = len(rejected)
+
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        try:
+            product_ids = _ingest_batch(store_id, search_term, batch, stats, generation)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error saving batch of {len(batch)} products for store {store_id}: {e}")
+            db.session.rollback()
+            stats['failed'] += len(batch)
+            continue
+
+        try:
+            stats['matched'] += match_products(product_ids)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error matching batch of {len(batch)} products for store {store_id}: {e}")
+            db.session.rollback()
+
+    categories = {product.category for product in items}
+    # A result set that was all rejected is as suspect as an empty one
+    if items and not stats['failed']:
+        try:
+            swept = sweep_missing(store_id, search_term, generation)
+            db.session.commit()
+            stats['deactivated'] = len(swept)
+            categories.update(swept)
+        except Exception as e:
+            logger.error(f"Error sweeping missing products for store {store_id}: {e}")
+            db.session.rollback()
+
+    try:
+        PriceSummary.refresh(store_id, search_term, categories=categories)
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Error refreshing price summaries for store {store_id}: {e}")
+        db.session.rollback()
+
+    return stats
+
+
+def save_scrape_results(store, search_term, products_data):
+    """Ingest one store/search term result set and mark the store as scraped"""
+    started = time.perf_counter()
+    stats = ingest_products(store.id, search_term, products_data)
+    record_ingestion(store.name, stats, time.perf_counter() - started)
+    store.last_scraped = datetime.utcnow()
+    db.session.commit()
+    cache.bump_generation()
+    return stats
+
+
+def new_generation():
+    """A fresh ingestion generation stamp: milliseconds since the epoch"""
+    return time.time_ns() // 1_000_000
+
+
+def sweep_missing(store_id, search_term, generation, grace_ms=SWEEP_GRACE_MS):
+    """Deactivate the store/term's active products unseen for `grace_ms` before `generation`.
+
+    One UPDATE through the partial index on active rows. Returns the
+    category of every product deactivated, so their summaries can be
+    refreshed.
+    """
+    table = Product.__table__
+    condition = (
+        (table.c.store_id == store_id) & (table.c.search_term == search_term) & (table.c.is_active == True) &
+        or_(table.c.seen_generation.is_(None), table.c.seen_generation < generation - grace_ms)
+    )
+    statement = update(table).where(condition).values(is_active=False)
+    connection = db.session.connection()
+
+    if connection.dialect.update_returning:
+        return connection.execute(statement.returning(table.c.category)).scalars().all()
+
+    categories = connection.execute(select(table.c.category).where(condition)).scalars().all()
+    connection.execute(statement)
+    return categories
+
+
+def _ingest_batch(store_id, search_term, batch, stats, generation):
+    now = datetime.utcnow()
+    names = [product.name for product in batch]
+
+    existing = {
+        name: (product_id, price)
+        for name, product_id, price in db.session.execute(
+            select(Product.name, Product.id, Product.price).where(
+                Product.store_id == store_id,
+                Product.name.in_(names)
+            )
+        )
+    }
+
+    rows = [{
+        'name': product.name,
+        'brand': product.brand,
+        'category': product.category,
+        'promotion': product.promotion,
+        'store_id': store_id,
+        'price': product.price,
+        'unit': product.unit,
+        'image_url': product.image,
+        'store_url': product.url,
+        'search_term': search_term,
+        'last_updated': now,
+        'is_active': True,
+        'seen_generation': generation,
+        'quantity': product.quantity,
+        'base_unit': product.base_unit,
+        'price_per_unit': product.price_per_unit
+    } for product in batch]
+
+    ids = _upsert_products(rows)
+
+    history = []
+    for product in batch:
+        name = product.name
+        if name in existing:
+            stats['updated'] += 1
+            if existing[name][1] != product.price:
+                stats['price_changes'] += 1
+                history.append({'product_id': existing[name][0], 'price': product.price,
+                                'recorded_at': now})
+        else:
+            stats['inserted'] += 1
+            history.append({'product_id': ids[name], 'price': product.price,
+                            'recorded_at': now})
+
+    if history:
+        db.session.connection().execute(insert(PriceHistory.__table__), history)
+    return list(ids.values())
+
+
+def _upsert_products(rows):
+    """Insert or update products on (store_id, name), returning {name: id}"""
+    dialect = db.session.get_bind().dialect
+    dialect_insert = _UPSERT_DIALECTS.get(dialect.name)
+
+    if dialect_insert is None:
+        return _upsert_products_portable(rows)
+
+    # Executed with a parameter list, so SQLAlchemy batches the rows into
+    # multi-row VALUES statements while reusing one cached compiled statement
+    table = Product.__table__
+    stmt = dialect_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['store_id', 'name'],
+        set_={
+            'price': stmt.excluded.price,
+            'last_updated': stmt.excluded.last_updated,
+            'promotion': stmt.excluded.promotion,
+            'unit': stmt.excluded.unit,
+            'quantity': stmt.excluded.quantity,
+            'base_unit': stmt.excluded.base_unit,
+            'price_per_unit': stmt.excluded.price_per_unit,
+            'is_active': True,
+            'seen_generation': stmt.excluded.seen_generation
+        }
+    )
+    connection = db.session.connection()
+
+    if dialect.insert_executemany_returning:
+        result = connection.execute(stmt.returning(table.c.name, table.c.id), rows)
+        return dict(result.all())
+
+    connection.execute(stmt, rows)
+    return _product_ids(rows)
+
+
+def _upsert_products_portable(rows):
+    """Fallback for databases without ON CONFLICT support"""
+    ids = _product_ids(rows)
+    new_rows = [row for row in rows if row['name'] not in ids]
+    updates = [{'id': ids[row['name']], 'price': row['price'], 'last_updated': row['last_updated'],
+                'promotion': row['promotion'], 'unit': row['unit'], 'quantity': row['quantity'],
+                'base_unit': row['base_unit'], 'price_per_unit': row['price_per_unit'], 'is_active': True,
+                'seen_generation': row['seen_generation']}
+               for row in rows if row['name'] in ids]
+
+    if new_rows:
+        db.session.connection().execute(insert(Product.__table__), new_rows)
+    if updates:
+        db.session.execute(db.update(Product), updates)
+    return _product_ids(rows)
+
+
+def _product_ids(rows):
+    store_id = rows[0]['store_id']
+    return dict(db.session.execute(
+        select(Product.name, Product.id).where(
+            Product.store_id == store_id,
+            Product.name.in_([row['name'] for row in rows])
+        )
+    ).all())
+
+
+def merge_duplicate_products():
+    """Merge products stored more than once per (store_id, name) into one row.
+
+    Databases created before uq_products_store_name can hold such rows, and
+    the unique index (which every ingestion upsert conflicts on) cannot be
+    built over them. The most recently updated row of each group is kept;
+    the others' price history and rollups are moved to it (a rollup bucket
+    the kept row already has wins) and they are deleted. Returns the number
+    of rows removed.
+    """
+    from app.models import CanonicalProduct, PriceHistoryRollup
+
+    products = Product.__table__
+    history = PriceHistory.__table__
+    rollups = PriceHistoryRollup.__table__
+    kept = rollups.alias('kept')
+
+    with db.engine.begin() as conn:
+        groups = conn.execute(
+            select(products.c.store_id, products.c.name)
+            .group_by(products.c.store_id, products.c.name)
+            .having(db.func.count() > 1)
+        ).all()
+        removed, canonical_ids = [], set()
+        for store_id, name in groups:
+            rows = conn.execute(
+                select(products.c.id, products.c.canonical_id)
+                .where(products.c.store_id == store_id, products.c.name == name)
+                .order_by(products.c.last_updated.desc().nulls_last(), products.c.id.desc())
+            ).all()
+            keeper = rows[0].id
+            for row in rows[1:]:
+                conn.execute(update(history).where(history.c.product_id == row.id).values(product_id=keeper))
+                conn.execute(db.delete(rollups).where(
+                    rollups.c.product_id == row.id,
+                    select(kept.c.id).where(
+                        kept.c.product_id == keeper,
+                        kept.c.resolution == rollups.c.resolution,
+                        kept.c.bucket_start == rollups.c.bucket_start
+                    ).exists()
+                ))
+                conn.execute(update(rollups).where(rollups.c.product_id == row.id).values(product_id=keeper))
+                removed.append(row.id)
+            canonical_ids.update(row.canonical_id for row in rows if row.canonical_id is not None)
+
+        for start in range(0, len(removed), BATCH_SIZE):
+            conn.execute(db.delete(products).where(products.c.id.in_(removed[start:start + BATCH_SIZE])))
+
+        if canonical_ids:
+            canonical = CanonicalProduct.__table__
+            conn.execute(
+                update(canonical).where(canonical.c.id.in_(canonical_ids)).values(
+                    product_count=select(db.func.count(products.c.id))
+                    .where(products.c.canonical_id == canonical.c.id).scalar_subquery()
+                )
+            )
+
+    if removed:
+        logger.warning(f"Merged {len(removed)} duplicate products in {len(groups)} (store, name) groups")
+    return len(removed)
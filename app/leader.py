@@ -0,0 +1,259 @@
+"""Leader election so exactly one scheduler replica runs scrape cycles.
+
+Every web replica and the scheduler service start APScheduler, but jobs only
+run on the replica holding the leader lock. The lock lives in Redis
+(SET NX with a renewed lease) when Redis is reachable, otherwise in a
+PostgreSQL session advisory lock, and on SQLite in an flock()ed file next
+to the database.
+"""
+from app.cache import KEY_PREFIX
+import logging
+import os
+import socket
+import threading
+import uuid
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+LOCK_TTL = float(os.getenv('SCHEDULER_LOCK_TTL', 60))
+
+
+def identity():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class RedisLeaderLock:
+    """Lease in Redis: SET NX PX, renewed while held, released only by its owner"""
+
+    backend = 'redis'
+
+    def __init__(self, client, name, ttl=LOCK_TTL):
+        self.client = client
+        self.key = f'{KEY_PREFIX}lock:{name}'
+        self.ttl_ms = int(ttl * 1000)
+        self.token = f'{identity()}:{uuid.uuid4().hex}'
+
+    def acquire(self):
+        return bool(self.client.set(self.key, self.token, nx=True, px=self.ttl_ms))
+
+    def _if_owner(self, action):
+        from redis.exceptions import WatchError
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(self.key)
+                owner = pipe.get(self.key)
+                if owner is None or owner.decode() != self.token:
+                    pipe.unwatch()
+                    return False
+                pipe.multi()
+                action(pipe)
+                pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    def renew(self):
+        return self._if_owner(lambda pipe: pipe.pexpire(self.key, self.ttl_ms))
+
+    def release(self):
+        self._if_owner(lambda pipe: pipe.delete(self.key))
+
+
+class PostgresLeaderLock:
+    """Session-level pg advisory lock, held for as long as its connection lives"""
+
+    backend = 'postgres'
+
+    def __init__(self, engine, name):
+        self.engine = engine
+        self.key = zlib.crc32(f'{KEY_PREFIX}{name}'.encode('utf-8'))
+        self._conn = None
+
+    def acquire(self):
+        from sqlalchemy import text
+        conn = self.engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+        try:
+            if conn.execute(text('SELECT pg_try_advisory_lock(:key)'), {'key': self.key}).scalar():
+                self._conn = conn
+                return True
+        except Exception:
+            conn.close()
+            raise
+        conn.close()
+        return False
+
+    def renew(self):
+        from sqlalchemy import text
+        if self._conn is None:
+            return False
+        try:
+            self._conn.execute(text('SELECT 1'))
+            return True
+        except Exception as e:
+            # The lock went with the connection
+            logger.warning(f"Lost advisory lock connection: {e}")
+            self._conn = None
+            return False
+
+    def release(self):
+        from sqlalchemy import text
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': self.key})
+        finally:
+            self._conn.close()
+            self._conn = None
+
+
+class FileLeaderLock:
+    """flock() on a local file, for single-host SQLite deployments"""
+
+    backend = 'file'
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        if fcntl is None:
+            return True
+        handle = open(self.path, 'a+')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        handle.truncate(0)
+        handle.write(identity())
+        handle.flush()
+        self._file = handle
+        return True
+
+    def renew(self):
+        return self._file is not None or fcntl is None
+
+    def release(self):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+def create_leader_lock(app, engine, name='scheduler'):
+    """Pick a lock backend: SCHEDULER_LOCK=redis|postgres|file, or auto"""
+    choice = os.getenv('SCHEDULER_LOCK', 'auto')
+
+    if choice in ('auto', 'redis') and app.config.get('REDIS_URL'):
+        try:
+            import redis
+            client = redis.Redis.from_url(app.config['REDIS_URL'], socket_timeout=2, socket_connect_timeout=2)
+            client.ping()
+            return RedisLeaderLock(client, name)
+        except Exception as e:
+            if choice == 'redis':
+                raise
+            logger.warning(f"Redis unavailable for the scheduler lock, falling back: {e}")
+
+    if choice in ('auto', 'postgres') and engine.dialect.name == 'postgresql':
+        return PostgresLeaderLock(engine, name)
+
+    path = os.getenv('SCHEDULER_LOCK_FILE')
+    if path and name != 'scheduler':
+        path = f'{path}.{name}'
+    if not path:
+        database = engine.url.database if engine.dialect.name == 'sqlite' else None
+        path = f'{database}.{name}.lock' if database and database != ':memory:' else f'{name}.lock'
+    return FileLeaderLock(path)
+
+
+class LeaderElection:
+    """Keep trying to take the lock, and renew it while held, on a daemon thread.
+
+    `on_change(is_leader)` is called from that thread whenever leadership
+    is won or lost after the first attempt.
+    """
+
+    def __init__(self, lock, ttl=LOCK_TTL, name='scheduler', on_change=None):
+        self.lock = lock
+        self.interval = ttl / 3
+        self.identity = identity()
+        self.name = name
+        self.on_change = on_change
+        self.is_leader = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.tick()
+        self._thread = threading.Thread(target=self._run, name=f'leader-election:{self.name}', daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            was_leader = self.is_leader
+            if self.tick() != was_leader and self.on_change is not None:
+                try:
+                    self.on_change(self.is_leader)
+                except Exception as e:
+                    logger.error(f"Error handling {self.name} leadership change: {e}")
+
+    def tick(self):
+        try:
+            held = self.lock.renew() if self.is_leader else self.lock.acquire()
+        except Exception as e:
+            logger.error(f"{self.name.capitalize()} lock ({self.lock.backend}) check failed: {e}")
+            held = False
+
+        if held and not self.is_leader:
+            logger.info(f"{self.identity} is now the {self.name} leader ({self.lock.backend} lock)")
+        elif self.is_leader and not held:
+            logger.warning(f"{self.identity} lost the {self.name} lock")
+        self.is_leader = held
+        return held
+
+    def stop(self):
+        self._stop.set()
+        if self.is_leader:
+            try:
+                self.lock.release()
+            except Exception as e:
+                logger.error(f"Could not release {self.name} lock: {e}")
+        self.is_leader = False
+
+
+class JobLease:
+    """One leader's claim on a scheduler job run, fenced by SchedulerState.fence.
+
+    The run goes on while this replica still holds the lock and no other
+    leader has started the job since. Writes made for the run call
+    confirm() in their own transaction, so they are dropped once the job
+    has been taken over.
+    """
+
+    def __init__(self, election, job_id, fence):
+        self.election = election
+        self.job_id = job_id
+        self.fence = fence
+        self.lost = threading.Event()
+
+    def active(self):
+        """Cheap check between units of work: still the leader, never fenced out"""
+        return self.election.is_leader and not self.lost.is_set()
+
+    def confirm(self):
+        """Heartbeat the run in the current transaction; False once the lease is lost"""
+        from app.models import SchedulerState
+        if not self.active() or not SchedulerState.confirm(self.job_id, self.fence):
+            if not self.lost.is_set():
+                logger.warning(f"{self.election.identity} lost {self.job_id} (fence {self.fence}), stopping")
+            self.lost.set()
+            return False
+        return True
@@ -1,8 +1,10 @@
 from flask import render_template, request, jsonify
 from app.main import main_bp
-from app.models import Product, Store
-from app import limiter
-from sqlalchemy import func
+from app.models import Product, Store, PriceSummary
+from app.serializers import serialize_products, value_sort_key
+from app.cache import cached_response, conditional_response
+from app.demand import records_demand
+from app import limiter, db
 import logging
 
 logger = logging.getLogger(__name__)
@@ -21,14 +23,14 @@ def about():
 def stores():
     """Stores page with details"""
     stores = Store.query.all()
+    summaries = {summary.key: summary for summary in PriceSummary.for_scope('store')}
     store_stats = []
     for store in stores:
-        product_count = Product.query.filter_by(store_id=store.id, is_active=True).count()
-        avg_price = Product.query.filter_by(store_id=store.id, is_active=True).with_entities(func.avg(Product.price)).scalar() or 0
+        summary = summaries.get(str(store.id))
         store_stats.append({
             'store': store,
-            'product_count': product_count,
-            'avg_price': round(avg_price, 2)
+            'product_count': summary.product_count if summary else 0,
+            'avg_price': round(summary.avg_price or 0, 2) if summary else 0
         })
     return render_template('stores.html', store_stats=store_stats)
 
@@ -49,17 +51,36 @@ def categories():
 def trends():
     """Price trends page"""
     popular_items = ['milk', 'bread', 'eggs', 'butter', 'chicken']
+    summaries = {summary.key: summary for summary in PriceSummary.for_scope('search_term', popular_items)}
+    
+    # Cheapest price per kg, litre or item for each term, in the unit most
+    # of its products are sold by
+    best_values = {}
+    rows = db.session.query(
+        Product.search_term, Product.base_unit,
+        db.func.min(Product.price_per_unit), db.func.count(Product.id)
+    ).filter(
+        Product.search_term.in_(popular_items),
+        Product.is_active == True,
+        Product.price_per_unit.isnot(None)
+    ).group_by(Product.search_term, Product.base_unit).all()
+    for term, base_unit, best, count in rows:
+        if term not in best_values or count > best_values[term][2]:
+            best_values[term] = (best, base_unit, count)
+    
     trends_data = []
     for item in popular_items:
-        products = Product.query.filter(Product.search_term.ilike(f'%{item}%'), Product.is_active == True).all()
-        if products:
-            prices = [p.price for p in products]
+        summary = summaries.get(item)
+        if summary:
+            best_value = best_values.get(item)
             trends_data.append({
                 'item': item.title(),
-                'min_price': min(prices),
-                'max_price': max(prices),
-                'avg_price': round(sum(prices) / len(prices), 2),
-                'stores': len(set(p.store.name for p in products))
+                'min_price': summary.min_price,
+                'max_price': summary.max_price,
+                'avg_price': round(summary.avg_price, 2),
+                'stores': summary.store_count,
+                'best_unit_price': best_value[0] if best_value else None,
+                'base_unit': best_value[1] if best_value else None
             })
     return render_template('trends.html', trends_data=trends_data)
 
@@ -70,6 +91,9 @@ def contact():
 
 @main_bp.route('/search')
 @limiter.limit("20 per minute")
+@records_demand('q')
+@conditional_response
+@cached_response(ttl=3600, cached_flag='cached')
 def search():
     """Search products and return JSON"""
     query = request.args.get('q', '').strip()
@@ -77,15 +101,14 @@ def search():
         return jsonify({'error': 'Please enter a search term'})
     
     try:
-        products = Product.search_products(query, limit=50)
-        results = [product.to_dict() for product in products]
-        results.sort(key=lambda x: x['price'])
+        results = serialize_products(Product.search_query(query), limit=50)
+        results.sort(key=value_sort_key if request.args.get('sort') == 'value' else lambda x: x['price'])
         
         return jsonify({
             'products': results,
-            'cached': True,
-            'last_updated': products[0].last_updated.isoformat() if products else None
+            'cached': False,
+            'last_updated': max(r['last_updated'] for r in results) if results else None
         })
     except Exception as e:
         logger.error(f"Search error: {e}")
-        return jsonify({'error': 'Search failed. Please try again.'})
\ No newline at end of file
+        return jsonify({'error': 'Search failed. Please try again.'}), 500
\ No newline at end of file
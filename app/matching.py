@@ -0,0 +1,292 @@
+"""Cluster equivalent products from different stores into canonical products.
+
+A product's match key is its parsed size (app.units) plus its name reduced
+to content tokens: no store names, sizes or filler words, so 'Tesco Fresh
+Milk 1L' and 'SuperValu Fresh Milk 1 Litre' both become 'fresh milk' at
+1.0 l. Names are compared by Jaccard similarity of their character
+trigrams, which tolerates spelling variants such as yoghurt/yogurt.
+
+Comparing every new product with every canonical product is O(n^2), so
+candidates come from a MinHash LSH index instead: the trigram set's
+MinHash signature is cut into bands, and each band hashed with the size
+gives a band key. Only canonical products sharing a band key are scored,
+and only they are read from the database. Each ingest batch is matched
+with one band lookup, keeping matching near-linear as the catalogue grows.
+"""
+from collections import defaultdict
+import hashlib
+import logging
+import re
+import struct
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional, MinHash falls back to pure Python
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# 16 bands of 2 rows: pairs with trigram Jaccard 0.5 share a band ~99% of
+# the time, pairs below 0.2 ~50% (and are then rejected on the exact score)
+NUM_BANDS = 16
+BAND_ROWS = 2
+NUM_PERMUTATIONS = NUM_BANDS * BAND_ROWS
+MATCH_THRESHOLD = 0.6
+# Band keys per IN (...) lookup, under SQLite's bound parameter limit
+LOOKUP_CHUNK = 900
+
+_PRIME = (1 << 61) - 1
+
+
+def _permutations():
+    """Fixed (a, b) pairs for the hash family h(x) = (a*x + b) mod p.
+
+    With 32-bit x, a below 2**31 and b below 2**32, a*x + b fits in a
+    uint64, so the NumPy and pure Python signatures are identical.
+    """
+    params = []
+    for index in range(NUM_PERMUTATIONS):
+        digest = hashlib.blake2b(f'comparaid-minhash-{index}'.encode('ascii'), digest_size=8).digest()
+        a, b = struct.unpack('<II', digest)
+        params.append((a % ((1 << 31) - 1) + 1, b))
+    return params
+
+
+PERMUTATIONS = _permutations()
+if np is not None:
+    _A = np.array([a for a, _ in PERMUTATIONS], dtype=np.uint64)[:, None]
+    _B = np.array([b for _, b in PERMUTATIONS], dtype=np.uint64)[:, None]
+
+STORE_WORDS = {'tesco', 'supervalu', 'dunnes', 'stores', 'lidl', 'aldi'}
+STOP_WORDS = {'the', 'and', 'with', 'of', 'in', 'a', 'for', 'approx', 'each', 'pack', 'pk', 'x'}
+UNIT_WORDS = {
+    'g', 'gr', 'grm', 'gram', 'grams', 'kg', 'kgs', 'kilo', 'kilos', 'mg',
+    'ml', 'cl', 'l', 'lt', 'ltr', 'litre', 'litres', 'liter', 'liters', 'pcs', 'pieces',
+}
+_TOKEN = re.compile(r'[a-z]+|\d+(?:[.,]\d+)?[a-z]*')
+_SIZE_TOKEN = re.compile(r'^\d+(?:[.,]\d+)?(?:[a-z]{0,6})$')
+
+
+def key_tokens(name):
+    """Sorted distinct content tokens of a product name"""
+    tokens = set()
+    for token in _TOKEN.findall((name or '').lower()):
+        if token in STORE_WORDS or token in STOP_WORDS or token in UNIT_WORDS or _SIZE_TOKEN.match(token):
+            continue
+        tokens.add(token)
+    return ' '.join(sorted(tokens))
+
+
+def display_name(name):
+    """Product name without a leading store brand, for the canonical product"""
+    words = name.split()
+    while len(words) > 1 and words[0].lower() in STORE_WORDS:
+        words.pop(0)
+    return ' '.join(words)
+
+
+def shingles(tokens):
+    """Character trigrams of each token, padded so short words still count"""
+    grams = set()
+    for token in tokens.split():
+        padded = f' {token} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def jaccard(left, right):
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def _hash(gram):
+    return struct.unpack('<I', hashlib.blake2b(gram.encode('utf-8'), digest_size=4).digest())[0]
+
+
+def minhash(grams):
+    """MinHash signature of a trigram set"""
+    if not grams:
+        return None
+    values = [_hash(gram) for gram in grams]
+    if np is not None:
+        hashed = (_A * np.array(values, dtype=np.uint64)[None, :] + _B) % np.uint64(_PRIME)
+        return hashed.min(axis=1).tolist()
+    return [min((a * value + b) % _PRIME for value in values) for a, b in PERMUTATIONS]
+
+
+def size_key(quantity, base_unit):
+    return f'{base_unit}:{quantity:g}' if base_unit and quantity else 'unsized'
+
+
+def band_keys(signature, quantity, base_unit):
+    """The LSH bucket keys of one signature within its size block"""
+    if signature is None:
+        return []
+    size = size_key(quantity, base_unit)
+    keys = []
+    for band in range(NUM_BANDS):
+        folded = 0
+        for value in signature[band * BAND_ROWS:(band + 1) * BAND_ROWS]:
+            folded = (folded * 1000003 ^ value) & 0xFFFFFFFFFFFFFFFF
+        keys.append(f'{size}:{band}:{folded:x}')
+    return keys
+
+
+class MatchIndex:
+    """In-memory LSH index of canonical products.
+
+    Holds only the canonical products a batch could match, loaded by their
+    band keys, plus those the batch creates.
+    """
+
+    def __init__(self, threshold=MATCH_THRESHOLD):
+        self.threshold = threshold
+        self.buckets = defaultdict(set)
+        self.grams = {}
+        self.stores = defaultdict(set)
+
+    def add(self, canonical_id, grams, keys, store_ids=()):
+        self.grams[canonical_id] = grams
+        self.stores[canonical_id].update(store_ids)
+        for key in keys:
+            self.buckets[key].add(canonical_id)
+
+    def best_match(self, grams, keys, store_id=None):
+        """The most similar canonical product above the threshold, or None.
+
+        A canonical product that already holds a product from this store is
+        skipped, since a store does not list the same item twice.
+        """
+        candidates = set()
+        for key in keys:
+            candidates.update(self.buckets.get(key, ()))
+        best, best_score = None, self.threshold
+        for canonical_id in candidates:
+            if store_id is not None and store_id in self.stores[canonical_id]:
+                continue
+            score = jaccard(grams, self.grams[canonical_id])
+            if score >= best_score:
+                best, best_score = canonical_id, score
+        return best
+
+
+def match_products(product_ids):
+    """Assign canonical products to the given products that have none yet.
+
+    Returns the number of products assigned. Runs in the caller's session;
+    the caller commits.
+    """
+    from app import db
+    from app.models import Product, CanonicalProduct, CanonicalBand
+    from sqlalchemy import select, insert
+
+    if not product_ids:
+        return 0
+    rows = db.session.execute(
+        select(Product.id, Product.store_id, Product.name, Product.quantity, Product.base_unit,
+               Product.search_term).where(Product.id.in_(list(product_ids)), Product.canonical_id.is_(None))
+        .order_by(Product.id)
+    ).all()
+    if not rows:
+        return 0
+
+    pending = []
+    for row in rows:
+        tokens = key_tokens(row.name)
+        grams = shingles(tokens)
+        pending.append((row, tokens, grams, band_keys(minhash(grams), row.quantity, row.base_unit)))
+
+    # One lookup for every band key in the batch, then one read of the
+    # candidates' tokens and of the stores already in them
+    index = MatchIndex()
+    candidate_keys = defaultdict(list)
+    key_list = list({key for *_, keys in pending for key in keys})
+    for start in range(0, len(key_list), LOOKUP_CHUNK):
+        for key, canonical_id in db.session.execute(
+            select(CanonicalBand.band_key, CanonicalBand.canonical_id)
+            .where(CanonicalBand.band_key.in_(key_list[start:start + LOOKUP_CHUNK]))
+        ):
+            candidate_keys[canonical_id].append(key)
+    if candidate_keys:
+        stores = defaultdict(set)
+        for canonical_id, store_id in db.session.execute(
+            select(Product.canonical_id, Product.store_id).where(Product.canonical_id.in_(list(candidate_keys)))
+        ):
+            stores[canonical_id].add(store_id)
+        for canonical_id, tokens in db.session.execute(
+            select(CanonicalProduct.id, CanonicalProduct.key_tokens)
+            .where(CanonicalProduct.id.in_(list(candidate_keys)))
+        ):
+            index.add(canonical_id, shingles(tokens), candidate_keys[canonical_id], stores[canonical_id])
+
+    # Products matched within the batch may join canonical products the
+    # batch itself creates; those get ids once inserted
+    assignments = {}
+    created = []
+    created_keys = []
+    for row, tokens, grams, keys in pending:
+        canonical_id = index.best_match(grams, keys, row.store_id) if keys else None
+        if canonical_id is None:
+            canonical_id = -(len(created) + 1)
+            created.append(CanonicalProduct(
+                name=display_name(row.name), key_tokens=tokens[:200] or row.name.lower()[:200],
+                quantity=row.quantity, base_unit=row.base_unit, search_term=row.search_term, product_count=0
+            ))
+            created_keys.append(keys)
+            index.add(canonical_id, grams, keys)
+        index.stores[canonical_id].add(row.store_id)
+        assignments[row.id] = canonical_id
+
+    if created:
+        db.session.add_all(created)
+        db.session.flush()
+        real_ids = {-(position + 1): canonical.id for position, canonical in enumerate(created)}
+        assignments = {product_id: real_ids.get(canonical_id, canonical_id)
+                       for product_id, canonical_id in assignments.items()}
+        bands = [{'band_key': key, 'canonical_id': canonical.id}
+                 for canonical, keys in zip(created, created_keys) for key in keys]
+        if bands:
+            db.session.connection().execute(insert(CanonicalBand.__table__), bands)
+
+    db.session.execute(db.update(Product), [
+        {'id': product_id, 'canonical_id': canonical_id} for product_id, canonical_id in assignments.items()
+    ])
+    counts = defaultdict(int)
+    for canonical_id in assignments.values():
+        counts[canonical_id] += 1
+    table = CanonicalProduct.__table__
+    db.session.connection().execute(
+        db.update(table).where(table.c.id == db.bindparam('canonical'))
+        .values(product_count=table.c.product_count + db.bindparam('added')),
+        [{'canonical': canonical_id, 'added': added} for canonical_id, added in counts.items()]
+    )
+    return len(assignments)
+
+
+def match_unassigned(batch_size=2000):
+    """Match every product without a canonical product, oldest first"""
+    from app import db
+    from app.models import Product
+    from sqlalchemy import select
+
+    matched = 0
+    last_id = 0
+    while True:
+        ids = db.session.scalars(
+            select(Product.id).where(Product.id > last_id, Product.canonical_id.is_(None))
+            .order_by(Product.id).limit(batch_size)
+        ).all()
+        if not ids:
+            break
+        try:
+            matched += match_products(ids)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error matching products after {last_id}: {e}")
+            db.session.rollback()
+            raise
+        last_id = ids[-1]
+
+    logger.info(f"Matched {matched} products to canonical products")
+    return matched
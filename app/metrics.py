@@ -0,0 +1,239 @@
+"""Prometheus metrics and per-request timing.
+
+/metrics serves every metric below in the Prometheus text format. Under
+gunicorn, set PROMETHEUS_MULTIPROC_DIR so each worker writes its samples
+to a shared directory and /metrics sums them across workers;
+gunicorn.conf.py clears the directory on start and marks dead workers.
+The scheduler and Celery workers run in their own containers and serve
+their metrics on METRICS_PORT instead.
+
+- HTTP: latency per endpoint, and SQL statement count and time per request
+  from SQLAlchemy cursor events.
+- Caches: response cache hits and misses, HTTP scrape cache outcomes.
+- Scrapers: fetch latency, bytes downloaded and errors per store.
+- Ingestion: products by outcome and seconds per result set, so rows per
+  second is rate(comparaid_ingested_products_total) over
+  rate(comparaid_ingestion_duration_seconds_sum), plus a gauge of the
+  latest result set's rate.
+
+With SERVER_TIMING (or in debug mode) every response also carries a
+Server-Timing header splitting the request into db, serialize and
+render time. Without prometheus_client installed the metrics are no-ops
+and /metrics answers 501; Server-Timing still works.
+"""
+from contextlib import contextmanager
+from flask import (Response, before_render_template, current_app, g, has_request_context, request,
+                   template_rendered)
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import logging
+import os
+import time
+
+if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:  # pragma: no cover - optional, metrics are no-ops without it
+    prometheus_client = None
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 5)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+FETCH_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+
+class _NoMetric:
+    """Stands in for a metric when prometheus_client is not installed"""
+
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+
+def _metric(kind, name, documentation, labels=(), **kwargs):
+    if prometheus_client is None:
+        return _NoMetric()
+    return getattr(prometheus_client, kind)(name, documentation, labels, **kwargs)
+
+
+REQUEST_LATENCY = _metric('Histogram', 'comparaid_http_request_duration_seconds', 'HTTP request latency',
+                          ('method', 'endpoint', 'status'), buckets=LATENCY_BUCKETS)
+REQUEST_QUERIES = _metric('Histogram', 'comparaid_db_queries_per_request', 'SQL statements run per HTTP request',
+                          ('endpoint',), buckets=COUNT_BUCKETS)
+REQUEST_DB_SECONDS = _metric('Histogram', 'comparaid_db_request_seconds', 'SQL time per HTTP request',
+                             ('endpoint',), buckets=LATENCY_BUCKETS)
+QUERY_SECONDS = _metric('Histogram', 'comparaid_db_query_duration_seconds', 'Duration of each SQL statement',
+                        buckets=QUERY_BUCKETS)
+RESPONSE_CACHE = _metric('Counter', 'comparaid_response_cache_requests_total', 'Response cache lookups',
+                         ('result',))
+HTTP_CACHE = _metric('Counter', 'comparaid_scraper_http_cache_total', 'HTTP scrape cache outcomes', ('event',))
+HTTP_CACHE_BYTES = _metric('Counter', 'comparaid_scraper_http_cache_bytes_total',
+                           'Bytes downloaded and saved by the HTTP scrape cache', ('kind',))
+FETCH_LATENCY = _metric('Histogram', 'comparaid_scraper_fetch_duration_seconds', 'Store page fetch latency',
+                        ('store', 'method'), buckets=FETCH_BUCKETS)
+FETCH_BYTES = _metric('Counter', 'comparaid_scraper_fetch_bytes_total', 'Response bytes downloaded from stores',
+                      ('store',))
+FETCH_ERRORS = _metric('Counter', 'comparaid_scraper_fetch_errors_total', 'Failed store page fetches',
+                       ('store', 'reason'))
+INGESTED = _metric('Counter', 'comparaid_ingested_products_total', 'Scraped products ingested, by outcome',
+                   ('store', 'outcome'))
+INGEST_SECONDS = _metric('Histogram', 'comparaid_ingestion_duration_seconds', 'Time to ingest a result set',
+                         ('store',), buckets=LATENCY_BUCKETS)
+INGEST_RATE = _metric('Gauge', 'comparaid_ingestion_rows_per_second', 'Rows per second of the latest result set',
+                      ('store',), multiprocess_mode='mostrecent')
+
+
+def registry():
+    """The registry to expose: every process's samples in multiprocess mode"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        collector_registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(collector_registry)
+        return collector_registry
+    return prometheus_client.REGISTRY
+
+
+def start_metrics_server():
+    """Serve /metrics on METRICS_PORT from a non-web process (scheduler, Celery worker)"""
+    port = os.getenv('METRICS_PORT')
+    if not port or prometheus_client is None:
+        return
+    try:
+        prometheus_client.start_http_server(int(port), registry=registry())
+        logger.info(f"Serving metrics on port {port}")
+    except OSError as e:
+        logger.error(f"Could not serve metrics on port {port}: {e}")
+
+
+def record_ingestion(store_name, stats, seconds):
+    """Count one result set's ingestion outcome"""
+    for outcome in ('inserted', 'updated', 'rejected', 'failed', 'deactivated'):
+        if stats.get(outcome):
+            INGESTED.labels(store_name, outcome).inc(stats[outcome])
+    INGEST_SECONDS.labels(store_name).observe(seconds)
+    rows = stats['inserted'] + stats['updated']
+    if rows and seconds > 0:
+        INGEST_RATE.labels(store_name).set(rows / seconds)
+
+
+def _timings():
+    """The current request's timing totals, or None outside a request"""
+    return g.get('timings') if has_request_context() else None
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to the request's `phase` total"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _timings()
+        if timings is not None:
+            timings[phase] += time.perf_counter() - started
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, counting encoding time as serialization"""
+
+    def dumps(self, obj, **kwargs):
+        with timed('serialize'):
+            return super().dumps(obj, **kwargs)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    QUERY_SECONDS.observe(elapsed)
+    timings = _timings()
+    if timings is not None:
+        timings['db'] += elapsed
+        timings['queries'] += 1
+
+
+def _before_render(sender, template, context, **extra):
+    timings = _timings()
+    if timings is not None:
+        timings['render_started'] = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    timings = _timings()
+    if timings is not None and timings.get('render_started'):
+        timings['render'] += time.perf_counter() - timings.pop('render_started')
+
+
+class Metrics:
+    """Request instrumentation and the /metrics endpoint"""
+
+    def __init__(self, app=None):
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('SERVER_TIMING', False)
+        app.json = TimedJSONProvider(app)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        before_render_template.connect(_before_render, app)
+        template_rendered.connect(_after_render, app)
+        if app.config['METRICS_ENABLED']:
+            app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        if not self._listening:
+            # On the Engine class, so every engine and connection is covered
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            self._listening = True
+        app.extensions['metrics'] = self
+
+    @staticmethod
+    def metrics_view():
+        if prometheus_client is None:
+            return Response('prometheus_client is not installed\n', status=501, mimetype='text/plain')
+        return Response(prometheus_client.generate_latest(registry()),
+                        content_type=prometheus_client.CONTENT_TYPE_LATEST)
+
+    @staticmethod
+    def _start():
+        g.timings = {'started': time.perf_counter(), 'db': 0.0, 'queries': 0, 'serialize': 0.0, 'render': 0.0}
+
+    @staticmethod
+    def _finish(response):
+        timings = g.pop('timings', None)
+        if timings is None:
+            return response
+        total = time.perf_counter() - timings['started']
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_LATENCY.labels(request.method, endpoint, response.status_code).observe(total)
+        REQUEST_QUERIES.labels(endpoint).observe(timings['queries'])
+        REQUEST_DB_SECONDS.labels(endpoint).observe(timings['db'])
+
+        if current_app.config['SERVER_TIMING'] or current_app.debug:
+            response.headers['Server-Timing'] = ', '.join((
+                f'db;dur={timings["db"] * 1000:.1f};desc="{timings["queries"]} queries"',
+                f'serialize;dur={timings["serialize"] * 1000:.1f}',
+                f'render;dur={timings["render"] * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ))
+        return response
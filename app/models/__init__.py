@@ -1,5 +1,13 @@
 from .product import Product
 from .store import Store
-from .price_history import PriceHistory
+from .price_history import PriceHistory, PriceHistoryRollup
+from .price_summary import PriceSummary
+from .scheduler_state import SchedulerState
+from .scrape_ledger import ScrapeCycle, ScrapeJob
+from .search_demand import SearchDemand
+from .canonical_product import CanonicalProduct, CanonicalBand
+from .archive import ArchivedProduct, ArchivedPriceHistory
 
-__all__ = ['Product', 'Store', 'PriceHistory']
\ No newline at end of file
+__all__ = ['Product', 'Store', 'PriceHistory', 'PriceHistoryRollup', 'PriceSummary', 'SchedulerState', 'ScrapeCycle',
+           'ScrapeJob', 'SearchDemand', 'CanonicalProduct', 'CanonicalBand', 'ArchivedProduct',
+           'ArchivedPriceHistory']
\ No newline at end of file
@@ -0,0 +1,43 @@
+from app import db
+from datetime import datetime
+
+class ArchivedProduct(db.Model):
+    """A product deactivated long ago, moved out of the products table.
+
+    Written by app.archive; keeps the product's original id so its archived
+    history still joins to it.
+    """
+    __tablename__ = 'archived_products'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(200), nullable=False)
+    brand = db.Column(db.String(100))
+    category = db.Column(db.String(100))
+    store_id = db.Column(db.Integer, nullable=False, index=True)
+    price = db.Column(db.Float, nullable=False)
+    unit = db.Column(db.String(50))
+    quantity = db.Column(db.Float)
+    base_unit = db.Column(db.String(10))
+    price_per_unit = db.Column(db.Float)
+    store_url = db.Column(db.String(500))
+    search_term = db.Column(db.String(100), nullable=False)
+    canonical_id = db.Column(db.Integer)
+    last_updated = db.Column(db.DateTime)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
+class ArchivedPriceHistory(db.Model):
+    """Raw price changes and rollup buckets of archived products.
+
+    Raw rows carry only a price; rollup rows ('day', 'week') keep their
+    bucket start as recorded_at, the close as price, and min/max.
+    """
+    __tablename__ = 'archived_price_history'
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, nullable=False, index=True)
+    resolution = db.Column(db.String(10), nullable=False, default='raw')
+    recorded_at = db.Column(db.DateTime, nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    min_price = db.Column(db.Float)
+    max_price = db.Column(db.Float)
@@ -0,0 +1,99 @@
+from app import db
+from datetime import datetime
+
+class CanonicalProduct(db.Model):
+    """One real-world item, grouping the equivalent product rows of each store.
+
+    Products are assigned by app.matching on ingest: same parsed size and
+    a close enough name, at most one product per store.
+    """
+    __tablename__ = 'canonical_products'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    # Normalized name tokens (no store names or sizes) the match compares against
+    key_tokens = db.Column(db.String(200), nullable=False)
+    quantity = db.Column(db.Float)
+    base_unit = db.Column(db.String(10))
+    search_term = db.Column(db.String(100), index=True)
+    product_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    products = db.relationship('Product', backref='canonical', lazy='dynamic')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'quantity': self.quantity,
+            'base_unit': self.base_unit,
+            'product_count': self.product_count
+        }
+
+    @classmethod
+    def compare(cls, search_query, limit=20):
+        """Canonical products matching a search, each with every store's price.
+
+        One statement: the search picks the matching canonical ids in a
+        subquery, and the outer query joins their products and stores
+        through the products.canonical_id index. Products sold by more
+        stores come first, then the cheapest.
+        """
+        from app.models import Product, Store
+
+        matches = Product.search_query(search_query).filter(
+            Product.canonical_id.isnot(None)
+        ).with_entities(Product.canonical_id).limit(limit * 5).subquery()
+
+        rows = db.session.query(
+            cls.id, cls.name, cls.quantity, cls.base_unit,
+            Product.id.label('product_id'), Product.name.label('product_name'), Store.name.label('store'),
+            Product.price, Product.price_per_unit, Product.promotion, Product.store_url, Product.last_updated
+        ).join(Product, Product.canonical_id == cls.id).join(Store, Store.id == Product.store_id).filter(
+            cls.id.in_(db.select(matches.c.canonical_id)),
+            Product.is_active == True
+        ).order_by(cls.id, Product.price).all()
+
+        grouped = {}
+        for row in rows:
+            entry = grouped.get(row.id)
+            if entry is None:
+                entry = grouped[row.id] = {
+                    'canonical_id': row.id,
+                    'name': row.name,
+                    'quantity': row.quantity,
+                    'base_unit': row.base_unit,
+                    'stores': []
+                }
+            entry['stores'].append({
+                'store': row.store,
+                'product_id': row.product_id,
+                'name': row.product_name,
+                'price': row.price,
+                'price_per_unit': row.price_per_unit,
+                'promotion': row.promotion,
+                'store_url': row.store_url,
+                'last_updated': row.last_updated.isoformat()
+            })
+
+        results = list(grouped.values())
+        for entry in results:
+            # Rows arrive cheapest first within each canonical product
+            entry['store_count'] = len(entry['stores'])
+            entry['cheapest_store'] = entry['stores'][0]['store']
+            entry['price_spread'] = round(entry['stores'][-1]['price'] - entry['stores'][0]['price'], 2)
+        results.sort(key=lambda entry: (-entry['store_count'], entry['stores'][0]['price']))
+        return results[:limit]
+
+
+class CanonicalBand(db.Model):
+    """LSH blocking index: each canonical product under each of its band keys.
+
+    A band key combines the parsed size with one band of the name's
+    MinHash signature, so a new product is only compared against canonical
+    products of the same size that share at least one band.
+    """
+    __tablename__ = 'canonical_bands'
+
+    band_key = db.Column(db.String(64), primary_key=True)
+    canonical_id = db.Column(db.Integer, db.ForeignKey('canonical_products.id'), primary_key=True, index=True)
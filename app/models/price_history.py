@@ -1,8 +1,14 @@
 from app import db
 from datetime import datetime
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateTable
 
 class PriceHistory(db.Model):
     __tablename__ = 'price_history'
+    __table_args__ = (
+        # Per-product history lookups are range scans on this index
+        db.Index('ix_price_history_product_recorded', 'product_id', 'recorded_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
@@ -16,4 +22,44 @@ class PriceHistory(db.Model):
     def record_price(cls, product_id, price):
         history = cls(product_id=product_id, price=price)
         db.session.add(history)
-        return history
\ No newline at end of file
+        return history
+
+class PriceHistoryRollup(db.Model):
+    """Daily or weekly min/max/close of a product's price.
+
+    Built by app.timeseries.rollup_price_history from raw PriceHistory rows
+    that have aged out of the raw retention window.
+    """
+    __tablename__ = 'price_history_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('product_id', 'resolution', 'bucket_start',
+                            name='uq_price_history_rollups_bucket'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.id'), nullable=False)
+    resolution = db.Column(db.String(10), nullable=False)
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    min_price = db.Column(db.Float, nullable=False)
+    max_price = db.Column(db.Float, nullable=False)
+    close_price = db.Column(db.Float, nullable=False)
+    samples = db.Column(db.Integer, nullable=False, default=1)
+
+    def to_dict(self):
+        return {
+            'recorded_at': self.bucket_start.isoformat(),
+            'resolution': self.resolution,
+            'price': self.close_price,
+            'min': self.min_price,
+            'max': self.max_price
+        }
+
+@compiles(CreateTable, 'postgresql')
+def _create_price_history_partitioned(element, compiler, **kw):
+    """Create price_history as a table partitioned by month on PostgreSQL"""
+    sql = compiler.visit_create_table(element, **kw)
+    if element.element.name != PriceHistory.__tablename__:
+        return sql
+    # A partitioned table's primary key must include the partition key
+    sql = sql.replace('PRIMARY KEY (id)', 'PRIMARY KEY (id, recorded_at)')
+    return sql.rstrip() + ' PARTITION BY RANGE (recorded_at)\n\n'
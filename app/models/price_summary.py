@@ -0,0 +1,161 @@
+from app import db
+from app.models.product import Product
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import datetime
+
+_UPSERT_DIALECTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+class PriceSummary(db.Model):
+    """Precomputed price aggregates per store, category and search term.
+
+    Rows are rebuilt by the ingestion path whenever it writes a store/term
+    result set, so stats pages read a handful of indexed rows instead of
+    aggregating the products table on every request.
+    """
+    __tablename__ = 'price_summaries'
+    __table_args__ = (
+        db.UniqueConstraint('scope', 'key', name='uq_price_summaries_scope_key'),
+    )
+
+    SCOPES = ('all', 'store', 'store_term', 'category', 'search_term')
+
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(20), nullable=False)
+    # Wide enough for '<store_id>:' plus a full 100 character search term
+    key = db.Column(db.String(120), nullable=False)
+    product_count = db.Column(db.Integer, nullable=False, default=0)
+    store_count = db.Column(db.Integer, nullable=False, default=0)
+    min_price = db.Column(db.Float)
+    max_price = db.Column(db.Float)
+    avg_price = db.Column(db.Float)
+    last_updated = db.Column(db.DateTime)
+    refreshed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'product_count': self.product_count,
+            'store_count': self.store_count,
+            'price_range': {
+                'min': self.min_price or 0,
+                'max': self.max_price or 0,
+                'avg': round(self.avg_price, 2) if self.avg_price else 0
+            },
+            'last_updated': self.last_updated.isoformat() if self.last_updated else None
+        }
+
+    @classmethod
+    def get(cls, scope, key='*'):
+        return cls.query.populate_existing().filter_by(scope=scope, key=str(key)).first()
+
+    @classmethod
+    def for_scope(cls, scope, keys=None):
+        # Rows are written with core upserts, so reload any already in the session
+        query = cls.query.populate_existing().filter(cls.scope == scope, cls.product_count > 0)
+        if keys is not None:
+            query = query.filter(cls.key.in_([str(key) for key in keys]))
+        return query.all()
+
+    @classmethod
+    def refresh(cls, store_id, search_term, categories=()):
+        """Recompute the summaries affected by one store/search term refresh.
+
+        Only that store/term's products are aggregated; the store and overall
+        totals are combined from the smaller summaries above them.
+        """
+        active = Product.query.filter(Product.is_active == True)
+        cls._aggregate(
+            active.filter(Product.store_id == store_id, Product.search_term == search_term),
+            'store_term', f'{store_id}:{search_term}'
+        )
+        cls._aggregate(active.filter(Product.search_term == search_term), 'search_term', search_term)
+        for category in categories:
+            if category:
+                cls._aggregate(active.filter(Product.category == category), 'category', category)
+
+        store_terms = cls.query.populate_existing().filter(
+            cls.scope == 'store_term', cls.key.like(f'{store_id}:%')
+        ).all()
+        cls._combine(store_terms, 'store', store_id)
+        cls._combine(cls.for_scope('store'), 'all', '*', store_count=True)
+
+    @classmethod
+    def rebuild(cls):
+        """Recompute every summary from the products table"""
+        cls.query.delete()
+        pairs = db.session.query(
+            Product.store_id, Product.search_term
+        ).filter(Product.is_active == True).distinct().all()
+        categories = {category for category, in db.session.query(Product.category).filter(
+            Product.is_active == True, Product.category.isnot(None)
+        ).distinct()}
+        for store_id, search_term in pairs:
+            cls.refresh(store_id, search_term, categories)
+            categories = ()
+        if not pairs:
+            cls._combine([], 'all', '*')
+
+    @classmethod
+    def _aggregate(cls, query, scope, key):
+        count, store_count, min_price, max_price, avg_price, last_updated = query.with_entities(
+            db.func.count(Product.id),
+            db.func.count(db.func.distinct(Product.store_id)),
+            db.func.min(Product.price),
+            db.func.max(Product.price),
+            db.func.avg(Product.price),
+            db.func.max(Product.last_updated)
+        ).one()
+        cls._upsert(scope, key, count, store_count, min_price, max_price, avg_price, last_updated)
+
+    @classmethod
+    def _combine(cls, parts, scope, key, store_count=False):
+        """Merge finer-grained summaries into one row"""
+        parts = [part for part in parts if part.product_count]
+        count = sum(part.product_count for part in parts)
+        cls._upsert(
+            scope, key, count, len(parts) if store_count else min(count, 1),
+            min((part.min_price for part in parts), default=None),
+            max((part.max_price for part in parts), default=None),
+            sum(part.avg_price * part.product_count for part in parts) / count if count else None,
+            max((part.last_updated for part in parts if part.last_updated), default=None)
+        )
+
+    @classmethod
+    def _upsert(cls, scope, key, count, store_count, min_price, max_price, avg_price, last_updated):
+        """Write one summary row; concurrent ingest workers may refresh the same row"""
+        values = {
+            'scope': scope,
+            'key': str(key),
+            'product_count': count,
+            'store_count': store_count,
+            'min_price': min_price,
+            'max_price': max_price,
+            'avg_price': float(avg_price) if avg_price is not None else None,
+            'last_updated': last_updated,
+            'refreshed_at': datetime.utcnow()
+        }
+        connection = db.session.connection()
+        dialect_insert = _UPSERT_DIALECTS.get(connection.dialect.name)
+        if dialect_insert is None:
+            cls._upsert_portable(values)
+            return
+
+        stmt = dialect_insert(cls.__table__).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['scope', 'key'],
+            set_={name: stmt.excluded[name] for name in values if name not in ('scope', 'key')}
+        )
+        connection.execute(stmt)
+
+    @classmethod
+    def _upsert_portable(cls, values):
+        """Fallback for databases without ON CONFLICT support"""
+        summary = cls.get(values['scope'], values['key'])
+        if summary is None:
+            summary = cls(scope=values['scope'], key=values['key'])
+            db.session.add(summary)
+        for name, value in values.items():
+            setattr(summary, name, value)
+        db.session.flush()
@@ -3,17 +3,46 @@ from datetime import datetime
 
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        # One row per product per store; bulk ingestion upserts on this key
+        db.Index('uq_products_store_name', 'store_id', 'name', unique=True),
+        # Keyset pagination of category listings seeks on (price, id)
+        db.Index('ix_products_category_price', 'category', 'price', 'id'),
+        # ?sort=value seeks on (base_unit, price_per_unit, id), per category or overall
+        db.Index('ix_products_category_value', 'category', 'base_unit', 'price_per_unit', 'id'),
+        db.Index('ix_products_value', 'base_unit', 'price_per_unit', 'id'),
+        # Partial indexes over live rows only, so deactivated products cost
+        # the per-term summaries, basket lookups, stale sweeps and trending
+        # nothing. SQLite only uses them when the predicate is written the
+        # way queries spell it, is_active = 1
+        db.Index('ix_products_active_term', 'search_term', 'store_id',
+                 sqlite_where=db.text('is_active = 1'), postgresql_where=db.text('is_active')),
+        db.Index('ix_products_active_updated', 'last_updated',
+                 sqlite_where=db.text('is_active = 1'), postgresql_where=db.text('is_active')),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False, index=True)
+    brand = db.Column(db.String(100))
+    category = db.Column(db.String(100), index=True)
+    promotion = db.Column(db.String(200))
     store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), nullable=False)
     price = db.Column(db.Float, nullable=False)
     unit = db.Column(db.String(50))
+    # Parsed from unit by app.units: the pack size in kg, litres or items,
+    # and the price per one of those
+    quantity = db.Column(db.Float)
+    base_unit = db.Column(db.String(10))
+    price_per_unit = db.Column(db.Float)
     image_url = db.Column(db.String(500))
     store_url = db.Column(db.String(500))
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     search_term = db.Column(db.String(100), nullable=False, index=True)
     is_active = db.Column(db.Boolean, default=True)
+    # Generation (epoch ms) of the ingestion run that last returned this
+    # product; app.ingestion deactivates rows left unstamped for too long
+    seen_generation = db.Column(db.BigInteger)
+    canonical_id = db.Column(db.Integer, db.ForeignKey('canonical_products.id'), index=True)
     
     # Relationships
     store = db.relationship('Store', backref='products')
@@ -25,20 +54,68 @@ class Product(db.Model):
             'store': self.store.name,
             'price': self.price,
             'unit': self.unit or 'each',
+            'quantity': self.quantity,
+            'base_unit': self.base_unit,
+            'price_per_unit': self.price_per_unit,
             'image_url': self.image_url,
             'store_url': self.store_url,
             'last_updated': self.last_updated.isoformat()
         }
     
+    @classmethod
+    def search_query(cls, query):
+        from app.search import apply_search
+        return apply_search(cls.query.filter(cls.is_active == True), query, cls)
+    
     @classmethod
     def search_products(cls, query, limit=50):
+        return cls.search_query(query).limit(limit).all()
+    
+    @classmethod
+    def cheapest_by_store(cls, queries):
+        """Each search's top product at every store, for many searches at once.
+        
+        One statement: every search is a UNION ALL branch tagged with its
+        position, and a row_number() window over (search, store) keeps the
+        row /api/prices would list first for that store (best match, then
+        cheapest). Returns one serialized list per query, cheapest first.
+        """
+        from app.models import Store
+        from app.search import search_relevance
+        from app.serializers import PRODUCT_COLUMNS, serialize_product
+        from sqlalchemy import Float, literal, select, union_all
+    
+        branches = []
+        for position, search in enumerate(queries):
+            query, relevance = search_relevance(cls.query.filter(cls.is_active == True), search, cls)
+            if relevance is None:
+                relevance = literal(0.0, Float)
+            branches.append(query.join(Store, Store.id == cls.store_id).with_entities(
+                literal(position).label('position'), relevance.label('relevance'), *PRODUCT_COLUMNS
+            ).statement)
+        if not branches:
+            return []
+    
+        matches = (branches[0] if len(branches) == 1 else union_all(*branches)).subquery()
+        rank = db.func.row_number().over(
+            partition_by=(matches.c.position, matches.c.store),
+            order_by=(matches.c.relevance, matches.c.price, matches.c.id)
+        )
+        ranked = select(matches, rank.label('store_rank')).subquery()
+    
+        results = [[] for _ in queries]
+        for row in db.session.execute(
+            select(ranked).where(ranked.c.store_rank == 1).order_by(ranked.c.position, ranked.c.price, ranked.c.store)
+        ):
+            results[row.position].append(serialize_product(row))
+        return results
+    
+    @classmethod
+    def trending_query(cls):
         return cls.query.filter(
-            cls.search_term.ilike(f'%{query}%'),
             cls.is_active == True
-        ).order_by(cls.price.asc()).limit(limit).all()
+        ).order_by(cls.last_updated.desc())
     
     @classmethod
     def get_trending(cls, limit=10):
-        return cls.query.filter(
-            cls.is_active == True
-        ).order_by(cls.last_updated.desc()).limit(limit).all()
\ No newline at end of file
+        return cls.trending_query().limit(limit).all()
\ No newline at end of file
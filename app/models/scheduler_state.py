@@ -0,0 +1,99 @@
+from app import db
+from datetime import datetime, timedelta
+import os
+
+# A run whose leader has not refreshed its heartbeat for this long is
+# abandoned, and another leader may take the job over
+HEARTBEAT_STALE = timedelta(seconds=float(os.getenv('SCHEDULER_HEARTBEAT_STALE_SECONDS', 300)))
+
+class SchedulerState(db.Model):
+    """Last run of each scheduler job, written by the elected leader.
+
+    A restarted or newly elected leader reads this before running a job, so
+    it neither rescrapes data that is still fresh nor starts a cycle while
+    another leader's cycle is still in progress.
+
+    Every start() bumps `fence`. A run writes only while the row still
+    carries its fence (confirm()), so a leader that lost its lock cannot
+    overwrite the progress of the one that took the job over.
+    """
+    __tablename__ = 'scheduler_state'
+
+    job_id = db.Column(db.String(50), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='idle')
+    leader = db.Column(db.String(100))
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    last_success_at = db.Column(db.DateTime)
+    error = db.Column(db.Text)
+    fence = db.Column(db.Integer, default=0)
+    heartbeat_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id,
+            'status': self.status,
+            'leader': self.leader,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'last_success_at': self.last_success_at.isoformat() if self.last_success_at else None,
+            'error': self.error,
+            'fence': self.fence,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None
+        }
+
+    @classmethod
+    def get(cls, job_id):
+        state = db.session.get(cls, job_id)
+        if state is None:
+            state = cls(job_id=job_id, status='idle', fence=0)
+            db.session.add(state)
+            # Flushed so start() can bump the fence with an UPDATE
+            db.session.flush()
+        return state
+
+    @classmethod
+    def confirm(cls, job_id, fence):
+        """Refresh the heartbeat of the run holding `fence`, in the current transaction.
+
+        False once another leader has started the job since. On PostgreSQL
+        the row lock orders this against that leader's start().
+        """
+        result = db.session.execute(
+            db.update(cls).where(cls.job_id == job_id, cls.fence == fence, cls.status == 'running')
+            .values(heartbeat_at=datetime.utcnow())
+        )
+        return result.rowcount == 1
+
+    def due(self, interval, timeout, leader=None, now=None):
+        """Whether the job should run now; returns (due, reason).
+
+        A run left 'running' is resumed once its heartbeat is
+        HEARTBEAT_STALE old: until then its leader may still be finishing a
+        scrape after losing the lock.
+        """
+        now = now or datetime.utcnow()
+        if self.status == 'running' and self.started_at and now - self.started_at < timeout:
+            alive_at = self.heartbeat_at or self.started_at
+            if leader is not None and now - alive_at >= HEARTBEAT_STALE:
+                return True, None
+            return False, f"already running on {self.leader} since {self.started_at:%Y-%m-%d %H:%M}"
+        if self.last_success_at and now - self.last_success_at < interval:
+            return False, f"data still fresh (last success {self.last_success_at:%Y-%m-%d %H:%M})"
+        return True, None
+
+    def start(self, leader):
+        """Claim the job for `leader`; the new fence is readable after the commit"""
+        self.status = 'running'
+        self.leader = leader
+        self.started_at = self.heartbeat_at = datetime.utcnow()
+        self.error = None
+        # Incremented in SQL, so two leaders starting at once get different fences
+        self.fence = db.func.coalesce(SchedulerState.fence, 0) + 1
+
+    def finish(self, error=None):
+        self.status = 'failed' if error else 'finished'
+        self.finished_at = datetime.utcnow()
+        self.error = str(error)[:2000] if error else None
+        if not error:
+            self.last_success_at = self.finished_at
@@ -0,0 +1,220 @@
+from app import db
+from datetime import datetime, timedelta
+
+class ScrapeCycle(db.Model):
+    """One refresh of every (store, search term) pair.
+
+    Its ScrapeJob rows form a persisted ledger: an interrupted cycle is
+    resumed by running only the jobs that never finished, and the same rows
+    report progress and per-store throughput.
+    """
+    __tablename__ = 'scrape_cycles'
+
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='running', index=True)
+    leader = db.Column(db.String(100))
+    total_jobs = db.Column(db.Integer, nullable=False, default=0)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    resumed_count = db.Column(db.Integer, nullable=False, default=0)
+
+    jobs = db.relationship('ScrapeJob', backref='cycle', lazy='dynamic', cascade='all, delete-orphan')
+
+    @classmethod
+    def latest(cls):
+        return cls.query.order_by(cls.id.desc()).first()
+
+    @classmethod
+    def resume_or_start(cls, plan, leader=None):
+        """Resume the unfinished cycle if there is one, otherwise start a new one.
+
+        `plan` is called only for a new cycle and returns its (store, term)
+        pairs; a resumed cycle keeps the pairs it was planned with.
+        Returns (cycle, resumed).
+        """
+        cycle = cls.query.filter_by(status='running').order_by(cls.id.desc()).first()
+        if cycle is not None:
+            cycle.resumed_count += 1
+            cycle.leader = leader
+            db.session.commit()
+            return cycle, True
+
+        pairs = list(dict.fromkeys(plan()))
+        cycle = cls(status='running', leader=leader, started_at=datetime.utcnow(), total_jobs=len(pairs))
+        db.session.add(cycle)
+        db.session.flush()
+        if pairs:
+            db.session.execute(db.insert(ScrapeJob), [
+                {'cycle_id': cycle.id, 'store_name': store_name, 'search_term': term, 'status': 'pending'}
+                for store_name, term in pairs
+            ])
+        db.session.commit()
+        return cycle, False
+
+    def requeue(self, statuses=('failed',), stale_after=None, queued_after=None):
+        """Reset jobs back to pending.
+
+        Jobs in `statuses` are always reset. A running job is reset once it
+        started longer than `stale_after` ago, its worker presumably gone;
+        a queued job only after `queued_after`, since a long broker queue
+        is no sign that its message was lost. Returns the number of jobs reset.
+        """
+        conditions = [ScrapeJob.status.in_(statuses)] if statuses else []
+        now = datetime.utcnow()
+        if stale_after is not None:
+            conditions.append(db.and_(ScrapeJob.status == 'running', ScrapeJob.started_at < now - stale_after))
+        if queued_after is not None:
+            conditions.append(db.and_(ScrapeJob.status == 'queued', ScrapeJob.queued_at < now - queued_after))
+        if not conditions:
+            return 0
+        reset = ScrapeJob.query.filter(ScrapeJob.cycle_id == self.id, db.or_(*conditions)).update(
+            {'status': 'pending', 'queued_at': None, 'started_at': None}, synchronize_session=False
+        )
+        if reset and self.status != 'running':
+            self.status = 'running'
+            self.finished_at = None
+        db.session.commit()
+        return reset
+
+    def pending_pairs(self):
+        """(store, term) pairs still to run, in term order across stores"""
+        return db.session.query(ScrapeJob.store_name, ScrapeJob.search_term).filter(
+            ScrapeJob.cycle_id == self.id, ScrapeJob.status == 'pending'
+        ).order_by(ScrapeJob.id).all()
+
+    def mark_queued(self, pairs):
+        if not pairs:
+            return
+        now = datetime.utcnow()
+        for store_name, term in pairs:
+            ScrapeJob.query.filter_by(cycle_id=self.id, store_name=store_name, search_term=term).update(
+                {'status': 'queued', 'queued_at': now}, synchronize_session=False
+            )
+        db.session.commit()
+
+    def finish_if_complete(self):
+        """Close the cycle once no job is left to run"""
+        open_jobs = self.jobs.filter(ScrapeJob.status.in_(('pending', 'queued', 'running'))).count()
+        if open_jobs or self.status != 'running':
+            return False
+        failed = self.jobs.filter(ScrapeJob.status == 'failed').count()
+        self.status = 'failed' if failed == self.total_jobs and failed else 'finished'
+        self.finished_at = datetime.utcnow()
+        db.session.commit()
+        return True
+
+    def progress(self):
+        """Cycle totals plus per-store counts, timing and throughput"""
+        rows = db.session.query(
+            ScrapeJob.store_name,
+            ScrapeJob.status,
+            db.func.count(ScrapeJob.id),
+            db.func.coalesce(db.func.sum(ScrapeJob.item_count), 0),
+            db.func.coalesce(db.func.sum(ScrapeJob.duration), 0.0),
+            db.func.min(ScrapeJob.started_at),
+            db.func.max(ScrapeJob.finished_at)
+        ).filter(ScrapeJob.cycle_id == self.id).group_by(ScrapeJob.store_name, ScrapeJob.status).all()
+
+        stores = {}
+        totals = {status: 0 for status in ScrapeJob.STATUSES}
+        for store_name, status, count, items, seconds, first_start, last_finish in rows:
+            store = stores.setdefault(store_name, {
+                'jobs': {status: 0 for status in ScrapeJob.STATUSES},
+                'items': 0, 'busy_seconds': 0.0, 'first_started_at': None, 'last_finished_at': None
+            })
+            store['jobs'][status] = count
+            store['items'] += items
+            store['busy_seconds'] += seconds
+            if first_start and (store['first_started_at'] is None or first_start < store['first_started_at']):
+                store['first_started_at'] = first_start
+            if last_finish and (store['last_finished_at'] is None or last_finish > store['last_finished_at']):
+                store['last_finished_at'] = last_finish
+            totals[status] += count
+
+        now = datetime.utcnow()
+        for store in stores.values():
+            completed = store['jobs']['done'] + store['jobs']['failed']
+            start, end = store.pop('first_started_at'), store.pop('last_finished_at')
+            wall = ((end or now) - start).total_seconds() if start else 0.0
+            store['busy_seconds'] = round(store['busy_seconds'], 2)
+            store['avg_job_seconds'] = round(store['busy_seconds'] / completed, 2) if completed else None
+            store['jobs_per_minute'] = round(completed * 60 / wall, 2) if wall else None
+            store['items_per_second'] = round(store['items'] / wall, 2) if wall else None
+
+        completed = totals['done'] + totals['failed']
+        elapsed = ((self.finished_at or now) - self.started_at).total_seconds()
+        remaining = self.total_jobs - completed
+        eta = elapsed / completed * remaining if completed and remaining and self.status == 'running' else None
+        return {
+            'cycle_id': self.id,
+            'status': self.status,
+            'leader': self.leader,
+            'started_at': self.started_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'resumed_count': self.resumed_count,
+            'total_jobs': self.total_jobs,
+            'jobs': totals,
+            'percent_complete': round(100.0 * completed / self.total_jobs, 1) if self.total_jobs else 100.0,
+            'elapsed_seconds': round(elapsed, 1),
+            'eta_seconds': round(eta, 1) if eta is not None else None,
+            'stores': stores
+        }
+
+
+class ScrapeJob(db.Model):
+    """Ledger entry for one (store, search term) pair within a cycle"""
+    __tablename__ = 'scrape_jobs'
+    __table_args__ = (
+        db.UniqueConstraint('cycle_id', 'store_name', 'search_term', name='uq_scrape_jobs_cycle_pair'),
+        db.Index('ix_scrape_jobs_cycle_status', 'cycle_id', 'status'),
+        db.Index('ix_scrape_jobs_finished', 'finished_at'),
+    )
+
+    STATUSES = ('pending', 'queued', 'running', 'done', 'failed')
+
+    id = db.Column(db.Integer, primary_key=True)
+    cycle_id = db.Column(db.Integer, db.ForeignKey('scrape_cycles.id'), nullable=False)
+    store_name = db.Column(db.String(50), nullable=False)
+    search_term = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    queued_at = db.Column(db.DateTime)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    duration = db.Column(db.Float)
+    item_count = db.Column(db.Integer)
+    error = db.Column(db.Text)
+
+    @classmethod
+    def find(cls, cycle_id, store_name, search_term):
+        return cls.query.filter_by(cycle_id=cycle_id, store_name=store_name, search_term=search_term).first()
+
+    @classmethod
+    def mark_started(cls, cycle_id, store_name, search_term):
+        """start() the pair's job, if the cycle has one; the caller commits"""
+        job = cls.find(cycle_id, store_name, search_term)
+        if job is not None:
+            job.start()
+        return job
+
+    def start(self):
+        self.status = 'running'
+        self.attempts += 1
+        self.started_at = datetime.utcnow()
+        self.error = None
+
+    def finish(self, item_count=None, error=None, seconds=None):
+        """Record the outcome; `seconds` is the scrape time measured by the worker"""
+        self.finished_at = datetime.utcnow()
+        if self.status != 'running':
+            # Finished without a start() call, e.g. by the in-process engine
+            self.attempts += 1
+            self.started_at = None
+        if seconds is not None:
+            self.duration = seconds
+            self.started_at = self.started_at or self.finished_at - timedelta(seconds=seconds)
+        elif self.started_at:
+            self.duration = (self.finished_at - self.started_at).total_seconds()
+        self.status = 'failed' if error else 'done'
+        self.item_count = item_count
+        self.error = str(error)[:2000] if error else None
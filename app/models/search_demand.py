@@ -0,0 +1,73 @@
+from app import db
+from datetime import datetime
+
+# Popularity halves every DEMAND_HALF_LIFE. Scores are stored as counts
+# weighted by 2 ** (half-lives since the start of the row's score period),
+# which grows over time, so each flush only adds to the stored value and
+# never has to decay it. A float would overflow after ~1000 half-lives, so
+# a new period starts every DEMAND_PERIOD_HALF_LIVES and the next flush
+# rescales the stored scores to it
+DEMAND_EPOCH = datetime(2024, 1, 1)
+DEMAND_HALF_LIFE_DAYS = 7.0
+DEMAND_PERIOD_HALF_LIVES = 52
+# Beyond this a term's popularity is zero to float precision anyway
+MAX_WEIGHT_EXPONENT = 1000.0
+
+
+def _half_lives(moment):
+    return (moment - DEMAND_EPOCH).total_seconds() / 86400.0 / DEMAND_HALF_LIFE_DAYS
+
+
+def score_period(moment):
+    """The score period `moment` falls in"""
+    return int(_half_lives(moment) // DEMAND_PERIOD_HALF_LIVES)
+
+
+def demand_weight(moment, period=None):
+    """Weight of a search at `moment` on the scale of `period` (by default its own)"""
+    if period is None:
+        period = score_period(moment)
+    exponent = _half_lives(moment) - period * DEMAND_PERIOD_HALF_LIVES
+    return 2.0 ** min(exponent, MAX_WEIGHT_EXPONENT)
+
+
+class SearchDemand(db.Model):
+    """How often each normalized search term is looked up, with time decay"""
+    __tablename__ = 'search_demand'
+
+    term = db.Column(db.String(100), primary_key=True)
+    search_count = db.Column(db.Integer, nullable=False, default=0)
+    score = db.Column(db.Float, nullable=False, default=0.0)
+    # NULL for rows scored before periods existed, which were on period 0's scale
+    score_period = db.Column(db.Integer)
+    first_searched_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_searched_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def popularity(self, now=None):
+        """Searches in the last half-life or so, older ones counting for less"""
+        return self.score / demand_weight(now or datetime.utcnow(), self.score_period or 0)
+
+    def to_dict(self, now=None):
+        return {
+            'term': self.term,
+            'search_count': self.search_count,
+            'popularity': round(self.popularity(now), 2),
+            'last_searched_at': self.last_searched_at.isoformat() if self.last_searched_at else None
+        }
+
+    @classmethod
+    def top(cls, limit=100, min_count=1):
+        """Most popular terms right now; score order is popularity order"""
+        return cls.query.filter(cls.search_count >= min_count).order_by(cls.score.desc()).limit(limit).all()
+
+    @classmethod
+    def rescale_scores(cls, period):
+        """Move scores stored on earlier periods' scales onto `period`'s"""
+        stored_period = db.func.coalesce(cls.score_period, 0)
+        stale = db.session.query(stored_period).filter(stored_period < period).distinct().all()
+        for old_period, in stale:
+            # Underflows to 0.0 for terms nobody has searched in many periods
+            factor = 2.0 ** ((old_period - period) * DEMAND_PERIOD_HALF_LIVES)
+            cls.query.filter(stored_period == old_period).update(
+                {cls.score: cls.score * factor, cls.score_period: period}, synchronize_session=False
+            )
@@ -4,5 +4,28 @@ from .supervalu import SuperValuScraper
 from .dunnes import DunnesScraper
 from .lidl import LidlScraper
 from .aldi import AldiScraper
+from .engine import ScrapeEngine, parse_concurrency
+from .rate_limit import HostRateLimiter, host_limiter
+from .http_cache import HttpCache, http_cache
+from .parsing import ListingSpec, parse_listing, parse_page
+from .browser import BrowserPool, browser_pool
+from .records import ScrapedProduct, validate_batch
 
-__all__ = ['BaseScraper', 'TescoScraper', 'SuperValuScraper', 'DunnesScraper', 'LidlScraper', 'AldiScraper']
\ No newline at end of file
+SCRAPERS = {
+    'Tesco': TescoScraper,
+    'SuperValu': SuperValuScraper,
+    'Dunnes': DunnesScraper,
+    'Lidl': LidlScraper,
+    'Aldi': AldiScraper
+}
+
+
+def build_scrapers():
+    """One scraper instance per configured store, keyed by store name"""
+    return {name: scraper_class() for name, scraper_class in SCRAPERS.items()}
+
+
+__all__ = ['BaseScraper', 'TescoScraper', 'SuperValuScraper', 'DunnesScraper', 'LidlScraper', 'AldiScraper',
+           'ScrapeEngine', 'parse_concurrency', 'HostRateLimiter', 'host_limiter',
+           'HttpCache', 'http_cache', 'ListingSpec', 'parse_listing', 'parse_page', 'BrowserPool', 'browser_pool',
+           'ScrapedProduct', 'validate_batch', 'SCRAPERS', 'build_scrapers']
\ No newline at end of file
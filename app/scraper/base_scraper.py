@@ -1,11 +1,18 @@
 import requests
-import time
 import logging
+import time
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional
+from urllib.parse import urlsplit
 import urllib3
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from .rate_limit import THROTTLE_STATUSES, host_limiter
+from .http_cache import http_cache
+from .parsing import ListingSpec, extract_price, parse_page
+from .browser import browser_pool
+from .records import ScrapedProduct
+from app.metrics import FETCH_BYTES, FETCH_ERRORS, FETCH_LATENCY
 
 # Disable SSL warnings for development
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -13,16 +20,23 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 logger = logging.getLogger(__name__)
 
 class BaseScraper(ABC):
+    # Attempts per URL while the host keeps answering 429/503
+    MAX_THROTTLED_ATTEMPTS = 4
+    # Selectors for the store's search results page, used by _parse_listing
+    listing: Optional[ListingSpec] = None
+    
     def __init__(self, store_name: str, delay: float = 1.0):
         self.store_name = store_name
         self.delay = delay
         self.session = requests.Session()
+        self.http_cache = http_cache
         
-        # Configure retry strategy
+        # Configure retry strategy; 429/503 are left to the shared rate limiter
         retry_strategy = Retry(
             total=3,
             backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
+            status_forcelist=[500, 502, 504],
+            respect_retry_after_header=False,
         )
         adapter = HTTPAdapter(max_retries=retry_strategy)
         self.session.mount("http://", adapter)
@@ -41,40 +55,119 @@ class BaseScraper(ABC):
         self.session.verify = False
     
     @abstractmethod
-    def search_products(self, query: str) -> List[Dict]:
+    def search_products(self, query: str) -> List[ScrapedProduct]:
         """Search for products and return standardized data"""
         pass
     
     def _make_request(self, url: str, **kwargs) -> Optional[requests.Response]:
-        """Make HTTP request with error handling and rate limiting"""
+        """Make HTTP request with error handling, rate limiting and caching"""
+        cache = self.http_cache
+        key = cache.key(url, kwargs.get('params')) if cache.enabled else None
+        if cache.mode == 'replay':
+            return cache.replay(key, url)
+        
+        entry = cache.load(key) if key else None
+        headers = kwargs.get('headers', {})
+        kwargs['headers'] = {**headers, **cache.conditional_headers(entry)}
+        host = self._host(url)
         try:
-            time.sleep(self.delay)
-            response = self.session.get(url, timeout=10, **kwargs)
-            response.raise_for_status()
-            return response
+            for _ in range(self.MAX_THROTTLED_ATTEMPTS):
+                host_limiter.acquire(host)
+                started = time.perf_counter()
+                response = self.session.get(url, timeout=10, **kwargs)
+                FETCH_LATENCY.labels(self.store_name, 'http').observe(time.perf_counter() - started)
+                FETCH_BYTES.labels(self.store_name).inc(len(response.content))
+                host_limiter.feedback(host, response.status_code, response.headers.get('Retry-After'))
+                if response.status_code == 304 and entry:
+                    cached = cache.revalidated(key, entry)
+                    if cached is not None:
+                        return cached
+                    # The body behind the 304 is gone: refetch it once, unconditionally
+                    cache.drop(key)
+                    entry = None
+                    kwargs['headers'] = headers
+                    continue
+                if response.status_code not in THROTTLE_STATUSES:
+                    response.raise_for_status()
+                    return cache.store(key, response, entry) if key else response
+            logger.error(f"Request failed for {self.store_name}: still throttled after "
+                         f"{self.MAX_THROTTLED_ATTEMPTS} attempts")
+            FETCH_ERRORS.labels(self.store_name, 'throttled').inc()
+            return None
         except requests.RequestException as e:
             logger.error(f"Request failed for {self.store_name}: {e}")
+            reason = 'http_status' if isinstance(e, requests.HTTPError) else 'request'
+            FETCH_ERRORS.labels(self.store_name, reason).inc()
             return None
     
-    def _standardize_product(self, raw_data: Dict) -> Dict:
-        """Convert raw scraper data to standard format"""
-        return {
-            'store': self.store_name,
-            'product': raw_data.get('name', '').strip(),
-            'price': float(raw_data.get('price', 0)),
-            'unit': raw_data.get('unit', '').strip(),
-            'url': raw_data.get('url', ''),
-            'image': raw_data.get('image', '')
-        }
+    def _fetch_products(self, url: str, parse: Callable[[requests.Response], List[ScrapedProduct]],
+                        **kwargs) -> List[ScrapedProduct]:
+        """Fetch a listing page and parse it, reusing the last parse if the page is unchanged"""
+        response = self._make_request(url, **kwargs)
+        if response is None:
+            return []
+        
+        key = getattr(response, 'cache_key', None)
+        if key and getattr(response, 'unchanged', False):
+            products = self.http_cache.parsed(key)
+            if products is not None:
+                return [ScrapedProduct.from_dict(product) for product in products]
+        
+        products = parse(response)
+        if key:
+            self.http_cache.save_parsed(key, [product.to_dict() for product in products])
+        return products
+    
+    def _render_page(self, url: str, wait_for: Optional[str] = None) -> Optional[str]:
+        """Load a JavaScript-rendered page in the shared browser pool and return its HTML"""
+        host = self._host(url)
+        try:
+            for _ in range(self.MAX_THROTTLED_ATTEMPTS):
+                host_limiter.acquire(host)
+                started = time.perf_counter()
+                status, headers, html = browser_pool().render(self.store_name, url, wait_for)
+                FETCH_LATENCY.labels(self.store_name, 'browser').observe(time.perf_counter() - started)
+                host_limiter.feedback(host, status or 200, headers.get('retry-after'))
+                if status not in THROTTLE_STATUSES:
+                    return html
+            logger.error(f"Render failed for {self.store_name}: still throttled after "
+                         f"{self.MAX_THROTTLED_ATTEMPTS} attempts")
+            FETCH_ERRORS.labels(self.store_name, 'throttled').inc()
+            return None
+        except Exception as e:
+            logger.error(f"Render failed for {self.store_name}: {e}")
+            FETCH_ERRORS.labels(self.store_name, 'render').inc()
+            return None
+    
+    def _fetch_rendered_products(self, url: str, wait_for: Optional[str] = None) -> List[ScrapedProduct]:
+        """Render a listing page in a browser and parse it with the store's listing selectors"""
+        html = self._render_page(url, wait_for or (self.listing.item if self.listing else None))
+        if not html:
+            return []
+        return [self._standardize_product(raw) for raw in parse_page(html.encode('utf-8'), self.listing, url)]
+    
+    def _parse_listing(self, response: requests.Response) -> List[ScrapedProduct]:
+        """Parse a search results page with the store's listing selectors, off this thread"""
+        return [self._standardize_product(raw) for raw in parse_page(response.content, self.listing, response.url)]
+    
+    def _host(self, url: str) -> str:
+        """Rate-limit key for a URL, registering the store's politeness rate"""
+        host = urlsplit(url).netloc
+        host_limiter.configure(host, 1 / self.delay if self.delay else 1000.0)
+        return host
+    
+    @property
+    def request_rate(self) -> Optional[float]:
+        """Current allowed requests per second to this store's site"""
+        base_url = getattr(self, 'base_url', None)
+        return host_limiter.rate(urlsplit(base_url).netloc) if base_url else None
+    
+    def _standardize_product(self, raw_data: Dict) -> ScrapedProduct:
+        """Convert raw scraper data to a product record"""
+        return ScrapedProduct.create(self.store_name, raw_data.get('name'), raw_data.get('price'),
+                                     raw_data.get('unit'), raw_data.get('url'), raw_data.get('image'),
+                                     raw_data.get('brand'), raw_data.get('category'), raw_data.get('promotion'))
     
     def _extract_price(self, price_text: str) -> float:
         """Extract numeric price from text"""
-        import re
-        if not price_text:
-            return 0.0
-        
-        # Remove currency symbols and extract number
-        price_match = re.search(r'[\d,]+\.?\d*', price_text.replace(',', ''))
-        if price_match:
-            return float(price_match.group())
-        return 0.0
\ No newline at end of file
+        return extract_price(price_text)
\ No newline at end of file
@@ -0,0 +1,248 @@
+"""Pooled headless browsers for stores that render products client-side.
+
+Launching Chromium costs seconds and a new page context hundreds of
+milliseconds, so BrowserPool keeps them for the life of the process:
+
+- A few long-lived browsers run on one asyncio loop in a background
+  thread. Scrape threads call render(), which queues the navigation on
+  that loop and waits for the HTML.
+- Each store gets one reusable browser context, with a route handler
+  that aborts images, media, fonts and analytics requests before they
+  hit the network.
+- Every store has its own cap on concurrent pages (BROWSER_CONCURRENCY,
+  same format as SCRAPER_CONCURRENCY). Politeness still comes from the
+  shared host_limiter.
+- Idle pages are reused. A page is closed after BROWSER_PAGE_RECYCLE
+  navigations, which bounds the renderer memory a long cycle builds up.
+- A browser that crashes or disconnects is relaunched on next use.
+"""
+from typing import Dict, Iterable, Optional, Tuple
+from urllib.parse import urlsplit
+import asyncio
+import concurrent.futures
+import atexit
+import logging
+import os
+import threading
+
+from .engine import parse_concurrency
+
+try:
+    from playwright.async_api import async_playwright
+except ImportError:  # pragma: no cover - optional, only JavaScript-rendered stores need it
+    async_playwright = None
+
+logger = logging.getLogger(__name__)
+
+BLOCKED_RESOURCE_TYPES = frozenset({'image', 'media', 'font'})
+# Analytics, tag managers and ad networks: matched against the request
+# host and every parent domain
+BLOCKED_HOSTS = frozenset({
+    'google-analytics.com', 'googletagmanager.com', 'doubleclick.net', 'googlesyndication.com',
+    'facebook.net', 'connect.facebook.net', 'hotjar.com', 'segment.io', 'segment.com',
+    'newrelic.com', 'nr-data.net', 'optimizely.com', 'clarity.ms', 'bing.com', 'tiktok.com',
+})
+NAVIGATION_TIMEOUT = float(os.getenv('BROWSER_TIMEOUT', 30))
+
+
+def should_block(resource_type: str, url: str, blocked_hosts: Iterable[str] = BLOCKED_HOSTS) -> bool:
+    """Whether a page's subrequest is skipped: heavy media or a tracking host"""
+    if resource_type in BLOCKED_RESOURCE_TYPES:
+        return True
+    host = (urlsplit(url).hostname or '').lower()
+    parts = host.split('.')
+    return any('.'.join(parts[i:]) in blocked_hosts for i in range(len(parts) - 1))
+
+
+class BrowserPool:
+    """Long-lived headless browsers shared by every scrape thread"""
+
+    def __init__(self, browsers: int = 1, concurrency: Optional[Dict[str, int]] = None,
+                 recycle_after: int = 50, block: bool = True, blocked_hosts: Iterable[str] = BLOCKED_HOSTS,
+                 headless: bool = True):
+        if async_playwright is None:
+            raise RuntimeError("playwright is not installed; pip install playwright && playwright install chromium")
+        self.browser_count = max(1, browsers)
+        self.concurrency = concurrency or {'*': 1}
+        self.recycle_after = max(1, recycle_after)
+        self.block = block
+        self.blocked_hosts = frozenset(blocked_hosts)
+        self.headless = headless
+        self.stats = {'navigations': 0, 'pages_opened': 0, 'pages_recycled': 0, 'blocked': 0,
+                      'browser_launches': 0, 'errors': 0}
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='browser-pool', daemon=True)
+        self._thread.start()
+        self._playwright = None
+        self._browsers = []
+        self._contexts = {}
+        self._idle = {}
+        self._navigations = {}
+        self._semaphores = {}
+        self._slots = {}
+        self._lock = None
+
+    def render(self, store_name: str, url: str, wait_for: Optional[str] = None,
+               timeout: float = NAVIGATION_TIMEOUT) -> Tuple[Optional[int], Dict[str, str], str]:
+        """Load a page and return (status, response headers, rendered HTML).
+
+        `wait_for` is a CSS selector that marks the product grid as
+        rendered. Blocks the calling thread, not the pool.
+        """
+        future = asyncio.run_coroutine_threadsafe(self._render(store_name, url, wait_for, timeout), self._loop)
+        try:
+            return future.result(timeout * 2 + 30)
+        except concurrent.futures.TimeoutError:
+            # Stop the navigation so it gives back the store's slot and page
+            future.cancel()
+            raise
+
+    def close(self):
+        """Close every page, context and browser, then stop the loop thread"""
+        if not self._loop.is_running():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), self._loop).result(60)
+        except Exception as e:
+            logger.error(f"Error closing browser pool: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(10)
+
+    async def _render(self, store_name, url, wait_for, timeout):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        semaphore = self._semaphores.get(store_name)
+        if semaphore is None:
+            workers = self.concurrency.get(store_name, self.concurrency.get('*', 1))
+            semaphore = self._semaphores[store_name] = asyncio.Semaphore(workers)
+
+        async with semaphore:
+            page = await self._page(store_name)
+            try:
+                response = await page.goto(url, wait_until='domcontentloaded', timeout=timeout * 1000)
+                if wait_for:
+                    await page.wait_for_selector(wait_for, timeout=timeout * 1000)
+                html = await page.content()
+                status, headers = (response.status, await response.all_headers()) if response else (None, {})
+            except (Exception, asyncio.CancelledError):
+                # A page left mid-navigation by an error or a cancelled render is not reused
+                self.stats['errors'] += 1
+                await self._close_page(page)
+                raise
+            self.stats['navigations'] += 1
+            await self._release(store_name, page)
+            return status, headers, html
+
+    async def _page(self, store_name):
+        """An idle page of the store's context, or a new one"""
+        idle = self._idle.setdefault(store_name, [])
+        while idle:
+            page = idle.pop()
+            if not page.is_closed():
+                return page
+            self._navigations.pop(page, None)
+        context = await self._context(store_name)
+        page = await context.new_page()
+        self._navigations[page] = 0
+        self.stats['pages_opened'] += 1
+        return page
+
+    async def _release(self, store_name, page):
+        self._navigations[page] = self._navigations.get(page, 0) + 1
+        if self._navigations[page] >= self.recycle_after:
+            self.stats['pages_recycled'] += 1
+            await self._close_page(page)
+        else:
+            self._idle.setdefault(store_name, []).append(page)
+
+    async def _close_page(self, page):
+        self._navigations.pop(page, None)
+        try:
+            await page.close()
+        except Exception as e:
+            logger.debug(f"Error closing page: {e}")
+
+    async def _context(self, store_name):
+        """The store's context, created on a connected browser on first use"""
+        async with self._lock:
+            context = self._contexts.get(store_name)
+            if context is not None and context.browser is not None and context.browser.is_connected():
+                return context
+            # The browser behind it went away, and its pages with it
+            self._idle.pop(store_name, None)
+
+            # Stores keep their browser slot, spreading them over the pool
+            browser = await self._browser(self._slots.setdefault(store_name, len(self._slots)))
+            context = await browser.new_context(
+                user_agent=('Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 '
+                            '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'),
+                locale='en-IE',
+                viewport={'width': 1280, 'height': 900},
+            )
+            if self.block:
+                await context.route('**/*', self._route)
+            self._contexts[store_name] = context
+            return context
+
+    async def _browser(self, index):
+        """Browser `index` modulo the pool size, launched or relaunched as needed"""
+        if self._playwright is None:
+            self._playwright = await async_playwright().start()
+        slot = index % self.browser_count
+        while len(self._browsers) <= slot:
+            self._browsers.append(None)
+        browser = self._browsers[slot]
+        if browser is None or not browser.is_connected():
+            if browser is not None:
+                logger.warning(f"Browser {slot} disconnected, relaunching")
+            browser = await self._playwright.chromium.launch(
+                headless=self.headless,
+                args=['--disable-dev-shm-usage', '--disable-extensions', '--disable-background-networking'],
+            )
+            self._browsers[slot] = browser
+            self.stats['browser_launches'] += 1
+        return browser
+
+    async def _route(self, route):
+        request = route.request
+        if should_block(request.resource_type, request.url, self.blocked_hosts):
+            self.stats['blocked'] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _close(self):
+        for context in self._contexts.values():
+            try:
+                await context.close()
+            except Exception as e:
+                logger.debug(f"Error closing browser context: {e}")
+        for browser in self._browsers:
+            if browser is not None and browser.is_connected():
+                await browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._contexts, self._idle, self._navigations, self._browsers = {}, {}, {}, []
+        self._playwright = None
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def browser_pool() -> BrowserPool:
+    """The process-wide browser pool, configured from the environment on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = BrowserPool(
+                browsers=int(os.getenv('BROWSER_POOL_SIZE', 1)),
+                concurrency=parse_concurrency(os.getenv('BROWSER_CONCURRENCY')),
+                recycle_after=int(os.getenv('BROWSER_PAGE_RECYCLE', 50)),
+                block=os.getenv('BROWSER_BLOCK_RESOURCES', 'true').lower() == 'true',
+                headless=os.getenv('BROWSER_HEADLESS', 'true').lower() == 'true',
+            )
+            atexit.register(_pool.close)
+        return _pool
+
@@ -0,0 +1,139 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from queue import SimpleQueue
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# How often run_pairs reports starts and polls should_continue while every
+# scrape is still in flight
+POLL_SECONDS = 1.0
+
+
+def parse_concurrency(value: Optional[str], default: int = 1) -> Dict[str, int]:
+    """Parse a SCRAPER_CONCURRENCY value such as '2' or 'Tesco=2,Aldi=1'"""
+    concurrency = {'*': default}
+    if not value:
+        return concurrency
+
+    for part in value.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '=' in part:
+            store, workers = part.split('=', 1)
+            concurrency[store.strip()] = max(1, int(workers))
+        else:
+            concurrency['*'] = max(1, int(part))
+    return concurrency
+
+
+class ScrapeEngine:
+    """Run every (store, search term) pair with one worker pool per store.
+
+    Stores are scraped in parallel while each store is capped at its own
+    worker count; the per-host rate itself is enforced by the shared
+    host_limiter, so a full refresh takes roughly as long as the slowest store.
+    """
+
+    def __init__(self, scrapers: Dict, concurrency: Optional[Dict[str, int]] = None):
+        self.scrapers = scrapers
+        self.concurrency = concurrency or {'*': 1}
+
+    def workers_for(self, store_name: str) -> int:
+        return self.concurrency.get(store_name, self.concurrency.get('*', 1))
+
+    def run(self, terms: Iterable[str],
+            on_result: Callable[[str, str, List[Dict], float], None],
+            on_error: Optional[Callable[[str, str, Exception, float], None]] = None) -> Dict[str, Dict]:
+        """Scrape all terms on all stores.
+
+        Callbacks run on the calling thread as results arrive, so database
+        writes stay on the thread that owns the app context. They receive
+        the seconds the scrape itself took.
+        """
+        # Interleave pairs so every store starts work immediately
+        pairs = [(store_name, term) for term in terms for store_name in self.scrapers]
+        return self.run_pairs(pairs, on_result, on_error)
+
+    def run_pairs(self, pairs: Iterable[Tuple[str, str]],
+                  on_result: Callable[[str, str, List[Dict], float], None],
+                  on_error: Optional[Callable[[str, str, Exception, float], None]] = None,
+                  should_continue: Optional[Callable[[], bool]] = None,
+                  on_start: Optional[Callable[[str, str], None]] = None) -> Dict[str, Dict]:
+        """Scrape an explicit list of (store, term) pairs, e.g. the rest of a resumed cycle.
+
+        `on_start` is called on the calling thread, within POLL_SECONDS of a
+        worker picking a pair up and always before its result.
+        `should_continue` is polled between results and at least every
+        POLL_SECONDS; once it returns False, pairs not yet started are
+        cancelled and results still arriving are dropped.
+        """
+        stats = {name: {'jobs': 0, 'products': 0, 'errors': 0, 'seconds': 0.0, 'rate': None}
+                 for name in self.scrapers}
+        executors = {name: ThreadPoolExecutor(max_workers=self.workers_for(name),
+                                              thread_name_prefix=f'scrape-{name}')
+                     for name in self.scrapers}
+        started = time.monotonic()
+        started_pairs = SimpleQueue()
+
+        try:
+            futures = {}
+            for store_name, term in pairs:
+                notify = (lambda pair=(store_name, term): started_pairs.put(pair)) if on_start else None
+                future = executors[store_name].submit(_timed, self.scrapers[store_name].search_products, term,
+                                                      notify)
+                futures[future] = (store_name, term)
+
+            def stopped():
+                return should_continue is not None and not should_continue()
+
+            pending = set(futures)
+            polling = should_continue is not None or on_start is not None
+            while pending and not stopped():
+                done, pending = wait(pending, timeout=POLL_SECONDS if polling else None,
+                                     return_when=FIRST_COMPLETED)
+                while on_start is not None and not started_pairs.empty():
+                    on_start(*started_pairs.get())
+                for future in done:
+                    if stopped():
+                        break
+                    store_name, term = futures[future]
+                    store_stats = stats[store_name]
+                    store_stats['jobs'] += 1
+                    store_stats['seconds'] = time.monotonic() - started
+                    products, seconds, error = future.result()
+                    if error is not None:
+                        store_stats['errors'] += 1
+                        if on_error:
+                            on_error(store_name, term, error, seconds)
+                        else:
+                            logger.error(f"Error scraping {store_name} for {term}: {error}")
+                        continue
+
+                    store_stats['products'] += len(products)
+                    on_result(store_name, term, products, seconds)
+
+            if pending:
+                logger.warning(f"Stopping early with {len(pending)} pairs not run")
+                for future in pending:
+                    future.cancel()
+        finally:
+            for executor in executors.values():
+                executor.shutdown(wait=True, cancel_futures=True)
+            for store_name, scraper in self.scrapers.items():
+                stats[store_name]['rate'] = getattr(scraper, 'request_rate', None)
+
+        return stats
+
+
+def _timed(search, term, notify=None):
+    """Run a scrape on a worker thread; returns (products, seconds, error)"""
+    if notify is not None:
+        notify()
+    started = time.perf_counter()
+    try:
+        return search(term), time.perf_counter() - started, None
+    except Exception as e:
+        return None, time.perf_counter() - started, e
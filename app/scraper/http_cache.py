@@ -0,0 +1,185 @@
+from requests.structures import CaseInsensitiveDict
+from typing import Dict, List, Optional
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import zlib
+import requests
+from app.metrics import HTTP_CACHE, HTTP_CACHE_BYTES
+
+logger = logging.getLogger(__name__)
+
+# off: no caching; on: revalidate and reuse; record: always refetch and
+# store (capture fixtures); replay: serve only from disk, never the network
+MODES = ('off', 'on', 'record', 'replay')
+
+# Headers worth replaying with a cached body
+KEPT_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+
+
+class HttpCache:
+    """Disk cache of scraper responses with conditional revalidation.
+
+    Each URL is stored as a small JSON metadata file plus a zlib-compressed
+    body. Revalidation sends If-None-Match / If-Modified-Since, and a 304
+    (or a 200 whose body hashes the same as last time) marks the response
+    `unchanged`, letting scrapers reuse the products parsed from it before.
+    """
+
+    def __init__(self, directory: str, mode: str = 'on'):
+        if mode not in MODES:
+            raise ValueError(f"Unknown HTTP cache mode: {mode}")
+        self.directory = directory
+        self.mode = mode
+        self._lock = threading.Lock()
+        self.stats = {'revalidated': 0, 'unchanged': 0, 'changed': 0, 'replayed': 0,
+                      'misses': 0, 'bytes_downloaded': 0, 'bytes_saved': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'off'
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+        if name.startswith('bytes_'):
+            HTTP_CACHE_BYTES.labels(name[len('bytes_'):]).inc(amount)
+        else:
+            HTTP_CACHE.labels(name).inc(amount)
+
+    def key(self, url: str, params=None) -> str:
+        full_url = requests.Request('GET', url, params=params).prepare().url
+        return hashlib.sha1(full_url.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    def _write(self, path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique per process and thread: workers may share the cache directory
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def load(self, key: str) -> Optional[Dict]:
+        """Metadata stored for a key, or None"""
+        try:
+            with open(self._path(key, '.json'), 'rb') as f:
+                return json.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable HTTP cache entry {key}: {e}")
+            return None
+
+    def drop(self, key: str):
+        """Forget a key, e.g. when its body can no longer be read"""
+        for suffix in ('.json', '.z'):
+            try:
+                os.remove(self._path(key, suffix))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove HTTP cache file for {key}: {e}")
+
+    def conditional_headers(self, entry: Optional[Dict]) -> Dict[str, str]:
+        if not entry or self.mode != 'on':
+            return {}
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def cached_response(self, key: str, entry: Dict) -> Optional[requests.Response]:
+        """Rebuild a Response from disk, marked unchanged"""
+        try:
+            with open(self._path(key, '.z'), 'rb') as f:
+                body = zlib.decompress(f.read())
+        except (OSError, zlib.error) as e:
+            logger.warning(f"Missing HTTP cache body for {entry.get('url')}: {e}")
+            return None
+
+        response = requests.Response()
+        response.status_code = 200
+        response._content = body
+        response.headers = CaseInsensitiveDict(entry.get('headers', {}))
+        response.encoding = entry.get('encoding')
+        response.url = entry.get('url')
+        response.cache_key = key
+        response.from_cache = True
+        response.unchanged = True
+        return response
+
+    def revalidated(self, key: str, entry: Dict) -> Optional[requests.Response]:
+        """Handle a 304 by serving the stored body, or None if it is gone"""
+        response = self.cached_response(key, entry)
+        if response is not None:
+            self._count('revalidated')
+            self._count('unchanged')
+            self._count('bytes_saved', entry.get('size', 0))
+        return response
+
+    def replay(self, key: str, url: str) -> Optional[requests.Response]:
+        entry = self.load(key)
+        if entry is None:
+            self._count('misses')
+            logger.warning(f"No recorded response for {url}")
+            return None
+        self._count('replayed')
+        return self.cached_response(key, entry)
+
+    def store(self, key: str, response: requests.Response, entry: Optional[Dict]) -> requests.Response:
+        """Save a fresh 200 response and mark whether its body actually changed"""
+        body = response.content
+        body_hash = hashlib.sha1(body).hexdigest()
+        unchanged = bool(entry) and entry.get('body_hash') == body_hash
+        self._count('bytes_downloaded', len(body))
+        self._count('unchanged' if unchanged else 'changed')
+
+        meta = {
+            'url': response.url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'headers': {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+            'encoding': response.encoding,
+            'body_hash': body_hash,
+            'size': len(body),
+            'stored_at': time.time(),
+            # Parsed products survive only while the body stays the same
+            'parsed': entry.get('parsed') if unchanged else None,
+        }
+        try:
+            if not unchanged:
+                self._write(self._path(key, '.z'), zlib.compress(body, 6))
+            self._write(self._path(key, '.json'), json.dumps(meta).encode('utf-8'))
+        except OSError as e:
+            logger.error(f"Could not write HTTP cache entry for {response.url}: {e}")
+
+        response.cache_key = key
+        response.from_cache = False
+        response.unchanged = unchanged
+        return response
+
+    def parsed(self, key: str) -> Optional[List[Dict]]:
+        entry = self.load(key)
+        return entry.get('parsed') if entry else None
+
+    def save_parsed(self, key: str, products: List[Dict]):
+        entry = self.load(key)
+        if entry is None:
+            return
+        entry['parsed'] = products
+        try:
+            self._write(self._path(key, '.json'), json.dumps(entry).encode('utf-8'))
+        except OSError as e:
+            logger.error(f"Could not write parsed products for {entry.get('url')}: {e}")
+
+
+http_cache = HttpCache(os.getenv('SCRAPER_HTTP_CACHE_DIR', '.http_cache'),
+                       os.getenv('SCRAPER_HTTP_CACHE', 'on'))
@@ -0,0 +1,181 @@
+"""Listing page parsing, off the scrape threads.
+
+A store describes its search results page once as a ListingSpec of CSS
+selectors. Selectors are compiled once per process and spec - to XPath
+with lxml, or with soupsieve for the BeautifulSoup fallback - and pages
+are parsed with lxml when it is installed (html.parser otherwise).
+
+Parsing a large page is CPU-bound and holds the GIL, which would stall
+the other stores' fetch threads. With SCRAPER_PARSE_PROCESSES > 0, pages
+are parsed in a process pool instead: a scrape thread hands over the
+page bytes and waits on the result without holding the GIL, so other
+threads keep fetching while pages are parsed in parallel.
+"""
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import urljoin
+import atexit
+import logging
+import multiprocessing
+import os
+import re
+import threading
+
+try:
+    import lxml.html
+    from lxml.cssselect import CSSSelector
+except ImportError:  # pragma: no cover - optional, parsing falls back to BeautifulSoup
+    lxml = None
+
+logger = logging.getLogger(__name__)
+
+_PRICE = re.compile(r'[\d,]+\.?\d*')
+_SPACE = re.compile(r'\s+')
+
+# 'lxml' or 'bs4'; lxml is used whenever it is installed
+PARSER = os.getenv('SCRAPER_PARSER') or ('lxml' if lxml is not None else 'bs4')
+PARSE_PROCESSES = int(os.getenv('SCRAPER_PARSE_PROCESSES') or 0)
+
+
+class ListingSpec(NamedTuple):
+    """CSS selectors for the products on a search results page.
+
+    `item` selects each product; the other selectors run inside it. Name,
+    price and unit are read as text, link and image as href and src.
+    """
+    item: str
+    name: str
+    price: str
+    unit: Optional[str] = None
+    link: Optional[str] = 'a[href]'
+    image: Optional[str] = 'img'
+
+
+def extract_price(price_text: str) -> float:
+    """Numeric price from text such as '€1,299.50' or '2.15 each'"""
+    if not price_text:
+        return 0.0
+    match = _PRICE.search(price_text.replace(',', ''))
+    return float(match.group()) if match else 0.0
+
+
+def _clean(text: Optional[str]) -> str:
+    return _SPACE.sub(' ', text).strip() if text else ''
+
+
+def _attr(element, *names) -> str:
+    """First non-empty attribute of an lxml element or BeautifulSoup tag"""
+    if element is None:
+        return ''
+    for name in names:
+        value = element.get(name)
+        if value:
+            return value
+    return ''
+
+
+@lru_cache(maxsize=64)
+def _compiled(spec: ListingSpec, parser: str):
+    """The spec's selectors, compiled once per process"""
+    if parser == 'lxml':
+        compile_selector = CSSSelector
+    else:
+        import soupsieve
+        compile_selector = soupsieve.compile
+    return spec._make(compile_selector(selector) if selector else None for selector in spec)
+
+
+def parse_listing(html: bytes, spec: ListingSpec, base_url: str = '', parser: str = None) -> List[Dict]:
+    """Raw product dicts (name, price, unit, url, image) from a listing page"""
+    if not html:
+        return []
+    parser = parser or PARSER
+    selectors = _compiled(spec, parser)
+
+    if parser == 'lxml':
+        root = lxml.html.fromstring(html)
+        items = selectors.item(root)
+
+        def first(item, selector):
+            found = selector(item) if selector is not None else None
+            return found[0] if found else None
+
+        def text(element):
+            return element.text_content() if element is not None else ''
+    else:
+        from bs4 import BeautifulSoup
+        root = BeautifulSoup(html, 'lxml' if lxml is not None else 'html.parser')
+        items = selectors.item.select(root)
+
+        def first(item, selector):
+            return selector.select_one(item) if selector is not None else None
+
+        def text(element):
+            return element.get_text(' ') if element is not None else ''
+
+    products = []
+    for item in items:
+        name = _clean(text(first(item, selectors.name)))
+        price = extract_price(text(first(item, selectors.price)))
+        if not name or not price:
+            continue
+        link = _attr(first(item, selectors.link), 'href')
+        image = _attr(first(item, selectors.image), 'src', 'data-src')
+        products.append({
+            'name': name,
+            'price': price,
+            'unit': _clean(text(first(item, selectors.unit))),
+            'url': urljoin(base_url, link) if link else '',
+            'image': urljoin(base_url, image) if image else ''
+        })
+    return products
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def parse_pool(processes: int = None) -> Optional[ProcessPoolExecutor]:
+    """The shared parse process pool, started on first use; None when parsing inline"""
+    global _pool
+    processes = PARSE_PROCESSES if processes is None else processes
+    if processes <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # Spawned, not forked: forking the threaded scheduler process is unsafe
+            _pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+            atexit.register(_pool.shutdown, wait=False, cancel_futures=True)
+        return _pool
+
+
+def submit_parse(html: bytes, spec: ListingSpec, base_url: str = '', pool: ProcessPoolExecutor = None) -> Future:
+    """Parse a page in the process pool, or inline when there is none"""
+    pool = pool or parse_pool()
+    if pool is not None:
+        try:
+            return pool.submit(parse_listing, html, spec, base_url, PARSER)
+        except (BrokenProcessPool, RuntimeError) as e:
+            logger.error(f"Parse pool unavailable, parsing inline: {e}")
+
+    future = Future()
+    try:
+        future.set_result(parse_listing(html, spec, base_url))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def parse_page(html: bytes, spec: ListingSpec, base_url: str = '') -> List[Dict]:
+    """Parse a page through the pool and wait for it; a crashed pool is replaced"""
+    global _pool
+    future = submit_parse(html, spec, base_url)
+    try:
+        return future.result()
+    except BrokenProcessPool as e:
+        logger.error(f"Parse worker died, parsing inline: {e}")
+        with _pool_lock:
+            _pool = None
+        return parse_listing(html, spec, base_url)
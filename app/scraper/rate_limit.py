@@ -0,0 +1,149 @@
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Dict, Optional
+import asyncio
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BURST = int(os.getenv('SCRAPER_BURST', 1))
+
+# Responses that mean "slow down" rather than "failed"
+THROTTLE_STATUSES = (429, 503)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenBucket:
+    """Token bucket whose refill rate adapts AIMD-style to throttling.
+
+    Reservations may drive the balance negative; each caller then waits for
+    its share of the deficit, so queued callers are spaced out by the rate
+    instead of all waking together. Time spent on the previous request
+    refills the bucket, so nobody sleeps longer than the rate requires.
+    """
+
+    # Halve the rate on throttling, then win back STEP_FRACTION of the
+    # ceiling per second of successful traffic (one success adds
+    # ceiling * STEP_FRACTION / rate), so a halved rate takes about
+    # 0.5 / STEP_FRACTION seconds to recover whatever the ceiling is
+    DECREASE = 0.5
+    STEP_FRACTION = 0.05
+    MIN_RATE_FRACTION = 0.05
+
+    def __init__(self, rate: float, burst: int = DEFAULT_BURST):
+        self.ceiling = rate
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        # Bumped on every throttle so callers holding older reservations re-queue
+        self.epoch = 0
+
+    def reserve(self, now: float) -> float:
+        """Take a token and return how long to wait before using it"""
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        self.tokens -= 1
+        # `updated` is in the future while a Retry-After pause is in force
+        return max(0.0, self.updated - now) + max(0.0, -self.tokens) / self.rate
+
+    def throttled(self, now: float, retry_after: Optional[float] = None):
+        if now >= self.updated:
+            # Requests already in flight when we were told to back off
+            # report the same congestion; only the first one cuts the rate
+            self.rate = max(self.ceiling * self.MIN_RATE_FRACTION, self.rate * self.DECREASE)
+        pause = retry_after if retry_after is not None else 1 / self.rate
+        self.tokens = 0.0
+        self.updated = max(self.updated, now + pause)
+        self.epoch += 1
+
+    def succeeded(self):
+        self.rate = min(self.ceiling, self.rate + self.ceiling * self.STEP_FRACTION / self.rate)
+
+
+class HostRateLimiter:
+    """Per-host token buckets shared by every scraper, thread and event loop"""
+
+    def __init__(self):
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def configure(self, host: str, rate: float, burst: int = DEFAULT_BURST):
+        """Register a host's ceiling rate; the first scraper for a host wins"""
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(rate, burst)
+
+    def _bucket(self, host: str) -> TokenBucket:
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            self.configure(host, 1.0)
+            bucket = self._buckets[host]
+        return bucket
+
+    def reserve(self, host: str):
+        """Take a token for `host`; returns (seconds to wait, bucket epoch)"""
+        with self._lock:
+            bucket = self._bucket(host)
+            return bucket.reserve(time.monotonic()), bucket.epoch
+
+    def _still_valid(self, host: str, epoch: int) -> bool:
+        return self._buckets[host].epoch == epoch
+
+    def acquire(self, host: str):
+        """Block the calling thread until a request to `host` is allowed"""
+        while True:
+            wait, epoch = self.reserve(host)
+            if wait > 0:
+                time.sleep(wait)
+            if self._still_valid(host, epoch):
+                return
+
+    async def acquire_async(self, host: str):
+        """Await (without blocking the loop) until a request to `host` is allowed"""
+        while True:
+            wait, epoch = self.reserve(host)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            if self._still_valid(host, epoch):
+                return
+
+    def feedback(self, host: str, status: int, retry_after: Optional[str] = None):
+        """Adapt the host's rate to a response status"""
+        with self._lock:
+            bucket = self._bucket(host)
+            if status in THROTTLE_STATUSES:
+                bucket.throttled(time.monotonic(), parse_retry_after(retry_after))
+                logger.warning(f"{host} throttled us ({status}), rate now {bucket.rate:.3f} req/s")
+            elif status < 500:
+                bucket.succeeded()
+
+    def rate(self, host: str) -> Optional[float]:
+        bucket = self._buckets.get(host)
+        return bucket.rate if bucket else None
+
+    def rates(self) -> Dict[str, float]:
+        with self._lock:
+            return {host: bucket.rate for host, bucket in self._buckets.items()}
+
+
+host_limiter = HostRateLimiter()
@@ -0,0 +1,113 @@
+"""The product record every scraper produces and ingestion consumes.
+
+ScrapedProduct is a slotted dataclass rather than a dict: no per-instance
+__dict__ or hash table, attribute access instead of string keys, and
+repeated strings (store names, sizes) interned so a large result set
+shares one copy of each.
+
+validate_batch checks a whole result set at once before it is written:
+products without a name or a usable price are rejected (a failed price
+parse yields 0.0), page-relative or non-http URLs are cleared, and the
+quantity, base unit and unit price are filled in on the records, so
+ingestion reads them off the record instead of building a normalize()
+dict per row.
+"""
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+import math
+import re
+import sys
+
+from app.units import parse_quantity, unit_price
+
+logger = logging.getLogger(__name__)
+
+OPTIONAL_FIELDS = ('brand', 'category', 'promotion')
+# A sane product or image URL: absolute http(s) with a host. Matched per
+# product, where urlsplit is several times slower
+_URL = re.compile(r'https?://[^/?#\s]+', re.IGNORECASE)
+
+
+@dataclass(slots=True)
+class ScrapedProduct:
+    """One product from a store's search results"""
+    store: str
+    name: str
+    price: float
+    unit: str = ''
+    url: str = ''
+    image: str = ''
+    brand: Optional[str] = None
+    category: Optional[str] = None
+    promotion: Optional[str] = None
+    # Filled in by validate_batch
+    quantity: Optional[float] = None
+    base_unit: Optional[str] = None
+    price_per_unit: Optional[float] = None
+
+    @classmethod
+    def create(cls, store: str, name: str, price, unit: str = '', url: str = '', image: str = '',
+               brand: str = None, category: str = None, promotion: str = None) -> 'ScrapedProduct':
+        """A record from raw scraped values: stripped text, a float price, interned store and size"""
+        return cls(sys.intern(store), (name or '').strip(), float(price or 0), sys.intern((unit or '').strip()),
+                   url or '', image or '', brand or None, category or None, promotion or None)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'ScrapedProduct':
+        """Load a record serialised by to_dict, e.g. from a task message or the parse cache"""
+        return cls.create(data.get('store', ''), data.get('product', data.get('name', '')), data.get('price'),
+                          data.get('unit', ''), data.get('url', ''), data.get('image', ''),
+                          data.get('brand'), data.get('category'), data.get('promotion'))
+
+    def to_dict(self) -> Dict:
+        """JSON-safe form, with the keys the standardised product dicts always had"""
+        data = {'store': self.store, 'product': self.name, 'price': self.price, 'unit': self.unit,
+                'url': self.url, 'image': self.image}
+        for field in OPTIONAL_FIELDS:
+            value = getattr(self, field)
+            if value:
+                data[field] = value
+        return data
+
+
+def as_records(products: Iterable) -> List[ScrapedProduct]:
+    """Records from scraped products, accepting serialised dicts"""
+    return [product if isinstance(product, ScrapedProduct) else ScrapedProduct.from_dict(product)
+            for product in products]
+
+
+def validate_batch(products: List[ScrapedProduct]) -> Tuple[List[ScrapedProduct], List[ScrapedProduct]]:
+    """Split a result set into (valid, rejected) and normalise the valid records' sizes.
+
+    A product is rejected without a name or with a price that is not a
+    positive finite number. Bad URLs are blanked rather than rejected, and
+    a size that cannot be parsed leaves quantity and unit price empty as
+    before - the price itself is still right.
+    """
+    valid, rejected = [], []
+    bad_urls = unparsed = 0
+    absolute = _URL.match
+    isfinite = math.isfinite
+    for product in products:
+        if not (product.name and product.price > 0 and isfinite(product.price)):
+            rejected.append(product)
+            continue
+        if product.url and absolute(product.url) is None:
+            product.url = ''
+            bad_urls += 1
+        if product.image and absolute(product.image) is None:
+            product.image = ''
+        # Sizes repeat across a result set, and parse_unit caches them
+        quantity, base_unit = parse_quantity(product.unit, product.name)
+        product.quantity, product.base_unit = quantity, base_unit
+        product.price_per_unit = unit_price(product.price, quantity)
+        if base_unit is None:
+            unparsed += 1
+        valid.append(product)
+
+    if rejected or bad_urls or unparsed:
+        store = products[0].store
+        logger.warning(f"{store}: rejected {len(rejected)} of {len(products)} products, "
+                       f"cleared {bad_urls} bad URLs, {unparsed} sizes unparsed")
+    return valid, rejected
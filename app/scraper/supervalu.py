@@ -66,6 +66,6 @@ class SuperValuScraper(BaseScraper):
         
         return [self._standardize_product({
             **product,
-            'url': self._get_store_url('SuperValu'),
+            'url': f'{self.base_url}/sm/delivery/rsid/5550/results?q=' + product['name'].replace(' ', '+'),
             'image': f'{self.base_url}/images/products/placeholder.jpg'
         }) for product in products]
\ No newline at end of file
@@ -1,5 +1,4 @@
 from .base_scraper import BaseScraper
-from bs4 import BeautifulSoup
 import logging
 
 logger = logging.getLogger(__name__)
@@ -0,0 +1,161 @@
+from app import db
+from sqlalchemy import Float, Integer, and_, bindparam, false, literal_column, or_, text
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TOKENS = 8
+
+# Backend per database URL: 'fts5', 'postgres' or 'like'
+_backends = {}
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, brand, search_term,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, brand, search_term)
+        VALUES (new.id, new.name, new.brand, new.search_term);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, brand, search_term)
+        VALUES ('delete', old.id, old.name, old.brand, old.search_term);
+    END""",
+    # Price refreshes don't touch indexed columns, so they skip the index
+    """CREATE TRIGGER IF NOT EXISTS products_fts_update AFTER UPDATE OF name, brand, search_term ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, brand, search_term)
+        VALUES ('delete', old.id, old.name, old.brand, old.search_term);
+        INSERT INTO products_fts(rowid, name, brand, search_term)
+        VALUES (new.id, new.name, new.brand, new.search_term);
+    END""",
+]
+
+PG_DOCUMENT = ("to_tsvector('simple', coalesce(products.name, '') || ' ' || "
+               "coalesce(products.brand, '') || ' ' || coalesce(products.search_term, ''))")
+
+POSTGRES_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_products_search_tsv ON products USING gin (({PG_DOCUMENT}))",
+]
+
+POSTGRES_TRGM_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING gin (name gin_trgm_ops)",
+]
+
+
+def tokenize(query):
+    """Split a search query into lowercase word tokens"""
+    return TOKEN_RE.findall(query.lower())[:MAX_TOKENS]
+
+
+def ensure_search_index():
+    """Create the search index for the current database and return its backend"""
+    engine = db.engine
+    dialect = engine.dialect.name
+
+    try:
+        if dialect == 'sqlite':
+            with engine.begin() as conn:
+                created = not conn.execute(text(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'products_fts'"
+                )).first()
+                for statement in SQLITE_DDL:
+                    conn.execute(text(statement))
+                if created:
+                    conn.execute(text("INSERT INTO products_fts(products_fts) VALUES ('rebuild')"))
+        elif dialect == 'postgresql':
+            with engine.begin() as conn:
+                for statement in POSTGRES_DDL:
+                    conn.execute(text(statement))
+            try:
+                with engine.begin() as conn:
+                    for statement in POSTGRES_TRGM_DDL:
+                        conn.execute(text(statement))
+            except Exception as e:
+                logger.warning(f"pg_trgm unavailable, fuzzy name matching disabled: {e}")
+    except Exception as e:
+        logger.error(f"Could not create search index, falling back to LIKE search: {e}")
+
+    _backends.pop(str(engine.url), None)
+    return search_backend()
+
+
+def search_backend():
+    """Detect which search implementation the current database supports"""
+    engine = db.engine
+    key = str(engine.url)
+    if key in _backends:
+        return _backends[key]
+
+    backend = 'like'
+    try:
+        with engine.connect() as conn:
+            if engine.dialect.name == 'sqlite':
+                if conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'")).first():
+                    backend = 'fts5'
+            elif engine.dialect.name == 'postgresql':
+                backend = 'postgres'
+                if conn.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first():
+                    backend = 'postgres_trgm'
+    except Exception as e:
+        logger.error(f"Search backend detection failed: {e}")
+
+    _backends[key] = backend
+    return backend
+
+
+def apply_search(query, search_query, model):
+    """Filter and rank a query on `model` (Product) by relevance to `search_query`.
+
+    Every token matches as a prefix against name, brand and search term;
+    results come back best match first, then cheapest first.
+    """
+    query, relevance = search_relevance(query, search_query, model)
+    if relevance is None:
+        return query.order_by(model.price.asc())
+    return query.order_by(relevance, model.price.asc())
+
+
+def search_relevance(query, search_query, model):
+    """Filter a query on `model` to matches of `search_query`.
+
+    Returns (query, relevance), where a lower relevance is a better match,
+    or None when the backend does not rank matches (LIKE).
+    """
+    tokens = tokenize(search_query)
+    if not tokens:
+        return query.filter(false()), None
+
+    backend = search_backend()
+
+    if backend == 'fts5':
+        # Column weights: name, brand, search term. The match parameter is
+        # unique so several searches can share one statement
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        fts = text(
+            "SELECT rowid AS id, bm25(products_fts, 10.0, 5.0, 2.0) AS rank "
+            "FROM products_fts WHERE products_fts MATCH :match"
+        ).bindparams(bindparam('match', match, unique=True)).columns(id=Integer, rank=Float).subquery('fts')
+        return query.join(fts, fts.c.id == model.id), fts.c.rank
+
+    if backend.startswith('postgres'):
+        tsquery = db.func.to_tsquery('simple', ' & '.join(f'{token}:*' for token in tokens))
+        document = literal_column(PG_DOCUMENT)
+        condition = document.op('@@')(tsquery)
+        rank = db.func.ts_rank(document, tsquery)
+        if backend == 'postgres_trgm':
+            phrase = ' '.join(tokens)
+            condition = or_(condition, model.name.op('%')(phrase))
+            rank = rank + db.func.similarity(model.name, phrase)
+        return query.filter(condition), -rank
+
+    return query.filter(and_(*[
+        or_(model.name.ilike(f'%{token}%'),
+            model.brand.ilike(f'%{token}%'),
+            model.search_term.ilike(f'%{token}%'))
+        for token in tokens
+    ])), None
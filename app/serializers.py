@@ -0,0 +1,61 @@
+from app.models import Product, Store
+from app.metrics import timed
+
+# Everything an API product payload needs, with the store name joined in so
+# a response costs one query however many products it holds
+PRODUCT_COLUMNS = (
+    Product.id,
+    Product.name,
+    Store.name.label('store'),
+    Product.price,
+    Product.unit,
+    Product.quantity,
+    Product.base_unit,
+    Product.price_per_unit,
+    Product.image_url,
+    Product.store_url,
+    Product.last_updated,
+)
+
+
+def product_columns(query):
+    """Turn a Product query into a query for PRODUCT_COLUMNS"""
+    return query.join(Store, Store.id == Product.store_id).with_entities(*PRODUCT_COLUMNS)
+
+
+def product_rows(query, limit=None):
+    """Run a Product query as column tuples joined to the store name"""
+    query = product_columns(query)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
+
+
+def serialize_product(row):
+    """Build the same payload as Product.to_dict from a column tuple"""
+    return {
+        'id': row.id,
+        'name': row.name,
+        'store': row.store,
+        'price': row.price,
+        'unit': row.unit or 'each',
+        'quantity': row.quantity,
+        'base_unit': row.base_unit,
+        'price_per_unit': row.price_per_unit,
+        'image_url': row.image_url,
+        'store_url': row.store_url,
+        'last_updated': row.last_updated.isoformat()
+    }
+
+
+def serialize_products(query, limit=None):
+    """Serialize a Product query without hydrating ORM objects"""
+    rows = product_rows(query, limit)
+    with timed('serialize'):
+        return [serialize_product(row) for row in rows]
+
+
+def value_sort_key(product):
+    """Order serialized products by price per base unit, unparsed sizes last"""
+    return (product['price_per_unit'] is None, product['base_unit'] or '',
+            product['price_per_unit'] or 0.0, product['price'])
@@ -112,7 +112,7 @@ class ComparAid {
                 <div class="product-header">
                     <div>
                         <h3 class="product-name">${product.name}</h3>
-                        <p class="product-unit">${product.unit || 'each'}</p>
+                        <p class="product-unit">${product.unit || 'each'}${product.price_per_unit != null && product.base_unit !== 'each' ? ` · €${product.price_per_unit.toFixed(2)}/${product.base_unit}` : ''}</p>
                     </div>
                     <span class="store-badge ${product.store.toLowerCase()}">${product.store}</span>
                 </div>
@@ -0,0 +1,237 @@
+"""Celery tasks that spread a price refresh over worker containers.
+
+Every (store, search term) pair is one scrape task, routed to that store's
+own queue (scrape.<store>). The host rate limiter lives in process memory,
+so each store queue must be consumed by exactly one process:
+
+    celery -A app.tasks worker -Q scrape.tesco --concurrency=1
+    celery -A app.tasks worker -Q scrape.dunnes,scrape.lidl,scrape.aldi,ingest --pool threads -c 4
+
+A threads (or solo) pool is one process whatever its concurrency; a
+prefork worker consuming scrape queues refuses to start with more than one
+child. Workers also hold a lock per scrape queue (the scheduler's lock
+backend): a worker started on a queue another worker owns leaves it alone
+until that owner's lock lapses, then takes it over.
+
+Scraped products go back through the ingest queue, where ingestion upserts
+them in batches. Ingestion is idempotent, so late acks and retries are safe
+even when a pair ends up running twice. Set CELERY_TASK_ALWAYS_EAGER=true
+to run everything inline, for tests or single-process setups.
+"""
+from celery import Celery, Task
+from celery.signals import worker_init, worker_shutdown
+from flask import current_app, has_app_context
+from app import create_app, db
+from app.leader import LeaderElection, create_leader_lock
+from app.models import Store, ScrapeJob
+from app.ingestion import save_scrape_results
+from app.scraper import SCRAPERS
+from app.metrics import start_metrics_server
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+INGEST_QUEUE = 'ingest'
+SCRAPE_QUEUE_PREFIX = 'scrape.'
+# Pools that run tasks in child processes, each with its own host_limiter
+PROCESS_POOLS = ('prefork', 'processes')
+SCRAPE_MAX_RETRIES = int(os.getenv('SCRAPE_MAX_RETRIES', 3))
+
+celery = Celery('comparaid')
+celery.conf.update(
+    broker_url=os.getenv('CELERY_BROKER_URL') or os.getenv('REDIS_URL', 'redis://localhost:6379/0'),
+    result_backend=os.getenv('CELERY_RESULT_BACKEND') or None,
+    task_always_eager=os.getenv('CELERY_TASK_ALWAYS_EAGER', 'false').lower() == 'true',
+    task_eager_propagates=True,
+    task_default_queue=INGEST_QUEUE,
+    task_serializer='json',
+    accept_content=['json'],
+    task_ignore_result=True,
+    # A worker that dies mid-scrape leaves the message for another worker
+    task_acks_late=True,
+    task_reject_on_worker_lost=True,
+    worker_prefetch_multiplier=1,
+)
+
+_app = None
+_scrapers = {}
+_queue_elections = {}
+
+
+def flask_app():
+    """The running Flask app (eager mode inside the scheduler) or this worker's own"""
+    global _app
+    if has_app_context():
+        return current_app._get_current_object()
+    if _app is None:
+        _app = create_app()
+    return _app
+
+
+def scrape_queue(store_name):
+    return f'{SCRAPE_QUEUE_PREFIX}{store_name.lower()}'
+
+
+@worker_init.connect
+def serve_worker_metrics(**kwargs):
+    """Expose this worker's scraper and ingestion metrics on METRICS_PORT"""
+    start_metrics_server()
+
+
+def _pool_name(pool):
+    return pool.lower() if isinstance(pool, str) else pool.__module__.rsplit('.', 1)[-1]
+
+
+def scrape_queues_consumed(worker):
+    return sorted(name for name in worker.app.amqp.queues.consume_from if name.startswith(SCRAPE_QUEUE_PREFIX))
+
+
+@worker_init.connect
+def check_scrape_pool(sender, **kwargs):
+    """Refuse to start a multi-process worker on scrape queues"""
+    queues = scrape_queues_consumed(sender)
+    if queues and _pool_name(sender.pool_cls) in PROCESS_POOLS and sender.concurrency > 1:
+        # Signal handlers' exceptions are only logged; SystemExit stops the worker
+        raise SystemExit(
+            f"{', '.join(queues)} need a single process per worker: run them with --concurrency=1 "
+            f"or --pool threads, not {sender.concurrency} {_pool_name(sender.pool_cls)} processes"
+        )
+
+
+@worker_init.connect
+def claim_scrape_queues(sender, **kwargs):
+    """Consume only the scrape queues no other worker owns, and take over the rest when they lapse"""
+    queues = scrape_queues_consumed(sender)
+    if not queues:
+        return
+    app = flask_app()
+    with app.app_context():
+        engine = db.engine
+
+    for queue in queues:
+        election = LeaderElection(create_leader_lock(app, engine, name=queue), name=queue).start()
+        if not election.is_leader:
+            logger.warning(f"Another worker owns {queue}; standing by")
+            sender.app.amqp.queues.deselect(queue)
+        election.on_change = lambda held, queue=queue: _consume(sender, queue, held)
+        _queue_elections[queue] = election
+
+
+def _consume(worker, queue, held):
+    # Remote control runs the change on the worker's own consumer thread
+    if held:
+        worker.app.control.add_consumer(queue, destination=[worker.hostname])
+    else:
+        worker.app.control.cancel_consumer(queue, destination=[worker.hostname])
+
+
+@worker_shutdown.connect
+def release_scrape_queues(**kwargs):
+    while _queue_elections:
+        _, election = _queue_elections.popitem()
+        election.stop()
+
+
+def _scraper(store_name):
+    """Scraper instance for this worker process, reused across tasks"""
+    if store_name not in _scrapers:
+        _scrapers[store_name] = SCRAPERS[store_name]()
+    return _scrapers[store_name]
+
+
+def start_job(cycle_id, store_name, search_term):
+    """Mark a pair's ledger job running, so staleness counts from when a worker took it"""
+    if cycle_id is None:
+        return
+    with flask_app().app_context():
+        try:
+            ScrapeJob.mark_started(cycle_id, store_name, search_term)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error starting job {store_name}/{search_term} in cycle {cycle_id}: {e}")
+            db.session.rollback()
+
+
+def record_job(cycle_id, store_name, search_term, item_count=None, error=None, seconds=None):
+    """Write a pair's outcome to the cycle ledger and close the cycle when it was the last job"""
+    if cycle_id is None:
+        return
+    with flask_app().app_context():
+        try:
+            job = ScrapeJob.find(cycle_id, store_name, search_term)
+            if job is None:
+                return
+            job.finish(item_count, error, seconds)
+            db.session.commit()
+            job.cycle.finish_if_complete()
+        except Exception as e:
+            logger.error(f"Error recording job {store_name}/{search_term} in cycle {cycle_id}: {e}")
+            db.session.rollback()
+
+
+class LedgerTask(Task):
+    """Marks the pair failed in the ledger once retries are exhausted"""
+
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        store_name, search_term = args[0], args[1]
+        record_job(kwargs.get('cycle_id'), store_name, search_term, error=exc)
+
+
+@celery.task(name='comparaid.scrape_pair', bind=True, base=LedgerTask, autoretry_for=(Exception,),
+             max_retries=SCRAPE_MAX_RETRIES, retry_backoff=30, retry_backoff_max=900, retry_jitter=True)
+def scrape_pair(self, store_name, search_term, cycle_id=None):
+    """Scrape one search term on one store and queue its ingestion"""
+    logger.info(f"Scraping {store_name} for {search_term} (attempt {self.request.retries + 1})")
+    start_job(cycle_id, store_name, search_term)
+    started = time.perf_counter()
+    products = _scraper(store_name).search_products(search_term)
+    ingest_pair.apply_async((store_name, search_term, [product.to_dict() for product in products]),
+                            {'cycle_id': cycle_id, 'seconds': time.perf_counter() - started},
+                            queue=INGEST_QUEUE)
+    return len(products)
+
+
+@celery.task(name='comparaid.ingest_pair', bind=True, base=LedgerTask, autoretry_for=(Exception,),
+             max_retries=SCRAPE_MAX_RETRIES, retry_backoff=5, retry_jitter=True)
+def ingest_pair(self, store_name, search_term, products, cycle_id=None, seconds=None):
+    """Write one scraped result set to the database"""
+    with flask_app().app_context():
+        try:
+            store = Store.query.filter_by(name=store_name).first()
+            if store is None:
+                store = Store(name=store_name, is_active=True, scraper_enabled=True)
+                db.session.add(store)
+                db.session.commit()
+
+            stats = save_scrape_results(store, search_term, products)
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if stats['failed']:
+            raise RuntimeError(f"{stats['failed']} products for {store_name}/{search_term} failed to save")
+        logger.info(f"Updated {len(products)} products for {store_name}")
+        record_job(cycle_id, store_name, search_term, len(products), seconds=seconds)
+        return stats
+
+
+def enqueue_pairs(pairs, cycle_id=None):
+    """Queue a scrape task per (store, term) pair; returns the pairs queued"""
+    queued = []
+    for store_name, term in pairs:
+        try:
+            scrape_pair.apply_async((store_name, term), {'cycle_id': cycle_id}, queue=scrape_queue(store_name))
+            queued.append((store_name, term))
+        except Exception as e:
+            logger.error(f"Could not queue {store_name} for {term}: {e}")
+    logger.info(f"Queued {len(queued)} scrape tasks")
+    return queued
+
+
+def enqueue_refresh(terms, store_names=None):
+    """Queue a scrape task for every (store, term) pair; returns the number queued"""
+    store_names = list(store_names or SCRAPERS)
+    # Interleave stores so every store queue has work from the start
+    return len(enqueue_pairs([(store_name, term) for term in terms for store_name in store_names]))
@@ -0,0 +1,258 @@
+from app import db
+from app.models import PriceHistory, PriceHistoryRollup
+from sqlalchemy import delete, insert, select, text
+from datetime import datetime, timedelta
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Raw price changes are kept this long, then rolled up into daily buckets;
+# daily buckets older than PRICE_HISTORY_DAILY_DAYS become weekly buckets
+RAW_DAYS = int(os.getenv('PRICE_HISTORY_RAW_DAYS', 90))
+DAILY_DAYS = int(os.getenv('PRICE_HISTORY_DAILY_DAYS', 730))
+
+RESOLUTIONS = ('raw', 'day', 'week')
+BATCH_SIZE = 10000
+
+
+def bucket_start(moment, resolution):
+    """Start of the day or (Monday-based) week containing `moment`"""
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == 'week':
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def ensure_partitions(months_ahead=3, now=None):
+    """Create monthly price_history partitions on PostgreSQL.
+
+    Does nothing on other databases, or when price_history was created
+    before partitioning and is still a plain table.
+    """
+    engine = db.engine
+    if engine.dialect.name != 'postgresql':
+        return []
+
+    with engine.begin() as conn:
+        partitioned = conn.execute(text(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'price_history'::regclass"
+        )).first()
+        if not partitioned:
+            return []
+
+        conn.execute(text("CREATE TABLE IF NOT EXISTS price_history_default PARTITION OF price_history DEFAULT"))
+
+        created = []
+        month = (now or datetime.utcnow()).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        for _ in range(months_ahead + 1):
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            name = f'price_history_y{month.year}m{month.month:02d}'
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF price_history "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')"
+            ))
+            created.append(name)
+            month = next_month
+    return created
+
+
+def _drop_partitions_before(cutoff):
+    """Drop monthly partitions that end on or before `cutoff` (PostgreSQL only).
+
+    Runs in the session's transaction: a second connection would wait
+    forever for the locks the session itself holds on price_history.
+    """
+    conn = db.session.connection()
+    if conn.dialect.name != 'postgresql':
+        return 0
+
+    dropped = 0
+    partitions = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'price_history'::regclass AND c.relname LIKE 'price_history_y%'"
+    )).scalars().all()
+    for name in partitions:
+        year, month = int(name[15:19]), int(name[20:22])
+        end = (datetime(year, month, 1) + timedelta(days=32)).replace(day=1)
+        if end <= cutoff:
+            conn.execute(text(f'DROP TABLE {name}'))
+            dropped += 1
+    return dropped
+
+
+def rollup_price_history(now=None):
+    """Downsample aged-out history and delete the finer rows it replaces"""
+    now = now or datetime.utcnow()
+    raw_cutoff = bucket_start(now - timedelta(days=RAW_DAYS), 'day')
+    daily_cutoff = bucket_start(now - timedelta(days=DAILY_DAYS), 'week')
+
+    raw_rows = select(
+        PriceHistory.product_id, PriceHistory.recorded_at, PriceHistory.price, PriceHistory.price
+    ).where(PriceHistory.recorded_at < raw_cutoff).order_by(PriceHistory.product_id, PriceHistory.recorded_at)
+    days = _rollup(raw_rows, 'day')
+    # The daily buckets are saved before the raw rows they replace go
+    db.session.commit()
+    _drop_partitions_before(raw_cutoff)
+    db.session.execute(delete(PriceHistory).where(PriceHistory.recorded_at < raw_cutoff))
+    db.session.commit()
+
+    daily_rows = select(
+        PriceHistoryRollup.product_id, PriceHistoryRollup.bucket_start,
+        PriceHistoryRollup.min_price, PriceHistoryRollup.max_price, PriceHistoryRollup.close_price,
+        PriceHistoryRollup.samples
+    ).where(
+        PriceHistoryRollup.resolution == 'day',
+        PriceHistoryRollup.bucket_start < daily_cutoff
+    ).order_by(PriceHistoryRollup.product_id, PriceHistoryRollup.bucket_start)
+    weeks = _rollup(daily_rows, 'week')
+    db.session.commit()
+    db.session.execute(delete(PriceHistoryRollup).where(
+        PriceHistoryRollup.resolution == 'day',
+        PriceHistoryRollup.bucket_start < daily_cutoff
+    ))
+    db.session.commit()
+
+    logger.info(f"Price history rollup: {days} daily and {weeks} weekly buckets written")
+    return {'day': days, 'week': weeks}
+
+
+def _rollup(rows, resolution):
+    """Stream ordered rows into buckets and write them in batches.
+
+    Rows are (product_id, time, min, max[, close, samples]); raw rows use
+    their price for min, max and close.
+    """
+    written = 0
+    pending = {}
+    current = None
+    # Only buckets up to the newest stored one can need merging
+    newest = db.session.query(db.func.max(PriceHistoryRollup.bucket_start)).filter(
+        PriceHistoryRollup.resolution == resolution
+    ).scalar()
+
+    result = db.session.execute(rows.execution_options(yield_per=BATCH_SIZE))
+    for row in result:
+        product_id, moment, low, high = row[0], row[1], row[2], row[3]
+        close = row[4] if len(row) > 4 else row[2]
+        samples = row[5] if len(row) > 5 else 1
+        key = (product_id, bucket_start(moment, resolution))
+
+        if key != current:
+            current = key
+            if key not in pending:
+                pending[key] = [low, high, close, 0]
+        bucket = pending[key]
+        bucket[0] = min(bucket[0], low)
+        bucket[1] = max(bucket[1], high)
+        bucket[2] = close
+        bucket[3] += samples
+
+        if len(pending) >= BATCH_SIZE:
+            # The current bucket may continue in the next rows
+            carry = pending.pop(key)
+            written += _write_buckets(pending, resolution, newest)
+            pending = {key: carry}
+
+    written += _write_buckets(pending, resolution, newest)
+    return written
+
+
+def _write_buckets(buckets, resolution, newest):
+    """Insert buckets, merging with any already stored for the same period"""
+    if not buckets:
+        return 0
+
+    existing = {}
+    overlapping = [key for key in buckets if newest is not None and key[1] <= newest]
+    if overlapping:
+        existing = {
+            (rollup.product_id, rollup.bucket_start): rollup
+            for rollup in PriceHistoryRollup.query.filter(
+                PriceHistoryRollup.resolution == resolution,
+                PriceHistoryRollup.product_id.in_({product_id for product_id, _ in overlapping}),
+                PriceHistoryRollup.bucket_start.in_({start for _, start in overlapping})
+            )
+        }
+
+    rows = []
+    for (product_id, start), (low, high, close, samples) in buckets.items():
+        rollup = existing.get((product_id, start))
+        if rollup:
+            # Stored bucket came from earlier rows, so the new close wins
+            rollup.min_price = min(rollup.min_price, low)
+            rollup.max_price = max(rollup.max_price, high)
+            rollup.close_price = close
+            rollup.samples += samples
+        else:
+            rows.append({'product_id': product_id, 'resolution': resolution, 'bucket_start': start,
+                         'min_price': low, 'max_price': high, 'close_price': close, 'samples': samples})
+    if rows:
+        db.session.connection().execute(insert(PriceHistoryRollup.__table__), rows)
+    db.session.flush()
+    return len(buckets)
+
+
+def get_price_history(product_id, since, until=None, resolution='auto'):
+    """Price points for a product, each period read at the cheapest resolution stored.
+
+    'auto' returns raw changes where they are still kept and rollups for
+    older periods. 'day' or 'week' return one point per bucket, combining
+    stored rollups with finer rows bucketed on the fly. Days older than
+    PRICE_HISTORY_DAILY_DAYS only survive as weeks, so 'day' returns
+    weekly points (marked resolution 'week') for that period.
+    """
+    until = until or datetime.utcnow()
+    points = []
+
+    tiers = ('week', 'day')
+    if resolution == 'raw':
+        tiers = ()
+
+    for tier in tiers:
+        rollups = PriceHistoryRollup.query.filter(
+            PriceHistoryRollup.product_id == product_id,
+            PriceHistoryRollup.resolution == tier,
+            PriceHistoryRollup.bucket_start >= bucket_start(since, tier),
+            PriceHistoryRollup.bucket_start <= until
+        ).order_by(PriceHistoryRollup.bucket_start).all()
+        points.extend(rollup.to_dict() for rollup in rollups)
+
+    raw = db.session.execute(
+        select(PriceHistory.recorded_at, PriceHistory.price).where(
+            PriceHistory.product_id == product_id,
+            PriceHistory.recorded_at >= since,
+            PriceHistory.recorded_at <= until
+        ).order_by(PriceHistory.recorded_at)
+    ).all()
+    points.extend({
+        'recorded_at': recorded_at.isoformat(),
+        'resolution': 'raw',
+        'price': price,
+        'min': price,
+        'max': price
+    } for recorded_at, price in raw)
+
+    points.sort(key=lambda point: point['recorded_at'])
+    if resolution in ('day', 'week'):
+        points = _downsample(points, resolution)
+    return points
+
+
+def _downsample(points, resolution):
+    buckets = {}
+    for point in points:
+        # Weekly rollups cannot be split back into days
+        point_resolution = 'week' if point['resolution'] == 'week' else resolution
+        start = bucket_start(datetime.fromisoformat(point['recorded_at']), point_resolution).isoformat()
+        bucket = buckets.get((start, point_resolution))
+        if bucket is None:
+            buckets[(start, point_resolution)] = {
+                'recorded_at': start, 'resolution': point_resolution, 'price': point['price'],
+                'min': point['min'], 'max': point['max']
+            }
+        else:
+            bucket['price'] = point['price']
+            bucket['min'] = min(bucket['min'], point['min'])
+            bucket['max'] = max(bucket['max'], point['max'])
+    return list(buckets.values())
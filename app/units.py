@@ -0,0 +1,229 @@
+"""Parse free-text pack sizes into a canonical quantity and unit.
+
+Scrapers report sizes such as '1L', '500ml', '1.5kg', '4 x 330ml' or
+'12 pack'. Each is reduced to an amount of one base unit: kilograms,
+litres or items ('each'). price_per_unit is then the price per kg, per
+litre or per item, so products sold in different sizes can be ranked by
+value with an index on the stored column.
+
+Ingestion normalizes one row at a time; backfill_unit_prices reprocesses
+existing rows in large batches, parsing each distinct size string once.
+"""
+from functools import lru_cache
+import logging
+import re
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional, used for the batched backfill
+    np = None
+
+logger = logging.getLogger(__name__)
+
+BASE_UNITS = ('kg', 'l', 'each')
+
+# Multiplier from each recognised unit to its base unit
+MEASURES = {
+    'mg': ('kg', 0.000001),
+    'g': ('kg', 0.001), 'gr': ('kg', 0.001), 'grm': ('kg', 0.001),
+    'gram': ('kg', 0.001), 'grams': ('kg', 0.001),
+    'kg': ('kg', 1.0), 'kgs': ('kg', 1.0), 'kilo': ('kg', 1.0), 'kilos': ('kg', 1.0),
+    'ml': ('l', 0.001), 'cl': ('l', 0.01), 'dl': ('l', 0.1),
+    'l': ('l', 1.0), 'lt': ('l', 1.0), 'ltr': ('l', 1.0), 'ltrs': ('l', 1.0),
+    'litre': ('l', 1.0), 'litres': ('l', 1.0), 'liter': ('l', 1.0), 'liters': ('l', 1.0),
+}
+COUNT_WORDS = (
+    'pack', 'pk', 'pcs', 'pc', 'piece', 'pieces', 'each', 'ea', 'x', 's',
+    'roll', 'rolls', 'bag', 'bags', 'pod', 'pods', 'capsule', 'capsules',
+    'tablet', 'tablets', 'sheet', 'sheets', 'egg', 'eggs', 'can', 'cans', 'bottle', 'bottles',
+)
+SINGLE_WORDS = {'', 'each', 'ea', 'single', 'unit', 'item', '1', 'per item'}
+
+# '1,000' groups thousands; any other comma is a decimal point, as in '1,5kg'
+_NUMBER = r'(\d{1,3}(?:,\d{3})+(?!\d)(?:\.\d+)?|\d+(?:[.,]\d+)?)'
+_THOUSANDS = re.compile(r'\d{1,3}(?:,\d{3})+(?:\.\d+)?')
+_MEASURE = '(' + '|'.join(sorted(MEASURES, key=len, reverse=True)) + ')'
+_PACK = r'(?:pk|packs?)'
+# '4 x 330ml', '6x1.5l', '4pk 500ml', '6 pack of 330ml'
+_MULTIPACK = re.compile(
+    r'(\d+)\s*(?:[x×*]|' + _PACK + r'\s*(?:of\s+|[x×*]\s*)?)\s*' + _NUMBER + r'\s*' + _MEASURE + r'\b'
+)
+# '500ml', '1.5 kg', '330ml x 4', '500ml 4pk'
+_AMOUNT = re.compile(
+    _NUMBER + r'\s*' + _MEASURE + r'\b(?:\s*[x×*]\s*(\d+)\b|\s+(\d+)\s*' + _PACK + r'\b)?'
+)
+# 'per kg', '/kg', 'kg' alone: loose produce priced by weight
+_PER_MEASURE = re.compile(r'^(?:per\s+|/\s*)?' + _MEASURE + r'$')
+# '12 pack', '80pk', '6 eggs', 'x12', 'pack of 4'
+_COUNT = re.compile(
+    r'(?:(\d+)\s*(?:' + '|'.join(COUNT_WORDS) + r')\b|\bx\s*(\d+)\b|\b(?:pack|box|case)\s+of\s+(\d+)\b)'
+)
+_DOZEN = re.compile(r'\b(half\s+)?dozen\b')
+
+
+def _number(text):
+    if _THOUSANDS.fullmatch(text):
+        return float(text.replace(',', ''))
+    return float(text.replace(',', '.'))
+
+
+def _from_name(quantity, base_unit):
+    """Whether a size parsed from a product name can stand in for the size"""
+    return base_unit in ('kg', 'l') or (base_unit == 'each' and quantity not in (None, 1.0))
+
+
+@lru_cache(maxsize=4096)
+def parse_unit(text):
+    """(quantity, base_unit) for a size string, or (None, None) if unrecognised.
+
+    An empty size means a single item, as Product.to_dict already assumes.
+    """
+    text = ' '.join((text or '').lower().split())
+    if text in SINGLE_WORDS:
+        return 1.0, 'each'
+
+    match = _MULTIPACK.search(text)
+    if match:
+        base_unit, factor = MEASURES[match.group(3)]
+        return round(int(match.group(1)) * _number(match.group(2)) * factor, 6), base_unit
+
+    match = _AMOUNT.search(text)
+    if match:
+        base_unit, factor = MEASURES[match.group(2)]
+        count = int(match.group(3) or match.group(4) or 1)
+        return round(count * _number(match.group(1)) * factor, 6), base_unit
+
+    match = _PER_MEASURE.match(text)
+    if match:
+        return 1.0, MEASURES[match.group(1)][0]
+
+    match = _COUNT.search(text)
+    if match:
+        return float(match.group(1) or match.group(2) or match.group(3)), 'each'
+
+    match = _DOZEN.search(text)
+    if match:
+        return (6.0 if match.group(1) else 12.0), 'each'
+
+    return None, None
+
+
+def parse_quantity(unit, name=None):
+    """Parse the size, falling back to a measure or count in the product name.
+
+    Stores often report 'each' for a product called 'Milk 2L' or 'Eggs 12pk',
+    so a single-item or unrecognised size defers to the name.
+    """
+    quantity, base_unit = parse_unit(unit)
+    if name and (base_unit is None or (base_unit == 'each' and quantity == 1.0)):
+        name_quantity, name_unit = parse_unit(name)
+        if _from_name(name_quantity, name_unit):
+            return name_quantity, name_unit
+    return quantity, base_unit
+
+
+def unit_price(price, quantity):
+    """Price per base unit, or None without a usable quantity"""
+    if price is None or not quantity:
+        return None
+    return price / quantity
+
+
+def normalize(price, unit, name=None):
+    """The quantity, base_unit and price_per_unit column values for one product"""
+    quantity, base_unit = parse_quantity(unit, name)
+    return {
+        'quantity': quantity,
+        'base_unit': base_unit,
+        'price_per_unit': unit_price(price, quantity),
+    }
+
+
+def unit_prices(prices, units, names=None):
+    """Vectorised normalize over parallel sequences.
+
+    Returns (quantities, base_units, prices_per_unit) lists. Distinct size
+    strings are parsed once: np.unique gives each row an index into the
+    unique sizes, and the per-row values are gathered and divided as
+    arrays. Only rows whose size is missing or 'each' look at their names.
+    """
+    if np is None:
+        values = [normalize(price, unit, name) for price, unit, name in
+                  zip(prices, units, names if names is not None else [None] * len(prices))]
+        return ([value['quantity'] for value in values], [value['base_unit'] for value in values],
+                [value['price_per_unit'] for value in values])
+
+    sizes, inverse = np.unique(np.array([unit or '' for unit in units], dtype=str), return_inverse=True)
+    parsed = [parse_unit(size) for size in sizes.tolist()]
+    quantities = np.array([quantity if quantity is not None else np.nan for quantity, _ in parsed])[inverse]
+    base_units = np.array([base_unit for _, base_unit in parsed], dtype=object)[inverse]
+
+    if names is not None:
+        deferred = np.array([
+            base_unit is None or (base_unit == 'each' and quantity == 1.0) for quantity, base_unit in parsed
+        ])[inverse]
+        rows = np.flatnonzero(deferred)
+        if rows.size:
+            names = np.array([names[row] or '' for row in rows.tolist()], dtype=str)
+            distinct, name_inverse = np.unique(names, return_inverse=True)
+            found = [parse_unit(name) for name in distinct.tolist()]
+            measured = np.array([_from_name(quantity, base_unit) for quantity, base_unit in found])[name_inverse]
+            rows = rows[measured]
+            found_quantities = np.array([quantity or np.nan for quantity, _ in found])[name_inverse]
+            found_units = np.array([base_unit for _, base_unit in found], dtype=object)[name_inverse]
+            quantities[rows] = found_quantities[measured]
+            base_units[rows] = found_units[measured]
+
+    prices = np.asarray(prices, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        per_unit = prices / quantities
+    per_unit[~np.isfinite(per_unit) | (quantities == 0)] = np.nan
+
+    def to_list(array):
+        values = array.astype(object)
+        values[np.isnan(array)] = None
+        return values.tolist()
+
+    return to_list(quantities), base_units.tolist(), to_list(per_unit)
+
+
+def backfill_unit_prices(batch_size=50000, only_missing=False):
+    """Recompute quantity, base_unit and price_per_unit for stored products.
+
+    Rows are read in primary-key order, normalized a batch at a time with
+    unit_prices and written back with one executemany UPDATE per batch.
+    Returns the number of rows updated.
+    """
+    from app import db
+    from app.models import Product
+    from sqlalchemy import select
+
+    updated = 0
+    last_id = 0
+    while True:
+        query = select(Product.id, Product.price, Product.unit, Product.name).where(
+            Product.id > last_id
+        ).order_by(Product.id).limit(batch_size)
+        if only_missing:
+            query = query.where(Product.base_unit.is_(None))
+        rows = db.session.execute(query).all()
+        if not rows:
+            break
+
+        ids, prices, units, names = zip(*rows)
+        quantities, base_units, per_unit = unit_prices(prices, units, names)
+        try:
+            db.session.execute(db.update(Product), [
+                {'id': product_id, 'quantity': quantity, 'base_unit': base_unit, 'price_per_unit': value}
+                for product_id, quantity, base_unit, value in zip(ids, quantities, base_units, per_unit)
+            ])
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error backfilling unit prices after product {last_id}: {e}")
+            db.session.rollback()
+            raise
+        updated += len(rows)
+        last_id = ids[-1]
+
+    logger.info(f"Backfilled unit prices for {updated} products")
+    return updated
@@ -0,0 +1,113 @@
+"""Time the basket optimiser on baskets of growing size.
+
+The first part times the cost-matrix step alone: store totals plus the best
+split over at most k stores, computed with NumPy arrays and with the pure
+Python fallback, on random price matrices where about one price in ten is
+missing. The second part times POST /api/basket end to end against a
+throwaway SQLite database (or DATABASE_URL) filled with one term per item
+at every store. That covers the batched window-function read and JSON
+encoding.
+
+    python benchmarks/bench_basket.py --sizes 5 10 25 50 100 --stores 5 --max-stores 2
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import basket
+
+STORES = ['Tesco', 'SuperValu', 'Dunnes', 'Lidl', 'Aldi', 'Centra', 'Spar', 'Londis', 'Iceland', 'Marks']
+
+
+def random_costs(items, stores, seed):
+    rng = random.Random(seed)
+    return [[None if rng.random() < 0.1 else round(rng.uniform(0.5, 8), 2) for _ in range(stores)]
+            for _ in range(items)]
+
+
+def time_matrix(rows, quantities, max_stores, vectorized, repeats):
+    np = basket.np
+    if not vectorized:
+        basket.np = None
+        costs, weights = rows, quantities
+    else:
+        costs = np.array([[np.inf if price is None else price for price in row] for row in rows])
+        weights = np.array(quantities, dtype=float)
+    try:
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            basket.store_totals(costs, weights)
+            result = basket.best_split(costs, weights, max_stores)
+            timings.append(time.perf_counter() - started)
+    finally:
+        basket.np = np
+    return statistics.median(timings) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5, 10, 25, 50, 100])
+    parser.add_argument('--stores', type=int, default=5)
+    parser.add_argument('--max-stores', type=int, default=2)
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    if basket.np is None:
+        print('numpy is not installed; only the pure Python path can run')
+        return
+
+    print(f"cost matrix step, {args.stores} stores, split over at most {args.max_stores}")
+    print(f"{'items':>6} {'numpy ms':>10} {'python ms':>10} {'same answer':>12}")
+    for size in args.sizes:
+        rows = random_costs(size, args.stores, seed=size)
+        quantities = [random.Random(size + i).randint(1, 3) for i in range(size)]
+        fast, fast_result = time_matrix(rows, quantities, args.max_stores, True, args.repeats)
+        slow, slow_result = time_matrix(rows, quantities, args.max_stores, False, args.repeats)
+        same = fast_result[0] == slow_result[0] and abs(fast_result[2] - slow_result[2]) < 1e-6
+        print(f"{size:>6} {fast:>10.3f} {slow:>10.3f} {str(same):>12}")
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{os.path.join(tmpdir, "bench.db")}')
+    os.environ.setdefault('RATELIMIT_ENABLED', 'false')
+    from app import create_app, db
+    from app.models import Product, Store
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        stores = [Store(name=name) for name in STORES[:args.stores]]
+        db.session.add_all(stores)
+        db.session.commit()
+        rng = random.Random(5)
+        # Several products per term and store, so the window function has work to do
+        db.session.execute(db.insert(Product), [{
+            'name': f'{store.name} item{term} variant{variant}', 'store_id': store.id,
+            'price': round(rng.uniform(0.5, 8), 2), 'search_term': f'item{term}', 'is_active': True
+        } for term in range(max(args.sizes)) for store in stores for variant in range(6)])
+        db.session.commit()
+
+    client = app.test_client()
+    print("\nPOST /api/basket end to end (SQLite, 6 products per item and store)")
+    print(f"{'items':>6} {'median ms':>10}")
+    for size in [size for size in args.sizes if size <= basket.MAX_ITEMS]:
+        body = {'items': [{'term': f'item{term}', 'quantity': 1 + term % 3} for term in range(size)],
+                'max_stores': args.max_stores}
+        timings = []
+        for _ in range(args.repeats):
+            started = time.perf_counter()
+            response = client.post('/api/basket', json=body)
+            timings.append(time.perf_counter() - started)
+            assert response.status_code == 200, response.get_json()
+        print(f"{size:>6} {statistics.median(timings) * 1000:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Compare /api/prices/batch against one /api/prices call per term.
+
+Fills a throwaway SQLite database (or DATABASE_URL) with products for many
+search terms at every store. For each batch size N it times N sequential
+GET /api/prices calls (reducing each to the first product per store, as a
+shopping-list page would) against one GET /api/prices/batch with the same
+N terms. It also checks that both paths pick the same product per store.
+The response cache is off, so every request reaches the database; over a
+network the sequential path would also pay N round trips.
+
+    python benchmarks/bench_batch_prices.py --sizes 1 5 10 20 --terms 200 --variants 10
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STORES = ['Tesco', 'SuperValu', 'Dunnes', 'Lidl', 'Aldi']
+WORDS = ['fresh', 'organic', 'whole', 'sliced', 'large', 'smoked', 'mild', 'frozen', 'irish', 'premium']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 10, 20])
+    parser.add_argument('--terms', type=int, default=200)
+    parser.add_argument('--variants', type=int, default=10)
+    parser.add_argument('--repeats', type=int, default=10)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{os.path.join(tmpdir, "bench.db")}')
+    os.environ.setdefault('RATELIMIT_ENABLED', 'false')
+    os.environ.setdefault('CACHE_ENABLED', 'false')
+    os.environ.setdefault('DEMAND_TRACKING_ENABLED', 'false')
+    from app import create_app, db
+    from app.models import Product, Store
+    from app.search import ensure_search_index
+    from app.api.routes import MAX_BATCH_TERMS
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        stores = [Store(name=name) for name in STORES]
+        db.session.add_all(stores)
+        db.session.commit()
+        rng = random.Random(7)
+        db.session.execute(db.insert(Product), [{
+            'name': f'{store.name} {rng.choice(WORDS)} item{term} {variant}', 'store_id': store.id,
+            'price': round(rng.uniform(0.5, 8), 2), 'search_term': f'item{term}', 'is_active': True
+        } for term in range(args.terms) for store in stores for variant in range(args.variants)])
+        db.session.commit()
+        print(f"search backend: {ensure_search_index()}, "
+              f"{args.terms * len(stores) * args.variants:,} products")
+
+    client = app.test_client()
+    print(f"{'terms':>6} {'sequential ms':>14} {'batch ms':>10} {'speedup':>8} {'same picks':>11}")
+    for size in [size for size in args.sizes if size <= MAX_BATCH_TERMS]:
+        terms = [f'item{term}' for term in random.Random(size).sample(range(args.terms), size)]
+
+        sequential, batch = [], []
+        for _ in range(args.repeats):
+            started = time.perf_counter()
+            picks = []
+            for term in terms:
+                first = {}
+                for product in client.get(f'/api/prices?product={term}&limit=100').get_json()['products']:
+                    first.setdefault(product['store'], product['id'])
+                picks.append(first)
+            sequential.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            results = client.get(f"/api/prices/batch?terms={','.join(terms)}").get_json()['results']
+            batch.append(time.perf_counter() - started)
+
+        same = picks == [{product['store']: product['id'] for product in result['products']} for result in results]
+        slow, fast = statistics.median(sequential) * 1000, statistics.median(batch) * 1000
+        print(f"{size:>6} {slow:>14.2f} {fast:>10.2f} {slow / fast:>7.1f}x {str(same):>11}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+"""Pages per minute and memory of app.scraper.browser.BrowserPool.
+
+A local server plays a store whose product grid is rendered client-side:
+each search page is a shell with inline JSON that a script turns into
+product tiles, and it pulls in product images, a web font and a slow
+third-party tracker script served from tracker.localhost. Chromium
+resolves any *.localhost name to loopback, so no DNS is needed. Three
+ways of rendering the same pages are compared:
+
+  launch per page  a fresh browser for every search (the naive approach)
+  pool             BrowserPool with route blocking off
+  pool + blocking  BrowserPool aborting images, fonts and the tracker
+
+Each run reports pages/minute, products parsed, and the resident memory
+of this process plus every browser process it started, sampled as pages
+complete. Page recycling shows up as RSS flattening out instead of
+climbing. Needs playwright and a browser: pip install playwright &&
+playwright install chromium.
+
+    python benchmarks/bench_browser_pool.py --pages 300 --stores 3 --concurrency 2 --recycle 25
+"""
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.scraper import browser
+from app.scraper.parsing import ListingSpec, parse_listing
+
+SPEC = ListingSpec(item='li.product-tile', name='h3.product-title a', price='.price .value',
+                   unit='.price-per-unit', link='h3.product-title a', image='img.product-image')
+PRODUCTS_PER_PAGE = 48
+IMAGE = os.urandom(30 * 1024)
+FONT = os.urandom(60 * 1024)
+
+SHELL = """<!DOCTYPE html><html><head><title>Search</title>
+<style>@font-face {{ font-family: Store; src: url(/font.woff2); }} body {{ font-family: Store; }}</style>
+<script src="http://tracker.localhost:{port}/t.js"></script>
+</head><body><ul id="results"></ul>
+<script>
+const products = {products};
+document.getElementById('results').innerHTML = products.map(p => `
+  <li class="product-tile"><img class="product-image" src="/images/${{p.id}}.jpg">
+    <h3 class="product-title"><a href="/product/${{p.id}}">${{p.name}}</a></h3>
+    <div class="price"><span class="value">${{p.price}}</span></div>
+    <p class="price-per-unit">${{p.unit}}</p></li>`).join('');
+</script></body></html>"""
+
+
+def start_store_server(tracker_delay):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.startswith('/search'):
+                rng = random.Random(self.path)
+                products = [{'id': rng.randint(1, 10 ** 6), 'name': f'Product {n} {rng.choice(["1L", "500g"])}',
+                             'price': f'{rng.uniform(0.5, 9):.2f}', 'unit': f'€{rng.uniform(1, 9):.2f}/kg'}
+                            for n in range(PRODUCTS_PER_PAGE)]
+                body = SHELL.format(port=self.server.server_port, products=json.dumps(products)).encode('utf-8')
+                content_type = 'text/html'
+            elif self.path.startswith('/images/'):
+                body, content_type = IMAGE, 'image/jpeg'
+            elif self.path == '/font.woff2':
+                body, content_type = FONT, 'font/woff2'
+            elif self.path == '/t.js':
+                time.sleep(tracker_delay)
+                body, content_type = b'window.tracked = true;', 'application/javascript'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def tree_rss_mb():
+    """Resident memory of this process and all its descendants (Linux /proc)"""
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    parents[int(entry)] = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+    tree, frontier = {os.getpid()}, [os.getpid()]
+    while frontier:
+        parent = frontier.pop()
+        children = [pid for pid, ppid in parents.items() if ppid == parent]
+        tree.update(children)
+        frontier.extend(children)
+    total = 0
+    for pid in tree:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+        except (OSError, StopIteration):
+            continue
+    return total / 1024
+
+
+def run(label, render, urls, threads, sample_every):
+    samples = []
+    done = [0]
+    lock = threading.Lock()
+
+    def task(job):
+        store, url = job
+        html = render(store, url)
+        products = len(parse_listing(html.encode('utf-8'), SPEC, url))
+        with lock:
+            done[0] += 1
+            if done[0] % sample_every == 0:
+                samples.append((done[0], tree_rss_mb()))
+        return products
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        products = sum(executor.map(task, urls))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<16} {len(urls) / elapsed * 60:>9.0f} {products:>9} {max(rss for _, rss in samples):>8.0f}")
+    print(f"{'':<16} RSS MB by page: " + ', '.join(f'{pages}:{rss:.0f}' for pages, rss in samples))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--launch-pages', type=int, default=20, help='pages for the launch-per-page baseline')
+    parser.add_argument('--stores', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=2, help='pages in flight per store')
+    parser.add_argument('--recycle', type=int, default=25)
+    parser.add_argument('--tracker-delay', type=float, default=0.3)
+    parser.add_argument('--sample-every', type=int, default=25)
+    args = parser.parse_args()
+
+    if browser.async_playwright is None:
+        print('playwright is not installed')
+        return
+
+    server = start_store_server(args.tracker_delay)
+    port = server.server_port
+    # Every store is its own host, as real stores are
+    hosts = [f'http://store{index}.localhost:{port}' for index in range(args.stores)]
+    urls = [(f'Store{page % args.stores}', f'{hosts[page % args.stores]}/search?q=term{page}')
+            for page in range(args.pages)]
+    threads = args.stores * args.concurrency
+    print(f"{args.pages} pages over {args.stores} stores, {args.concurrency} per store, "
+          f"{PRODUCTS_PER_PAGE} products each; baseline RSS {tree_rss_mb():.0f} MB")
+    print(f"{'mode':<16} {'pages/min':>9} {'products':>9} {'max MB':>8}")
+
+    def launch_per_page(store, url):
+        from playwright.sync_api import sync_playwright
+        with sync_playwright() as playwright:
+            instance = playwright.chromium.launch()
+            page = instance.new_page()
+            page.goto(url, wait_until='domcontentloaded')
+            page.wait_for_selector(SPEC.item)
+            html = page.content()
+            instance.close()
+        return html
+
+    run('launch per page', launch_per_page, urls[:args.launch_pages], threads,
+        max(1, min(args.sample_every, args.launch_pages // 4)))
+
+    concurrency = {'*': args.concurrency}
+    for label, block in (('pool', False), ('pool + blocking', True)):
+        pool = browser.BrowserPool(browsers=1, concurrency=concurrency, recycle_after=args.recycle, block=block,
+                                   blocked_hosts=browser.BLOCKED_HOSTS | {'tracker.localhost'})
+        try:
+            run(label, lambda store, url: pool.render(store, url, SPEC.item)[2], urls, threads, args.sample_every)
+            print(f"{'':<16} {pool.stats}")
+        finally:
+            pool.close()
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
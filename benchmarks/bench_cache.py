@@ -0,0 +1,106 @@
+"""Response cache hit rate and latency.
+
+Fills a throwaway SQLite database with a few scrape cycles of mock data,
+then replays a skewed mix of /search, /api/prices, /api/trending,
+/api/stores and /api/stats requests through the Flask test client with
+the cache off and on. Uses fakeredis when installed, or a local Redis with
+--redis-url, otherwise the in-process LRU fallback. A scheduler refresh
+(generation bump) happens every --refresh-every requests.
+
+    python benchmarks/bench_cache.py --requests 5000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TERMS = ['milk', 'bread', 'eggs', 'butter', 'cheese', 'yogurt', 'chicken', 'beef', 'pork',
+         'fish', 'apples', 'bananas', 'pasta', 'rice', 'cereal', 'coffee', 'tea', 'juice',
+         'water', 'wine', 'beer', 'soap', 'shampoo', 'tissues']
+
+
+def request_mix(count, seed=1):
+    rng = random.Random(seed)
+    # Zipf-like popularity: a few terms get most of the traffic
+    weights = [1 / (rank + 1) for rank in range(len(TERMS))]
+    for _ in range(count):
+        kind = rng.random()
+        term = rng.choices(TERMS, weights)[0]
+        if rng.random() < 0.3:
+            term = f'  {term.upper()} '
+        if kind < 0.45:
+            yield '/search', {'q': term}
+        elif kind < 0.85:
+            yield '/api/prices', {'product': term}
+        elif kind < 0.93:
+            yield '/api/trending', {}
+        elif kind < 0.97:
+            yield '/api/stores', {}
+        else:
+            yield '/api/stats', {}
+
+
+def replay(client, requests, cache, refresh_every):
+    samples = []
+    for i, (url, args) in enumerate(requests):
+        if refresh_every and i and i % refresh_every == 0:
+            cache.bump_generation()
+        started = time.perf_counter()
+        response = client.get(url, query_string=args)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, (url, response.status_code)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--refresh-every', type=int, default=1000)
+    parser.add_argument('--redis-url', help='use a real Redis instead of fakeredis')
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f'sqlite:///{tempfile.mkdtemp()}/cache.db'
+    os.environ['FLASK_ENV'] = 'development'
+
+    from main import app, init_db
+    from app import cache, limiter
+    from scheduler import PriceUpdateScheduler
+
+    init_db()
+    updater = PriceUpdateScheduler()
+    updater.comprehensive_categories = TERMS
+    updater.update_prices()
+
+    if args.redis_url:
+        import redis
+        cache.set_client(redis.Redis.from_url(args.redis_url))
+    else:
+        try:
+            import fakeredis
+            cache.set_client(fakeredis.FakeRedis())
+        except ImportError:
+            cache.set_client(None)
+
+    limiter.enabled = False
+    client = app.test_client()
+    requests = list(request_mix(args.requests))
+
+    app.config['CACHE_ENABLED'] = False
+    p50, p99 = replay(client, requests, cache, args.refresh_every)
+    print(f"no cache:            p50 {p50:6.2f}ms  p99 {p99:6.2f}ms")
+
+    app.config['CACHE_ENABLED'] = True
+    p50, p99 = replay(client, requests, cache, args.refresh_every)
+    stats = cache.stats()
+    print(f"cache ({stats['backend']:<5}):       p50 {p50:6.2f}ms  p99 {p99:6.2f}ms  "
+          f"hit rate {stats['hit_rate']:.1%} ({stats['hits']} hits, {stats['misses']} misses)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Bandwidth and latency saved by conditional GETs on repeat queries.
+
+Replays the same set of API and search URLs twice through the Flask test
+client: once as plain GETs and once revalidating with the ETag from the
+first response, as a browser or CDN would after max-age expires.
+
+    python benchmarks/bench_conditional.py --rounds 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+URLS = ['/search?q=milk', '/search?q=bread', '/api/prices?product=eggs', '/api/prices?product=milk',
+        '/api/trending?limit=20', '/api/stores', '/api/stats']
+
+
+def replay(client, rounds, etags=None):
+    samples, total_bytes, statuses = [], 0, {}
+    for _ in range(rounds):
+        for url in URLS:
+            headers = {'If-None-Match': etags[url]} if etags else {}
+            started = time.perf_counter()
+            response = client.get(url, headers=headers)
+            samples.append((time.perf_counter() - started) * 1000)
+            total_bytes += len(response.data)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return statistics.median(samples), total_bytes, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rounds', type=int, default=20)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f'sqlite:///{tempfile.mkdtemp()}/conditional.db'
+    from main import app, init_db
+    from app import limiter
+    from scheduler import PriceUpdateScheduler
+
+    init_db()
+    PriceUpdateScheduler().update_prices()
+    limiter.enabled = False
+    client = app.test_client()
+
+    etags = {url: client.get(url).headers['ETag'] for url in URLS}
+    for cache_enabled in (False, True):
+        app.config['CACHE_ENABLED'] = cache_enabled
+        label = 'response cache on ' if cache_enabled else 'response cache off'
+        p50, full_bytes, _ = replay(client, args.rounds)
+        print(f"{label}  full GET:     p50 {p50:6.2f}ms  {full_bytes:>9,} bytes")
+        p50, cond_bytes, statuses = replay(client, args.rounds, etags)
+        print(f"{label}  If-None-Match: p50 {p50:6.2f}ms  {cond_bytes:>9,} bytes  statuses {statuses}")
+
+
+if __name__ == '__main__':
+    main()
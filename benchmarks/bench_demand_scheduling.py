@@ -0,0 +1,118 @@
+"""Simulate a month of searches against fixed and demand-driven refreshes.
+
+Searches follow a Zipf distribution over the 39 curated terms plus a long
+tail of terms users type that are not in the curated list. For one store,
+the fixed plan scrapes every curated term every 48 hours; the demand plan
+runs a cycle every 6 hours with the same average request budget, chosen by
+app.demand.select_pairs. Reported: upstream requests, the age of the data
+each search sees (over all searches that found data, and over searches for
+curated terms only), and how many searches found nothing scraped.
+
+    python benchmarks/bench_demand_scheduling.py --days 28 --searches-per-day 2000
+"""
+from datetime import datetime, timedelta
+import argparse
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.demand import MIN_SEARCHES, select_pairs
+from app.models.search_demand import DEMAND_HALF_LIFE_DAYS
+
+CURATED = [
+    'milk', 'bread', 'eggs', 'butter', 'cheese', 'yogurt',
+    'chicken', 'beef', 'pork', 'fish', 'bacon', 'sausages',
+    'apples', 'bananas', 'oranges', 'grapes', 'strawberries',
+    'potatoes', 'onions', 'carrots', 'tomatoes', 'lettuce',
+    'pasta', 'rice', 'cereal', 'flour', 'sugar', 'oil',
+    'coffee', 'tea', 'juice', 'water', 'wine', 'beer',
+    'soap', 'shampoo', 'toothpaste', 'detergent', 'tissues'
+]
+STORE = 'Tesco'
+
+
+def simulate(plan, terms, weights, days, searches_per_day, cycle_hours, seed):
+    rng = random.Random(seed)
+    start = datetime(2026, 1, 1)
+    last_scraped = {}
+    popularity = {term: 0.0 for term in terms}
+    counts = {term: 0 for term in terms}
+    decay = 0.5 ** (cycle_hours / 24.0 / DEMAND_HALF_LIFE_DAYS)
+
+    requests = 0
+    ages = []
+    curated_ages = []
+    misses = 0
+    cycles = int(days * 24 / cycle_hours)
+    searches_per_cycle = int(searches_per_day * cycle_hours / 24)
+
+    for cycle in range(cycles):
+        now = start + timedelta(hours=cycle * cycle_hours)
+        for term in plan(now, cycle, popularity, counts, last_scraped):
+            last_scraped[(STORE, term)] = now
+            requests += 1
+
+        # Searches arrive spread over the cycle
+        for term in rng.choices(terms, weights, k=searches_per_cycle):
+            moment = now + timedelta(hours=rng.random() * cycle_hours)
+            counts[term] += 1
+            popularity[term] += 1
+            scraped = last_scraped.get((STORE, term))
+            if scraped is None:
+                misses += 1
+            else:
+                ages.append((moment - scraped).total_seconds() / 3600)
+                if term in CURATED:
+                    curated_ages.append(ages[-1])
+        for term in popularity:
+            popularity[term] *= decay
+
+    return {
+        'requests': requests,
+        'mean_age': sum(ages) / len(ages),
+        'p90_age': sorted(ages)[int(len(ages) * 0.9)],
+        'curated_age': sum(curated_ages) / len(curated_ages),
+        'misses': misses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--days', type=int, default=28)
+    parser.add_argument('--searches-per-day', type=int, default=2000)
+    parser.add_argument('--tail-terms', type=int, default=40, help='uncurated terms users search for')
+    parser.add_argument('--cycle-hours', type=float, default=6)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    terms = CURATED + [f'tail term {i}' for i in range(args.tail_terms)]
+    rng.shuffle(terms)
+    # Zipf popularity over a shuffled order, so curated terms are not all hot
+    weights = [1.0 / (rank + 1) for rank in range(len(terms))]
+    budget = max(1, round(len(CURATED) * args.cycle_hours / 48))
+
+    def fixed(now, cycle, popularity, counts, last_scraped):
+        every = int(48 / args.cycle_hours)
+        return CURATED if cycle % every == 0 else []
+
+    def demand(now, cycle, popularity, counts, last_scraped):
+        # popularity decays like SearchDemand.popularity
+        candidates = dict.fromkeys(CURATED, 0.0)
+        for term, count in counts.items():
+            if term in candidates or count >= MIN_SEARCHES:
+                candidates[term] = popularity[term]
+        return [term for _, term in select_pairs(candidates, last_scraped, [STORE], budget, now)]
+
+    print(f"{args.days} days, {args.searches_per_day} searches/day over {len(terms)} terms "
+          f"({args.tail_terms} uncurated), one store")
+    for label, plan in (('fixed 39 terms / 48h', fixed), (f'demand, {budget}/cycle every {args.cycle_hours:g}h', demand)):
+        result = simulate(plan, terms, weights, args.days, args.searches_per_day, args.cycle_hours, seed=1)
+        print(f"{label:30s} {result['requests']:5d} requests  mean age {result['mean_age']:5.1f}h  "
+              f"p90 {result['p90_age']:5.1f}h  curated terms {result['curated_age']:5.1f}h  "
+              f"{result['misses']:6d} searches with no data")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""Measure the scraper HTTP cache across two refresh cycles.
+
+A local stub store serves one HTML search page per term (with ETag and
+Last-Modified, answering 304 to matching revalidations); between cycles
+`--changed` of the pages get new prices. Each cycle fetches and parses
+every page with BeautifulSoup. The recorded cache is then replayed with
+the server stopped, as an offline fixture run.
+
+    python benchmarks/bench_http_cache.py --terms 40 --products 300 --changed 0.1
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from email.utils import formatdate
+import argparse
+import hashlib
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup
+
+from app.scraper import BaseScraper
+from app.scraper.http_cache import HttpCache
+
+
+def render_page(term, products, version):
+    rng = random.Random(f'{term}:{version}')
+    items = ''.join(
+        f'<div class="product"><h3 class="name">{term.title()} product {i}</h3>'
+        f'<span class="price">&euro;{rng.uniform(0.5, 10):.2f}</span><span class="unit">500g</span></div>'
+        for i in range(products)
+    )
+    return f'<html><body><div class="results">{items}</div></body></html>'.encode('utf-8')
+
+
+def start_store(pages):
+    state = {'bytes_sent': 0, 'not_modified': 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            term = self.path.rsplit('=', 1)[-1]
+            body, modified = pages[term]
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == etag:
+                state['not_modified'] += 1
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            state['bytes_sent'] += len(body)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('ETag', etag)
+            self.send_header('Last-Modified', formatdate(modified, usegmt=True))
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+class StubScraper(BaseScraper):
+    def __init__(self, base_url, cache):
+        super().__init__('Stub', delay=0.001)
+        self.base_url = base_url
+        self.http_cache = cache
+        self.parses = 0
+
+    def search_products(self, query):
+        return self._fetch_products(f'{self.base_url}/search', self._parse, params={'q': query})
+
+    def _parse(self, response):
+        self.parses += 1
+        soup = BeautifulSoup(response.text, 'html.parser')
+        return [self._standardize_product({
+            'name': item.select_one('.name').get_text(),
+            'price': self._extract_price(item.select_one('.price').get_text()),
+            'unit': item.select_one('.unit').get_text(),
+        }) for item in soup.select('.product')]
+
+
+def cycle(label, scraper, terms, state):
+    sent_before = state['bytes_sent'] if state else 0
+    parses_before = scraper.parses
+    started = time.perf_counter()
+    count = sum(len(scraper.search_products(term)) for term in terms)
+    elapsed = time.perf_counter() - started
+    sent = (state['bytes_sent'] - sent_before) / 1e6 if state else 0.0
+    print(f"{label:28s} {elapsed:6.2f}s  {sent:7.2f} MB sent  {scraper.parses - parses_before:4d} parses  "
+          f"{count} products")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--terms', type=int, default=40)
+    parser.add_argument('--products', type=int, default=300, help='products per page')
+    parser.add_argument('--changed', type=float, default=0.1, help='fraction of pages changed per cycle')
+    args = parser.parse_args()
+
+    terms = [f'term{i}' for i in range(args.terms)]
+    pages = {term: (render_page(term, args.products, 0), time.time() - 86400) for term in terms}
+    server, state = start_store(pages)
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+    page_kb = sum(len(body) for body, _ in pages.values()) / len(pages) / 1024
+    print(f"{args.terms} pages of {args.products} products (~{page_kb:.0f} KB each), "
+          f"{args.changed:.0%} change between cycles")
+
+    with tempfile.TemporaryDirectory() as directory:
+        uncached = StubScraper(base_url, HttpCache(directory, 'off'))
+        cycle('no cache, cycle 1', uncached, terms, state)
+
+        cache = HttpCache(directory, 'on')
+        cached = StubScraper(base_url, cache)
+        cycle('cache, cycle 1 (cold)', cached, terms, state)
+
+        for term in random.Random(1).sample(terms, int(len(terms) * args.changed)):
+            pages[term] = (render_page(term, args.products, 1), time.time())
+
+        cycle('no cache, cycle 2', uncached, terms, state)
+        cycle('cache, cycle 2 (revalidate)', cached, terms, state)
+        print(f"{'':28s} {cache.stats}")
+
+        stored = sum(os.path.getsize(os.path.join(root, name))
+                     for root, _, names in os.walk(directory) for name in names if name.endswith('.z'))
+        print(f"{'':28s} {stored / 1e6:.2f} MB on disk for "
+              f"{sum(len(body) for body, _ in pages.values()) / 1e6:.2f} MB of pages")
+
+        server.shutdown()
+        server.server_close()
+        replay = StubScraper(base_url, HttpCache(directory, 'replay'))
+        cycle('replay (server stopped)', replay, terms, None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""Compare per-row product saves against the batched ingestion pipeline.
+
+Loads a synthetic catalogue into a throwaway SQLite database (or
+DATABASE_URL) and reports rows/second for the old per-row
+query/flush/commit loop and for app.ingestion.ingest_products, on both a
+first load (all inserts) and a refresh where a third of prices change.
+
+    python benchmarks/bench_ingestion.py --rows 100000 --legacy-rows 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STORES = ['Tesco', 'SuperValu', 'Dunnes', 'Lidl', 'Aldi']
+
+
+def synthetic_results(rows, terms=200, price_shift=0.0):
+    """Yield (store_name, term, products) result sets totalling `rows` products"""
+    per_set = max(1, rows // (len(STORES) * terms))
+    produced = 0
+    for t in range(terms):
+        for store_name in STORES:
+            products = []
+            for i in range(per_set):
+                if produced >= rows:
+                    break
+                price = round(1 + (t * 7 + i) % 400 / 100, 2)
+                if price_shift and i % 3 == 0:
+                    price = round(price + price_shift, 2)
+                products.append({
+                    'store': store_name,
+                    'product': f'{store_name} Item {t}-{i}',
+                    'price': price,
+                    'unit': 'each',
+                    'url': f'https://example.ie/{store_name}/{t}/{i}',
+                    'image': ''
+                })
+                produced += 1
+            yield store_name, f'term{t}', products
+
+
+def legacy_save(db, Product, PriceHistory, product_data, store_id, search_term):
+    """The per-row save the scheduler used before batched ingestion"""
+    existing = Product.query.filter_by(name=product_data['product'], store_id=store_id).first()
+    if existing:
+        old_price = existing.price
+        existing.price = product_data['price']
+        existing.last_updated = datetime.utcnow()
+        existing.is_active = True
+        if old_price != product_data['price']:
+            PriceHistory.record_price(existing.id, product_data['price'])
+    else:
+        product = Product(name=product_data['product'], store_id=store_id, price=product_data['price'],
+                          unit=product_data['unit'], image_url=product_data['image'],
+                          store_url=product_data['url'], search_term=search_term.lower(), is_active=True)
+        db.session.add(product)
+        db.session.flush()
+        PriceHistory.record_price(product.id, product_data['price'])
+    db.session.commit()
+
+
+def reset(db, Store):
+    db.drop_all()
+    db.create_all()
+    for name in STORES:
+        db.session.add(Store(name=name))
+    db.session.commit()
+    return {store.name: store.id for store in Store.query.all()}
+
+
+def timed(label, rows, func):
+    started = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {rows:>8} rows  {elapsed:8.2f}s  {rows / elapsed:>10,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--legacy-rows', type=int, default=5000,
+                        help='rows for the per-row path, which is too slow to run at full size')
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{os.path.join(tmpdir, "bench.db")}')
+
+    from app import create_app, db
+    from app.models import Product, Store, PriceHistory
+    from app.ingestion import ingest_products
+
+    app = create_app()
+    with app.app_context():
+        def run_legacy(shift):
+            for store_name, term, products in synthetic_results(args.legacy_rows, price_shift=shift):
+                for product_data in products:
+                    legacy_save(db, Product, PriceHistory, product_data, store_ids[store_name], term)
+
+        def run_bulk(shift):
+            for store_name, term, products in synthetic_results(args.rows, price_shift=shift):
+                ingest_products(store_ids[store_name], term, products)
+
+        store_ids = reset(db, Store)
+        timed('per-row save, initial load', args.legacy_rows, lambda: run_legacy(0))
+        timed('per-row save, refresh', args.legacy_rows, lambda: run_legacy(0.1))
+
+        store_ids = reset(db, Store)
+        timed('batched ingestion, initial load', args.rows, lambda: run_bulk(0))
+        timed('batched ingestion, refresh', args.rows, lambda: run_bulk(0.1))
+        print(f"products={Product.query.count()} price_history={PriceHistory.query.count()}")
+
+
+if __name__ == '__main__':
+    main()
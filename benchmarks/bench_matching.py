@@ -0,0 +1,173 @@
+"""Compare LSH-blocked product matching against all-pairs matching.
+
+Generates a synthetic catalogue in which every item is listed by up to
+five stores, with store-brand prefixes, reordered words, spelling variants
+and the size written differently ('1L', '1 Litre', '1000ml'). Each catalogue
+size is matched two ways: by comparing every product with every canonical
+product so far (O(n^2)), and through app.matching's MinHash LSH index.
+Reported: time, trigram comparisons made, and pairwise precision/recall
+against the true items. Then app.matching.match_unassigned runs
+end-to-end on a throwaway SQLite database (or DATABASE_URL).
+
+    python benchmarks/bench_matching.py --sizes 1000 2000 4000 8000 --db-rows 20000
+"""
+from collections import defaultdict
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import matching
+from app.units import parse_unit
+
+STORES = ['Tesco', 'SuperValu', 'Dunnes', 'Lidl', 'Aldi']
+ADJECTIVES = ['fresh', 'organic', 'free range', 'smoked', 'mature', 'low fat', 'wholemeal', 'natural',
+              'sliced', 'large', 'sweet', 'spicy', 'roasted', 'frozen', 'irish', 'premium', 'mild', 'crunchy']
+NOUNS = ['milk', 'yogurt', 'cheddar', 'butter', 'chicken breast', 'salmon fillet', 'bread', 'pasta',
+         'rice', 'cornflakes', 'coffee', 'tea bags', 'orange juice', 'tomatoes', 'apples', 'crisps',
+         'sausages', 'bacon rashers', 'ham', 'porridge oats', 'granola', 'olive oil', 'ketchup', 'soup']
+SIZES = [('1L', '1 Litre', '1000ml'), ('2L', '2 Litre', '2000ml'), ('500ml', '500 ml', '0.5L'),
+         ('500g', '500 g', '0.5kg'), ('1kg', '1 kg', '1000g'), ('200g', '200 g', '200gr'),
+         ('12pk', '12 pack', '12 Pack'), ('6pk', '6 pack', '6 Pack')]
+SPELLINGS = {'yogurt': 'yoghurt', 'flavoured': 'flavored', 'wholemeal': 'whole meal'}
+
+
+def synthetic_catalogue(rows, seed=11):
+    """(store_id, name, quantity, base_unit, item) rows, item being the ground truth"""
+    rng = random.Random(seed)
+    products = []
+    seen = set()
+    item = 0
+    while len(products) < rows:
+        words = rng.sample(ADJECTIVES, rng.randint(1, 2)) + [rng.choice(NOUNS)]
+        if rng.random() < 0.5:
+            words.insert(0, f'brand{rng.randint(1, rows // 20 + 1)}')
+        sizes = rng.choice(SIZES)
+        # Each generated item is distinct, so the ground truth is exact
+        if (frozenset(words), sizes) in seen:
+            continue
+        seen.add((frozenset(words), sizes))
+        for store in rng.sample(STORES, rng.randint(1, 5)):
+            variant = list(words)
+            if rng.random() < 0.3:
+                variant = [SPELLINGS.get(word, word) for word in variant]
+            if rng.random() < 0.2 and len(variant) > 2:
+                variant[0], variant[1] = variant[1], variant[0]
+            size = rng.choice(sizes)
+            quantity, base_unit = parse_unit(size)
+            products.append((STORES.index(store), f"{store} {' '.join(variant).title()} {size}", quantity,
+                             base_unit, item))
+        item += 1
+    return products[:rows]
+
+
+def match_all_pairs(products):
+    """Greedy clustering comparing each product with every canonical product so far"""
+    canonicals = []
+    labels = []
+    comparisons = 0
+    for store_id, name, quantity, base_unit, _ in products:
+        grams = matching.shingles(matching.key_tokens(name))
+        size = matching.size_key(quantity, base_unit)
+        best, best_score = None, matching.MATCH_THRESHOLD
+        for index, (canonical_grams, canonical_size, stores) in enumerate(canonicals):
+            comparisons += 1
+            if canonical_size != size or store_id in stores:
+                continue
+            score = matching.jaccard(grams, canonical_grams)
+            if score >= best_score:
+                best, best_score = index, score
+        if best is None:
+            canonicals.append((grams, size, {store_id}))
+            best = len(canonicals) - 1
+        else:
+            canonicals[best][2].add(store_id)
+        labels.append(best)
+    return labels, comparisons
+
+
+def match_lsh(products):
+    index = matching.MatchIndex()
+    labels = []
+    comparisons = 0
+    for store_id, name, quantity, base_unit, _ in products:
+        grams = matching.shingles(matching.key_tokens(name))
+        keys = matching.band_keys(matching.minhash(grams), quantity, base_unit)
+        comparisons += len({c for key in keys for c in index.buckets.get(key, ())})
+        canonical_id = index.best_match(grams, keys, store_id)
+        if canonical_id is None:
+            canonical_id = len(index.grams)
+            index.add(canonical_id, grams, keys)
+        index.stores[canonical_id].add(store_id)
+        labels.append(canonical_id)
+    return labels, comparisons
+
+
+def pair_scores(products, labels):
+    """Precision and recall over same-cluster product pairs"""
+    def pairs(groups):
+        result = set()
+        for members in groups.values():
+            members = sorted(members)
+            result.update((a, b) for i, a in enumerate(members) for b in members[i + 1:])
+        return result
+
+    truth, predicted = defaultdict(list), defaultdict(list)
+    for position, (product, label) in enumerate(zip(products, labels)):
+        truth[product[4]].append(position)
+        predicted[label].append(position)
+    true_pairs, found = pairs(truth), pairs(predicted)
+    hits = len(true_pairs & found)
+    return hits / len(found) if found else 1.0, hits / len(true_pairs) if true_pairs else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 2000, 4000, 8000])
+    parser.add_argument('--db-rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'products':>8}  {'method':<10} {'seconds':>8} {'comparisons':>12} {'precision':>9} {'recall':>7}")
+    for size in args.sizes:
+        products = synthetic_catalogue(size)
+        for label, method in (('all-pairs', match_all_pairs), ('lsh', match_lsh)):
+            started = time.perf_counter()
+            labels, comparisons = method(products)
+            elapsed = time.perf_counter() - started
+            precision, recall = pair_scores(products, labels)
+            print(f"{size:>8}  {label:<10} {elapsed:>8.2f} {comparisons:>12,} {precision:>9.3f} {recall:>7.3f}")
+
+    if not args.db_rows:
+        return
+    tmpdir = tempfile.mkdtemp()
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{os.path.join(tmpdir, "bench.db")}')
+    from app import create_app, db
+    from app.models import Product, Store, CanonicalProduct
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for name in STORES:
+            db.session.add(Store(name=name))
+        db.session.commit()
+        store_ids = {store.name: store.id for store in Store.query.all()}
+        products = synthetic_catalogue(args.db_rows)
+        db.session.execute(db.insert(Product), [{
+            'name': name, 'store_id': store_ids[STORES[store]], 'price': 1.0, 'unit': None,
+            'quantity': quantity, 'base_unit': base_unit, 'search_term': 'bench', 'is_active': True
+        } for store, name, quantity, base_unit, _ in products])
+        db.session.commit()
+        started = time.perf_counter()
+        matched = matching.match_unassigned()
+        elapsed = time.perf_counter() - started
+        print(f"match_unassigned (SQLite): {matched} products -> {CanonicalProduct.query.count()} canonical "
+              f"products in {elapsed:.2f}s ({matched / elapsed:,.0f} products/s)")
+
+
+if __name__ == '__main__':
+    main()
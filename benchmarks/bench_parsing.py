@@ -0,0 +1,159 @@
+"""Parse throughput of app.scraper.parsing on a corpus of saved HTML pages.
+
+The corpus is either a directory of saved search results pages (--fixtures,
+e.g. bodies exported from the HTTP cache, with --item/--name/--price
+selectors that match them) or a generated one: grocery listing pages with
+the header, navigation, scripts and nested markup of a real store page,
+written to a temp directory and read back.
+
+Parsers compared, pages/s and products/s:
+  bs4 per call  BeautifulSoup html.parser with string selectors and a
+                regex compiled on every price (how scrapers would be written
+                without this module)
+  bs4           parse_listing's fallback: precompiled soupsieve selectors,
+                on lxml's tree builder when lxml is installed
+  lxml          parse_listing with lxml and selectors compiled to XPath
+
+Then the fetch/parse pipeline: --threads scrape threads each "fetch"
+pages (a --latency sleep standing in for the network) and parse them
+inline or through the process pool. With the pool, parsing no longer
+holds the GIL the fetch threads need, and it spreads over CPU cores.
+
+    python benchmarks/bench_parsing.py --pages 40 --products 120 --threads 4 --processes 2
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import glob
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.scraper import parsing
+from app.scraper.parsing import ListingSpec, parse_listing
+
+SPEC = ListingSpec(item='li.product-tile', name='h3.product-title a', price='.price .value',
+                   unit='.price-per-unit', link='h3.product-title a', image='img.product-image')
+ADJECTIVES = ['Fresh', 'Organic', 'Free Range', 'Smoked', 'Mature', 'Low Fat', 'Wholemeal', 'Irish']
+NOUNS = ['Milk', 'Yogurt', 'Cheddar', 'Butter', 'Chicken Breast', 'Bread', 'Pasta', 'Rice', 'Coffee']
+
+
+def generate_page(products, rng):
+    tiles = []
+    for index in range(products):
+        name = f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(["500g", "1L", "1kg", "6 Pack"])}'
+        tiles.append(f'''
+      <li class="product-tile" data-id="{index}">
+        <div class="tile-inner"><div class="image-wrap">
+          <img class="product-image" src="/images/{index}.jpg" alt="{name}" loading="lazy"></div>
+        <div class="details">
+          <h3 class="product-title"><a href="/product/{index}"> {name} </a></h3>
+          <div class="badges"><span class="badge">Clubcard price</span></div>
+          <div class="price"><span class="currency">&euro;</span><span class="value">{rng.uniform(0.5, 9):,.2f}</span></div>
+          <p class="price-per-unit">&euro;{rng.uniform(0.5, 20):.2f}/kg</p>
+          <form class="add"><input type="number" value="1"><button>Add</button></form>
+        </div></div>
+      </li>''')
+    nav = ''.join(f'<li><a href="/c/{n}">Category {n}</a><ul>{"<li><a>Sub</a></li>" * 8}</ul></li>' for n in range(30))
+    script = '<script>window.__STATE__ = {' + ','.join(f'"k{n}": {n}' for n in range(400)) + '};</script>'
+    return (f'<!DOCTYPE html><html><head><title>Search</title>{script}</head><body>'
+            f'<header><nav><ul>{nav}</ul></nav></header><main><ul class="results">{"".join(tiles)}</ul></main>'
+            f'<footer>{"<p>Footer text</p>" * 40}</footer></body></html>').encode('utf-8')
+
+
+def parse_per_call(html, spec, base_url=''):
+    """The uncompiled baseline: string selectors and a regex built per price"""
+    import re
+    from bs4 import BeautifulSoup
+    products = []
+    for item in BeautifulSoup(html, 'html.parser').select(spec.item):
+        name = item.select_one(spec.name)
+        price = item.select_one(spec.price)
+        match = re.search(r'[\d,]+\.?\d*', price.get_text().replace(',', '')) if price else None
+        if name and match:
+            products.append({'name': ' '.join(name.get_text().split()), 'price': float(match.group())})
+    return products
+
+
+def throughput(corpus, parse, repeats):
+    started = time.perf_counter()
+    products = 0
+    for _ in range(repeats):
+        for html in corpus:
+            products += len(parse(html))
+    elapsed = time.perf_counter() - started
+    return len(corpus) * repeats / elapsed, products / elapsed
+
+
+def pipeline(corpus, threads, latency, pool):
+    def scrape(html):
+        time.sleep(latency)
+        return len(parsing.submit_parse(html, SPEC, 'https://store.example', pool=pool).result())
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        products = sum(executor.map(scrape, corpus))
+    return time.perf_counter() - started, products
+
+
+def main():
+    global SPEC
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--fixtures', help='directory of saved .html pages')
+    parser.add_argument('--item', help='product selector for --fixtures pages')
+    parser.add_argument('--name')
+    parser.add_argument('--price')
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--products', type=int, default=120)
+    parser.add_argument('--repeats', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--processes', type=int, default=max(1, (os.cpu_count() or 1) - 1))
+    args = parser.parse_args()
+
+    directory = args.fixtures
+    if directory:
+        if args.item:
+            SPEC = ListingSpec(item=args.item, name=args.name, price=args.price)
+    else:
+        directory = tempfile.mkdtemp()
+        rng = random.Random(3)
+        for page in range(args.pages):
+            with open(os.path.join(directory, f'search-{page:03d}.html'), 'wb') as f:
+                f.write(generate_page(args.products, rng))
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.html'))):
+        with open(path, 'rb') as f:
+            corpus.append(f.read())
+    size = sum(len(html) for html in corpus) / len(corpus) / 1024
+    print(f"{len(corpus)} pages, {size:.0f} KiB average, {os.cpu_count()} CPUs")
+
+    parsers = [('bs4 per call', lambda html: parse_per_call(html, SPEC)),
+               ('bs4', lambda html: parse_listing(html, SPEC, parser='bs4'))]
+    if parsing.lxml is not None:
+        parsers.append(('lxml', lambda html: parse_listing(html, SPEC, parser='lxml')))
+    else:
+        print('lxml is not installed; skipping it')
+
+    print(f"{'parser':<14} {'pages/s':>9} {'products/s':>11}")
+    for label, parse in parsers:
+        pages, products = throughput(corpus, parse, args.repeats)
+        print(f"{label:<14} {pages:>9.1f} {products:>11,.0f}")
+
+    print(f"\npipeline: {args.threads} scrape threads, {args.latency * 1000:.0f} ms fetch latency, "
+          f"parser {parsing.PARSER}")
+    inline, expected = pipeline(corpus, args.threads, args.latency, None)
+    print(f"{'inline':<14} {inline:>8.2f}s")
+    pool = parsing.parse_pool(args.processes)
+    # Start the workers (and import the parser in them) before timing
+    list(pool.map(parse_listing, corpus[:args.processes], [SPEC] * args.processes))
+    pooled, products = pipeline(corpus, args.threads, args.latency, pool)
+    print(f"{f'{args.processes} processes':<14} {pooled:>8.2f}s  same products: {products == expected}")
+    pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""Price history lookups and rollups on a large synthetic history.
+
+Generates --rows PriceHistory rows (default 50M; use fewer for a quick run)
+spread over --products products and two years, then reports:
+
+- per-product 30-day lookups without and with the (product_id, recorded_at)
+  index,
+- rollup throughput for the daily/weekly downsampling job,
+- get_price_history latency for 30-day, 1-year and 2-year ranges afterwards.
+
+    python benchmarks/bench_price_history.py --rows 50000000 --products 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def median_ms(func, args_list):
+    samples = []
+    for args in args_list:
+        started = time.perf_counter()
+        func(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=50000000)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ['DATABASE_URL'] = f'sqlite:///{tempfile.mkdtemp()}/history.db'
+    from app import create_app, db
+    from app.models import Product, PriceHistory, Store
+    from app.timeseries import get_price_history, rollup_price_history
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        index = next(i for i in PriceHistory.__table__.indexes if i.name == 'ix_price_history_product_recorded')
+        index.drop(db.engine)
+
+        store = Store(name='Tesco')
+        db.session.add(store)
+        db.session.commit()
+        now = datetime.utcnow()
+        db.session.execute(db.insert(Product.__table__), [
+            {'name': f'Product {i}', 'store_id': store.id, 'price': 1.0, 'search_term': 'bench',
+             'last_updated': now, 'is_active': True} for i in range(args.products)
+        ])
+
+        started = time.perf_counter()
+        rng = random.Random(0)
+        span = 730 * 86400
+        batch = []
+        for i in range(args.rows):
+            batch.append({'product_id': rng.randrange(1, args.products + 1),
+                          'price': round(rng.uniform(0.5, 10), 2),
+                          'recorded_at': now - timedelta(seconds=rng.randrange(span))})
+            if len(batch) == 100000:
+                db.session.execute(db.insert(PriceHistory.__table__), batch)
+                batch = []
+        if batch:
+            db.session.execute(db.insert(PriceHistory.__table__), batch)
+        db.session.commit()
+        print(f"generated {args.rows:,} history rows in {time.perf_counter() - started:.1f}s")
+
+        lookups = [(rng.randrange(1, args.products + 1), now - timedelta(days=30))
+                   for _ in range(args.lookups)]
+
+        def lookup(product_id, since):
+            PriceHistory.query.filter(PriceHistory.product_id == product_id,
+                                      PriceHistory.recorded_at >= since).all()
+
+        print(f"30-day lookup, no composite index: {median_ms(lookup, lookups[:10]):8.2f}ms")
+        index.create(db.engine)
+        print(f"30-day lookup, composite index:    {median_ms(lookup, lookups):8.2f}ms")
+
+        started = time.perf_counter()
+        written = rollup_price_history(now)
+        elapsed = time.perf_counter() - started
+        remaining = PriceHistory.query.count()
+        print(f"rollup: {args.rows - remaining:,} raw rows -> {written['day']:,} daily / "
+              f"{written['week']:,} weekly buckets in {elapsed:.1f}s "
+              f"({(args.rows - remaining) / elapsed:,.0f} rows/s), {remaining:,} raw rows kept")
+
+        for days, resolution in ((30, 'auto'), (365, 'auto'), (730, 'week')):
+            ranges = [(product_id, now - timedelta(days=days), now, resolution) for product_id, _ in lookups]
+            print(f"history API, {days:>3} days ({resolution}): {median_ms(get_price_history, ranges):8.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Compare fixed-delay scraping against the adaptive host rate limiter.
+
+A local stub store allows `--allowed` requests per second and answers
+anything faster with 429 and a Retry-After header. The legacy client sleeps
+a fixed delay and lets urllib3 back off on 429; the adaptive client shares
+one token bucket per host, halves its rate on 429 and honours Retry-After.
+Both threaded and asyncio callers are measured, and the recovery curve
+shows how many successes a bucket needs to climb back after one 429, for
+a slow and a fast ceiling.
+
+    python benchmarks/bench_rate_limit.py --requests 40 --allowed 8 --delay 0.05
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.scraper import BaseScraper
+from app.scraper.rate_limit import HostRateLimiter, TokenBucket
+
+
+def start_throttling_server(allowed, latency):
+    state = {'window': 0, 'count': 0, 'throttled': 0, 'served': 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            with lock:
+                window = int(time.monotonic())
+                if window != state['window']:
+                    state['window'], state['count'] = window, 0
+                state['count'] += 1
+                throttled = state['count'] > allowed
+                state['throttled' if throttled else 'served'] += 1
+            self.send_response(429 if throttled else 200)
+            if throttled:
+                self.send_header('Retry-After', '1')
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'ok')
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+class StubScraper(BaseScraper):
+    def __init__(self, url, delay):
+        super().__init__('Stub', delay=delay)
+        self.base_url = url
+
+    def search_products(self, query):
+        return self._make_request(self.base_url, params={'q': query})
+
+
+def legacy_fetch(session, url, delay, query):
+    time.sleep(delay)
+    try:
+        return session.get(url, params={'q': query}, timeout=10)
+    except requests.RequestException:
+        return None
+
+
+def legacy_session():
+    session = requests.Session()
+    retry = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                  raise_on_status=False)
+    session.mount('http://', HTTPAdapter(max_retries=retry))
+    return session
+
+
+def run(label, fn, requests_count, workers, state):
+    state['throttled'] = state['served'] = 0
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(fn, range(requests_count)))
+    elapsed = time.perf_counter() - started
+    print(f"{label:30s} {elapsed:6.2f}s  {state['served']:4d} served  {state['throttled']:4d} x 429")
+
+
+async def run_async(limiter, host, requests_count):
+    """Many coroutines sharing one bucket; returns the achieved request rate"""
+    started = time.perf_counter()
+    await asyncio.gather(*(limiter.acquire_async(host) for _ in range(requests_count)))
+    return requests_count / (time.perf_counter() - started)
+
+
+def recovery_curve(ceiling, checkpoints=(1, 5, 10, 25, 50, 100)):
+    """Rate after each checkpoint's worth of successes following one 429"""
+    bucket = TokenBucket(ceiling)
+    bucket.throttled(bucket.updated)
+    curve, successes, elapsed = [], 0, 0.0
+    while bucket.rate < ceiling or successes < checkpoints[-1]:
+        if bucket.rate < ceiling:
+            # Traffic at the current rate, so elapsed is seconds of requests
+            elapsed += 1 / bucket.rate
+            recovered = successes + 1
+        bucket.succeeded()
+        successes += 1
+        if successes in checkpoints:
+            curve.append(f"{successes}: {bucket.rate / ceiling:4.0%}")
+    print(f"{f'recovery, ceiling {ceiling:g}/s':30s} {'  '.join(curve)}  "
+          f"(full after {recovered} successes, {elapsed:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--allowed', type=int, default=8, help='requests/s the stub store tolerates')
+    parser.add_argument('--delay', type=float, default=0.05, help='configured politeness delay (s)')
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    server, state = start_throttling_server(args.allowed, args.latency)
+    url = f'http://127.0.0.1:{server.server_address[1]}/search'
+    print(f"{args.requests} requests, {args.workers} threads, store allows {args.allowed}/s, "
+          f"configured delay {args.delay}s")
+
+    session = legacy_session()
+    run('fixed sleep + urllib3 backoff', lambda i: legacy_fetch(session, url, args.delay, str(i)),
+        args.requests, args.workers, state)
+
+    scraper = StubScraper(url, args.delay)
+    run('adaptive token bucket', lambda i: scraper.search_products(str(i)),
+        args.requests, args.workers, state)
+    print(f"{'rate after run':30s} {scraper.request_rate:.2f} req/s "
+          f"(ceiling {1 / args.delay:.0f})")
+
+    limiter = HostRateLimiter()
+    limiter.configure('async-host', 20.0)
+    achieved = asyncio.run(run_async(limiter, 'async-host', 41))
+    print(f"{'asyncio, 41 waiters @ 20/s':30s} {achieved:6.2f} req/s achieved")
+
+    for ceiling in (2.0, 20.0):
+        recovery_curve(ceiling)
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
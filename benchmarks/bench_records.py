@@ -0,0 +1,178 @@
+"""Memory and throughput of ScrapedProduct records against standardised dicts.
+
+Builds a synthetic scrape of --rows products (raw parse output with the
+padded text and fresh size strings a page parse yields) two ways:
+
+  dicts    the old _standardize_product dict per product, then
+           app.units.normalize per product while building ingestion rows
+  records  BaseScraper._standardize_product records, validate_batch over
+           the whole set, then rows read from the record attributes
+
+and reports the memory held by the in-flight products (tracemalloc,
+bytes per product) and the time to standardise, validate and normalise,
+and build the rows ingestion would write. Timings are for the whole set
+in flight at once and for result sets of 500 streamed through, which is
+how the scheduler ingests them; a million live records make the cyclic
+GC rescan them, which dicts of strings and floats avoid by being
+untracked.
+
+    python benchmarks/bench_records.py --rows 1000000
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.scraper import AldiScraper
+from app.scraper.records import validate_batch
+from app.units import normalize
+
+ADJECTIVES = ['Fresh', 'Organic', 'Free Range', 'Smoked', 'Mature', 'Low Fat', 'Wholemeal', 'Irish']
+NOUNS = ['Milk', 'Yogurt', 'Cheddar', 'Butter', 'Chicken Breast', 'Bread', 'Pasta', 'Rice', 'Coffee']
+SIZES = ['500g', '1L', '1kg', '6 Pack', '2 x 400g', 'each', '750ml', '']
+BATCH_SIZE = 500
+
+
+def raw_products(rows, seed=7):
+    rng = random.Random(seed)
+    for index in range(rows):
+        name = f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {index}'
+        # A failed price parse now and then, as _extract_price returns 0.0
+        price = 0.0 if index % 250 == 0 else round(rng.uniform(0.5, 20), 2)
+        yield {
+            'name': f' {name} ',
+            'price': price,
+            'unit': f' {rng.choice(SIZES)} ',
+            'url': f'https://www.aldi.ie/product/{index}',
+            'image': f'https://www.aldi.ie/images/{index}.jpg',
+        }
+
+
+def standardize_dict(store_name, raw_data):
+    """_standardize_product as it was before records"""
+    return {
+        'store': store_name,
+        'product': raw_data.get('name', '').strip(),
+        'price': float(raw_data.get('price', 0)),
+        'unit': raw_data.get('unit', '').strip(),
+        'url': raw_data.get('url', ''),
+        'image': raw_data.get('image', '')
+    }
+
+
+def dict_rows(batch):
+    return [{
+        'name': product_data['product'],
+        'brand': product_data.get('brand') or None,
+        'category': product_data.get('category') or None,
+        'promotion': product_data.get('promotion') or None,
+        'price': product_data['price'],
+        'unit': product_data['unit'],
+        'image_url': product_data['image'],
+        'store_url': product_data['url'],
+        **normalize(product_data['price'], product_data['unit'], product_data['product'])
+    } for product_data in batch]
+
+
+def record_rows(batch):
+    return [{
+        'name': product.name,
+        'brand': product.brand,
+        'category': product.category,
+        'promotion': product.promotion,
+        'price': product.price,
+        'unit': product.unit,
+        'image_url': product.image,
+        'store_url': product.url,
+        'quantity': product.quantity,
+        'base_unit': product.base_unit,
+        'price_per_unit': product.price_per_unit
+    } for product in batch]
+
+
+def held_bytes(build):
+    """Bytes still allocated by what build() returns"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    products = build()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return held, len(products)
+
+
+def best_of(repeats, func):
+    """Fastest of `repeats` runs of func(), which returns a tuple of stage timings"""
+    runs = []
+    for _ in range(repeats):
+        gc.collect()
+        runs.append(func())
+    return min(runs, key=sum)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    scraper = AldiScraper()
+    store_name = scraper.store_name
+    paths = (
+        ('dicts', lambda raw: standardize_dict(store_name, raw),
+         lambda products: ([product for product in products if product['product']], []), dict_rows),
+        ('records', scraper._standardize_product, validate_batch, record_rows),
+    )
+    raws = list(raw_products(args.rows))
+    print(f"{args.rows:,} products, best of {args.repeat}")
+    print(f"{'':<22} {'MB held':>8} {'B/product':>10} {'standardise':>12} {'validate':>9} {'rows':>7} "
+          f"{'total':>7} {'products/s':>11}")
+
+    for label, standardize, validate, to_rows in paths:
+        # Raw data generated lazily, so only the products are counted
+        held, count = held_bytes(lambda: [standardize(raw) for raw in raw_products(args.rows)])
+
+        def whole_set():
+            """The whole scrape in flight at once, then ingested in batches"""
+            started = time.perf_counter()
+            products = [standardize(raw) for raw in raws]
+            standardized = time.perf_counter()
+            valid, _ = validate(products)
+            validated = time.perf_counter()
+            for start in range(0, len(valid), BATCH_SIZE):
+                to_rows(valid[start:start + BATCH_SIZE])
+            return standardized - started, validated - standardized, time.perf_counter() - validated
+
+        def streamed():
+            """One result set of BATCH_SIZE products at a time, as the scheduler ingests them"""
+            timings = [0.0, 0.0, 0.0]
+            for start in range(0, len(raws), BATCH_SIZE):
+                started = time.perf_counter()
+                products = [standardize(raw) for raw in raws[start:start + BATCH_SIZE]]
+                standardized = time.perf_counter()
+                valid, _ = validate(products)
+                validated = time.perf_counter()
+                to_rows(valid)
+                for stage, elapsed in enumerate((standardized - started, validated - standardized,
+                                                 time.perf_counter() - validated)):
+                    timings[stage] += elapsed
+            return tuple(timings)
+
+        for mode, run in (('all in flight', whole_set), ('streamed', streamed)):
+            standardizing, validating, building = best_of(args.repeat, run)
+            total = standardizing + validating + building
+            memory = f"{held / 1e6:>8.0f} {held / count:>10.0f}" if mode == 'all in flight' else f"{'':>19}"
+            print(f"{f'{label}, {mode}':<22} {memory} {standardizing:>11.2f}s {validating:>8.2f}s "
+                  f"{building:>6.2f}s {total:>6.2f}s {count / total:>11,.0f}")
+
+    valid, rejected = validate_batch([scraper._standardize_product(raw) for raw in raw_products(args.rows)])
+    print(f"records: {len(valid):,} valid, {len(rejected):,} rejected")
+
+
+if __name__ == '__main__':
+    main()
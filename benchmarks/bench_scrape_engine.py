@@ -0,0 +1,126 @@
+"""Compare a serial scrape cycle against ScrapeEngine.
+
+Each mock scraper fetches its search page from its own local stub HTTP
+server (one port per store, so each store is a separate politeness host)
+before returning its usual mock products.
+
+    python benchmarks/bench_scrape_engine.py --delay 0.2 --terms 10
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.scraper import (TescoScraper, SuperValuScraper, DunnesScraper, LidlScraper,
+                         AldiScraper, ScrapeEngine, HttpCache)
+
+TERMS = ['milk', 'bread', 'eggs', 'butter', 'cheese', 'yogurt', 'chicken', 'beef',
+         'pork', 'fish', 'apples', 'bananas', 'pasta', 'rice', 'coffee', 'tea']
+
+
+def start_stub_server(latency):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            body = b'<html><body><div class="product">stub</div></body></html>'
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def stub_scraper(scraper_class, port, delay, legacy):
+    class StubScraper(scraper_class):
+        def __init__(self):
+            super().__init__()
+            self.delay = delay
+            self.http_cache = HttpCache('', 'off')
+            self.stub_url = f'http://127.0.0.1:{port}/search'
+
+        def search_products(self, query):
+            if legacy:
+                # Previous behaviour: a fixed sleep before every request
+                time.sleep(self.delay)
+                self.session.get(self.stub_url, params={'q': query}, timeout=10)
+            else:
+                self._make_request(self.stub_url, params={'q': query})
+            return self._get_mock_products(query)
+
+    return StubScraper()
+
+
+def build_scrapers(servers, delay, legacy=False):
+    classes = [TescoScraper, SuperValuScraper, DunnesScraper, LidlScraper, AldiScraper]
+    scrapers = {}
+    for scraper_class, server in zip(classes, servers):
+        scraper = stub_scraper(scraper_class, server.server_address[1], delay, legacy)
+        scrapers[scraper.store_name] = scraper
+    return scrapers
+
+
+def run_serial(scrapers, terms):
+    started = time.perf_counter()
+    count = 0
+    for term in terms:
+        for scraper in scrapers.values():
+            count += len(scraper.search_products(term))
+    return time.perf_counter() - started, count
+
+
+def run_engine(scrapers, terms, workers):
+    engine = ScrapeEngine(scrapers, concurrency={'*': workers})
+    count = 0
+
+    def collect(store_name, term, products, seconds):
+        nonlocal count
+        count += len(products)
+
+    started = time.perf_counter()
+    stats = engine.run(terms, collect)
+    elapsed = time.perf_counter() - started
+    slowest = max(s['seconds'] for s in stats.values())
+    return elapsed, count, slowest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--delay', type=float, default=0.2, help='per-host politeness delay (s)')
+    parser.add_argument('--latency', type=float, default=0.05, help='stub server response time (s)')
+    parser.add_argument('--terms', type=int, default=8, help='number of search terms')
+    parser.add_argument('--workers', type=int, default=2, help='workers per store')
+    args = parser.parse_args()
+
+    terms = TERMS[:args.terms]
+    servers = [start_stub_server(args.latency) for _ in range(5)]
+    jobs = len(terms) * len(servers)
+    print(f"{jobs} jobs ({len(terms)} terms x 5 stores), delay={args.delay}s, latency={args.latency}s")
+
+    elapsed, count = run_serial(build_scrapers(servers, args.delay, legacy=True), terms)
+    print(f"serial (sleep before request): {elapsed:6.2f}s  {count} products")
+
+    elapsed, count = run_serial(build_scrapers(servers, args.delay), terms)
+    print(f"serial (token bucket):         {elapsed:6.2f}s  {count} products")
+
+    elapsed, count, slowest = run_engine(build_scrapers(servers, args.delay), terms, args.workers)
+    print(f"engine ({args.workers} workers/store):      {elapsed:6.2f}s  {count} products "
+          f"(slowest store {slowest:.2f}s)")
+    print(f"single store lower bound:      {(len(terms) - 1) * args.delay:6.2f}s")
+
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
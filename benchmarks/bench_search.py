@@ -0,0 +1,101 @@
+"""Search latency at growing catalogue sizes.
+
+Builds synthetic catalogues in throwaway SQLite databases (FTS5 index) and
+times Product.search_products against the old leading-wildcard
+`search_term ILIKE '%q%'` scan.
+
+    python benchmarks/bench_search.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STORES = ['Tesco', 'SuperValu', 'Dunnes', 'Lidl', 'Aldi']
+TERMS = ['milk', 'bread', 'eggs', 'butter', 'cheese', 'yogurt', 'chicken', 'beef', 'pork',
+         'fish', 'apples', 'bananas', 'pasta', 'rice', 'cereal', 'coffee', 'tea', 'juice']
+ADJECTIVES = ['Fresh', 'Organic', 'Premium', 'Value', 'Irish', 'Free Range', 'Low Fat',
+              'Wholemeal', 'Smoked', 'Mature', 'Sliced', 'Large', 'Family']
+QUERIES = ['milk', 'organic milk', 'chee', 'free range eggs', 'smok', 'tesco coffee', 'xyzzy']
+
+
+def populate(db, Product, Store, size):
+    db.create_all()
+    for name in STORES:
+        db.session.add(Store(name=name))
+    db.session.commit()
+    store_ids = [store.id for store in Store.query.all()]
+
+    rng = random.Random(size)
+    now = datetime.utcnow()
+    rows = []
+    for i in range(size):
+        term = rng.choice(TERMS)
+        store = rng.randrange(len(STORES))
+        rows.append({
+            'name': f'{STORES[store]} {rng.choice(ADJECTIVES)} {term.title()} {i}',
+            'store_id': store_ids[store],
+            'price': round(rng.uniform(0.5, 15), 2),
+            'unit': 'each',
+            'search_term': term,
+            'last_updated': now,
+            'is_active': True
+        })
+        if len(rows) == 50000:
+            db.session.execute(db.insert(Product.__table__), rows)
+            rows = []
+    if rows:
+        db.session.execute(db.insert(Product.__table__), rows)
+    db.session.commit()
+
+
+def time_queries(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        for query in QUERIES:
+            started = time.perf_counter()
+            func(query)
+            samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from flask import Flask
+    from app import db
+    from app.models import Product, Store
+    from app.search import ensure_search_index
+
+    print(f"{'products':>9} {'ILIKE p50':>10} {'ILIKE p95':>10} {'index p50':>10} {'index p95':>10}  (ms)")
+    for size in args.sizes:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{tempfile.mkdtemp()}/search.db'
+        db.init_app(app)
+        with app.app_context():
+            populate(db, Product, Store, size)
+            ensure_search_index()
+
+            def like_search(query):
+                return Product.query.filter(
+                    Product.search_term.ilike(f'%{query}%'),
+                    Product.is_active == True
+                ).order_by(Product.price.asc()).limit(50).all()
+
+            like = time_queries(like_search, args.repeat)
+            indexed = time_queries(lambda query: Product.search_products(query, limit=50), args.repeat)
+            print(f"{size:>9} {like[0]:>10.2f} {like[1]:>10.2f} {indexed[0]:>10.2f} {indexed[1]:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
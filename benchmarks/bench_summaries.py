@@ -0,0 +1,113 @@
+"""Stats page latency as the products table grows.
+
+For each catalogue size, times the aggregate queries /api/stats, /stores and
+/trends used to run directly on the products table against the same pages
+served from price_summaries (response cache disabled).
+
+    python benchmarks/bench_summaries.py --sizes 10000 100000 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STORES = ['Tesco', 'SuperValu', 'Dunnes', 'Lidl', 'Aldi']
+TERMS = ['milk', 'bread', 'eggs', 'butter', 'chicken', 'cheese', 'pasta', 'rice', 'tea',
+         'coffee', 'apples', 'bananas', 'beef', 'pork', 'fish', 'juice', 'wine', 'soap']
+CATEGORIES = ['Dairy', 'Bakery', 'Meat', 'Produce', 'Pantry', 'Drinks', 'Household']
+
+
+def populate(db, Product, Store, PriceSummary, size):
+    db.create_all()
+    for name in STORES:
+        db.session.add(Store(name=name))
+    db.session.commit()
+    store_ids = [store.id for store in Store.query.all()]
+
+    rng = random.Random(size)
+    now = datetime.utcnow()
+    rows = []
+    for i in range(size):
+        rows.append({
+            'name': f'Product {i}',
+            'store_id': rng.choice(store_ids),
+            'price': round(rng.uniform(0.5, 15), 2),
+            'search_term': rng.choice(TERMS),
+            'category': rng.choice(CATEGORIES),
+            'last_updated': now,
+            'is_active': True
+        })
+        if len(rows) == 50000:
+            db.session.execute(db.insert(Product.__table__), rows)
+            rows = []
+    if rows:
+        db.session.execute(db.insert(Product.__table__), rows)
+    PriceSummary.rebuild()
+    db.session.commit()
+
+
+def old_pages(db, Product, Store):
+    """The per-request aggregate queries the pages ran before price_summaries"""
+    def stats():
+        Product.query.filter_by(is_active=True).count()
+        db.session.query(Product.category, db.func.count(Product.id), db.func.min(Product.price),
+                         db.func.max(Product.price), db.func.avg(Product.price)).filter(
+            Product.is_active == True, Product.category.isnot(None)).group_by(Product.category).all()
+        Product.query.filter_by(is_active=True).order_by(Product.last_updated.desc()).first()
+
+    def stores():
+        for store in Store.query.all():
+            Product.query.filter_by(store_id=store.id, is_active=True).count()
+            Product.query.filter_by(store_id=store.id, is_active=True).with_entities(
+                db.func.avg(Product.price)).scalar()
+
+    def trends():
+        for item in ['milk', 'bread', 'eggs', 'butter', 'chicken']:
+            products = Product.query.filter(Product.search_term.ilike(f'%{item}%'),
+                                            Product.is_active == True).all()
+            len(set(p.store.name for p in products))
+
+    return {'/api/stats': stats, '/stores': stores, '/trends': trends}
+
+
+def median_ms(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from app import create_app, db, limiter
+    from app.models import Product, Store, PriceSummary
+
+    print(f"{'products':>9} {'page':<11} {'before ms':>10} {'after ms':>9}")
+    for size in args.sizes:
+        os.environ['DATABASE_URL'] = f'sqlite:///{tempfile.mkdtemp()}/summaries.db'
+        app = create_app()
+        app.config['CACHE_ENABLED'] = False
+        limiter.enabled = False
+        client = app.test_client()
+        with app.app_context():
+            populate(db, Product, Store, PriceSummary, size)
+            for page, old in old_pages(db, Product, Store).items():
+                before = median_ms(old, args.repeat)
+                after = median_ms(lambda: client.get(page), args.repeat)
+                print(f"{size:>9} {page:<11} {before:>10.2f} {after:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
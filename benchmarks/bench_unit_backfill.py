@@ -0,0 +1,119 @@
+"""Measure unit-price normalization, per row and batched with NumPy.
+
+Builds a synthetic catalogue whose sizes are drawn from a few hundred
+distinct strings ('500ml', '4 x 330ml', '12 pack', 'each' with the size in
+the name, ...). It times the per-row parse used at ingestion, with and
+without parse_unit's cache, against app.units.unit_prices. It then runs
+the full backfill_unit_prices against a throwaway SQLite database (or
+DATABASE_URL).
+
+    python benchmarks/bench_unit_backfill.py --rows 1000000 --db-rows 200000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import units
+
+STORES = ['Tesco', 'SuperValu', 'Dunnes', 'Lidl', 'Aldi']
+
+
+def synthetic_catalogue(rows, seed=3):
+    rng = random.Random(seed)
+    sizes = (
+        [f'{n}g' for n in range(50, 1000, 25)] + [f'{n}ml' for n in range(100, 1000, 50)] +
+        [f'{n / 2:g}kg' for n in range(1, 11)] + [f'{n / 2:g}L' for n in range(1, 7)] +
+        [f'{n} pack' for n in range(2, 81, 2)] + [f'{n} x {m}ml' for n in (4, 6, 8, 12) for m in (250, 330, 500)] +
+        ['each', '', 'per kg', 'bunch', 'Dozen', '6 Eggs', '9 rolls']
+    )
+    prices, size_list, names = [], [], []
+    for i in range(rows):
+        size = rng.choice(sizes)
+        name = f'Product {i}'
+        if size in ('each', '') and i % 2:
+            name += f' {rng.choice(sizes[:60])}'
+        prices.append(round(rng.uniform(0.3, 25), 2))
+        size_list.append(size)
+        names.append(name)
+    return prices, size_list, names
+
+
+def timed(label, rows, func):
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<38} {rows:>9} rows  {elapsed:8.2f}s  {rows / elapsed:>12,.0f} rows/s")
+    return result
+
+
+def per_row(prices, sizes, names):
+    return [units.normalize(price, size, name) for price, size, name in zip(prices, sizes, names)]
+
+
+def per_row_uncached(prices, sizes, names):
+    parse = units.parse_unit.__wrapped__
+    values = []
+    for price, size, name in zip(prices, sizes, names):
+        quantity, base_unit = parse(size)
+        if base_unit is None or (base_unit == 'each' and quantity == 1.0):
+            name_quantity, name_unit = parse(name)
+            if name_unit in ('kg', 'l'):
+                quantity, base_unit = name_quantity, name_unit
+        values.append((quantity, base_unit, units.unit_price(price, quantity)))
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--db-rows', type=int, default=200000)
+    args = parser.parse_args()
+
+    if units.np is None:
+        print('numpy is not installed; unit_prices falls back to the per-row path')
+
+    prices, sizes, names = synthetic_catalogue(args.rows)
+    print(f"{len(set(sizes))} distinct sizes over {args.rows} rows")
+    timed('per-row parse, uncached', args.rows, lambda: per_row_uncached(prices, sizes, names))
+    units.parse_unit.cache_clear()
+    expected = timed('per-row normalize (lru_cache)', args.rows, lambda: per_row(prices, sizes, names))
+    units.parse_unit.cache_clear()
+    quantities, base_units, per_unit = timed('unit_prices (np.unique batch)', args.rows,
+                                             lambda: units.unit_prices(prices, sizes, names))
+    mismatches = sum(
+        1 for value, quantity, base_unit, price in zip(expected, quantities, base_units, per_unit)
+        if (value['quantity'], value['base_unit'], value['price_per_unit']) != (quantity, base_unit, price)
+    )
+    print(f"batched results differing from per-row: {mismatches}")
+
+    tmpdir = tempfile.mkdtemp()
+    os.environ.setdefault('DATABASE_URL', f'sqlite:///{os.path.join(tmpdir, "bench.db")}')
+    from app import create_app, db
+    from app.models import Product, Store
+
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        for name in STORES:
+            db.session.add(Store(name=name))
+        db.session.commit()
+        store_ids = [store.id for store in Store.query.all()]
+        db.session.execute(db.insert(Product), [{
+            'name': name, 'store_id': store_ids[i % len(store_ids)], 'price': price, 'unit': size,
+            'search_term': 'bench', 'is_active': True
+        } for i, (price, size, name) in enumerate(zip(prices[:args.db_rows], sizes[:args.db_rows],
+                                                     names[:args.db_rows]))])
+        db.session.commit()
+        timed('backfill_unit_prices (SQLite)', args.db_rows, units.backfill_unit_prices)
+        print(f"products with a unit price: "
+              f"{Product.query.filter(Product.price_per_unit.isnot(None)).count()} of {args.db_rows}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""Small asyncio HTTP load generator for comparing gunicorn worker modes.
+
+Against a running server:
+
+    python benchmarks/loadtest.py --url http://127.0.0.1:5000 --concurrency 50
+
+Or start gunicorn once per worker class on a throwaway SQLite database
+filled with mock scrape data, and compare them:
+
+    python benchmarks/loadtest.py --compare sync gthread gevent --workers 2
+
+Rate limiting is disabled for the spawned servers; the response cache can
+be switched off with --no-cache to load the database instead.
+"""
+from urllib.parse import urlsplit
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PATHS = ['/search?q=milk', '/search?q=bread', '/api/prices?product=eggs',
+         '/api/prices?product=cheese', '/api/trending', '/api/stores', '/api/stats', '/api/health']
+
+
+async def fetch(reader, writer, host, path):
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n'.encode())
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    length = 0
+    close = False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+        elif name.lower() == 'connection' and value.strip().lower() == 'close':
+            close = True
+    await reader.readexactly(length)
+    return int(status_line.split()[1]), close
+
+
+async def client(url, deadline, latencies, errors, seed):
+    parts = urlsplit(url)
+    rng = random.Random(seed)
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+            started = time.perf_counter()
+            status, close = await fetch(reader, writer, parts.netloc, rng.choice(PATHS))
+            latencies.append((time.perf_counter() - started) * 1000)
+            if status >= 400:
+                errors.append(status)
+            if close:
+                writer.close()
+                writer = None
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.01)
+    if writer is not None:
+        writer.close()
+
+
+async def run_load(url, concurrency, duration):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*[client(url, deadline, latencies, errors, i) for i in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else 0.0
+
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50': statistics.median(latencies) if latencies else 0.0,
+        'p95': percentile(0.95),
+        'p99': percentile(0.99),
+        'errors': len(errors)
+    }
+
+
+def prepare_database(path):
+    os.environ['DATABASE_URL'] = f'sqlite:///{path}'
+    from main import init_db
+    from scheduler import PriceUpdateScheduler
+    init_db()
+    PriceUpdateScheduler().update_prices()
+
+
+def start_server(worker_class, port, args, database):
+    env = dict(os.environ,
+               GUNICORN_WORKER_CLASS=worker_class, PORT=str(port), WORKERS=str(args.workers),
+               GUNICORN_THREADS=str(args.threads), DATABASE_URL=f'sqlite:///{database}',
+               RATELIMIT_ENABLED='false', CACHE_ENABLED='false' if args.no_cache else 'true',
+               FLASK_ENV='development')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--access-logfile', '/dev/null', '--max-requests', '0',
+         '--pid', os.path.join(tempfile.gettempdir(), f'loadtest-{port}.pid'), 'main:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{port}'
+    for _ in range(100):
+        try:
+            result = asyncio.run(run_load(url + '/', 1, 0.05))
+            if result['requests']:
+                return process, url
+        except OSError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f'gunicorn ({worker_class}) did not start')
+
+
+def print_result(label, result):
+    print(f"{label:<10} {result['requests']:>8} {result['rps']:>9.1f} {result['p50']:>8.2f} "
+          f"{result['p95']:>8.2f} {result['p99']:>8.2f} {result['errors']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='load an already running server')
+    parser.add_argument('--compare', nargs='+', metavar='WORKER_CLASS',
+                        help='start gunicorn with each worker class and load it')
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--port', type=int, default=8899)
+    parser.add_argument('--no-cache', action='store_true')
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'requests':>8} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    if args.url:
+        print_result('server', asyncio.run(run_load(args.url, args.concurrency, args.duration)))
+        return
+
+    database = os.path.join(tempfile.mkdtemp(), 'loadtest.db')
+    prepare_database(database)
+    for worker_class in args.compare or ['sync', 'gthread']:
+        process, url = start_server(worker_class, args.port, args, database)
+        try:
+            print_result(worker_class, asyncio.run(run_load(url, args.concurrency, args.duration)))
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,17 +2,30 @@
 
 import multiprocessing
 import os
+from dotenv import load_dotenv
+
+load_dotenv()
 
 # Server socket
 bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
-worker_connections = 1000
+# GUNICORN_WORKER_CLASS selects the worker profile:
+#   sync    - one request per process (default)
+#   gthread - GUNICORN_THREADS requests per process on a thread pool
+#   gevent  - up to GUNICORN_WORKER_CONNECTIONS requests per process on greenlets
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+workers = int(os.getenv('WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('GUNICORN_THREADS', 4)) if worker_class == 'gthread' else 1
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
 timeout = 30
-keepalive = 2
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5 if worker_class != 'sync' else 2))
+
+# Workers size their SQLAlchemy pools from these so that DB_MAX_CONNECTIONS
+# bounds the connections held by all workers together (see app.engine_options)
+os.environ['GUNICORN_WORKERS'] = str(workers)
+os.environ.setdefault('DB_POOL_SIZE', str(threads if worker_class == 'gthread' else 5))
 
 # Restart workers after this many requests, to help prevent memory leaks
 max_requests = 1000
@@ -34,6 +47,34 @@ user = None
 group = None
 tmp_upload_dir = None
 
+# Prometheus metrics: with PROMETHEUS_MULTIPROC_DIR set, workers write their
+# samples there and /metrics adds them up (see app.metrics)
+def on_starting(server):
+    directory = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        # Samples left by a previous run would be counted again
+        for name in os.listdir(directory):
+            if name.endswith('.db'):
+                os.remove(os.path.join(directory, name))
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        try:
+            from prometheus_client import multiprocess
+            multiprocess.mark_process_dead(worker.pid)
+        except ImportError:
+            pass
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        # Let psycopg2 yield to other greenlets while waiting on PostgreSQL
+        try:
+            from psycogreen.gevent import patch_psycopg
+            patch_psycopg()
+        except ImportError:
+            server.log.warning("psycogreen not installed; PostgreSQL queries will block gevent workers")
+
 # SSL (uncomment for HTTPS)
 # keyfile = "/path/to/keyfile"
 # certfile = "/path/to/certfile"
\ No newline at end of file
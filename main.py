@@ -1,5 +1,11 @@
 from app import create_app, db
+from app.search import ensure_search_index
+from app.timeseries import ensure_partitions
+from app.units import backfill_unit_prices
+from app.matching import match_unassigned
+from app.ingestion import merge_duplicate_products
 from scheduler import start_scheduler
+from sqlalchemy import inspect, text
 import logging
 import os
 
@@ -11,13 +17,55 @@ logging.basicConfig(
 
 app = create_app()
 
+def _needs_widening(current, wanted):
+    """Whether a string column in the database is shorter than the model now declares.
+
+    Only PostgreSQL enforces VARCHAR lengths; SQLite ignores them.
+    """
+    if db.engine.dialect.name != 'postgresql':
+        return False
+    current_length = getattr(current, 'length', None)
+    wanted_length = getattr(wanted, 'length', None)
+    return bool(current_length and wanted_length and current_length < wanted_length)
+
+def upgrade_schema():
+    """Add columns and indexes introduced after an existing database was created"""
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {column['name']: column['type'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(db.engine.dialect)
+                with db.engine.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+            elif _needs_widening(existing[column.name], column.type):
+                column_type = column.type.compile(db.engine.dialect)
+                with db.engine.begin() as conn:
+                    conn.execute(text(f'ALTER TABLE {table.name} ALTER COLUMN {column.name} TYPE {column_type}'))
+        
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.unique and index.name not in existing_indexes and table.name == 'products':
+                # Rows stored before the index existed may repeat its key
+                merge_duplicate_products()
+            try:
+                index.create(db.engine, checkfirst=True)
+            except Exception as e:
+                if index.unique:
+                    # Upserts conflict on this index, so ingestion cannot work without it
+                    raise RuntimeError(f"Could not create unique index {index.name} on {table.name}: {e}") from e
+                logging.getLogger(__name__).error(f"Could not create index {index.name}: {e}")
+
 def init_db():
     """Initialize database tables and stores"""
     with app.app_context():
         db.create_all()
+        upgrade_schema()
+        ensure_search_index()
+        ensure_partitions()
         
+        from app.models import Store, Product, PriceSummary
         # Initialize stores if they don't exist
-        from app.models import Store
         stores_data = [
             {'name': 'Tesco', 'website': 'https://www.tesco.ie'},
             {'name': 'SuperValu', 'website': 'https://shop.supervalu.ie'},
@@ -32,6 +80,19 @@ def init_db():
                 db.session.add(store)
         
         db.session.commit()
+        
+        # Build the aggregates for databases populated before they existed
+        if not PriceSummary.query.first():
+            PriceSummary.rebuild()
+            db.session.commit()
+        
+        # Parse pack sizes for products stored before unit prices existed
+        if Product.query.first() and not Product.query.filter(Product.base_unit.isnot(None)).first():
+            backfill_unit_prices(only_missing=True)
+        
+        # Group products stored before canonical matching existed
+        if Product.query.first() and not Product.query.filter(Product.canonical_id.isnot(None)).first():
+            match_unassigned()
 
 if __name__ == '__main__':
     # Initialize database
@@ -1,9 +1,19 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from app import create_app, db
-from app.models import Product, Store, PriceHistory
-from app.scraper import TescoScraper, SuperValuScraper, DunnesScraper, LidlScraper, AldiScraper
+from app.models import Store, SchedulerState, ScrapeCycle, ScrapeJob
+from app.leader import JobLease, LeaderElection, create_leader_lock
+from app.ingestion import save_scrape_results
+from app.demand import plan_refresh
+from app.timeseries import ensure_partitions, rollup_price_history
+from app.archive import archive_dead_products
+from app.scraper import ScrapeEngine, build_scrapers, parse_concurrency
+from app.metrics import start_metrics_server
+from functools import partial
+import atexit
 import logging
-from datetime import datetime
+import os
+import threading
+from datetime import datetime, timedelta
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -11,13 +21,7 @@ logger = logging.getLogger(__name__)
 class PriceUpdateScheduler:
     def __init__(self):
         self.app = create_app()
-        self.scrapers = {
-            'Tesco': TescoScraper(),
-            'SuperValu': SuperValuScraper(),
-            'Dunnes': DunnesScraper(),
-            'Lidl': LidlScraper(),
-            'Aldi': AldiScraper()
-        }
+        self.scrapers = build_scrapers()
         # Comprehensive grocery categories for complete data collection
         self.comprehensive_categories = [
             'milk', 'bread', 'eggs', 'butter', 'cheese', 'yogurt',
@@ -28,109 +32,326 @@ class PriceUpdateScheduler:
             'coffee', 'tea', 'juice', 'water', 'wine', 'beer',
             'soap', 'shampoo', 'toothpaste', 'detergent', 'tissues'
         ]
-        # Scraping every 2 days (48 hours) for legal compliance
+        # Scraping every 2 days (48 hours) for legal compliance. With the
+        # 'demand' planner cycles run more often but each store only gets
+        # its share of that request budget per cycle, spent on the pairs
+        # that search traffic and data age say are most overdue.
+        self.planner = os.getenv('SCRAPE_PLANNER', 'demand')
+        interval_hours = float(os.getenv('SCRAPE_INTERVAL_HOURS', 6 if self.planner == 'demand' else 48))
+        self.scrape_interval = timedelta(hours=interval_hours)
+        self.budget_per_store = int(
+            os.getenv('SCRAPE_BUDGET_PER_STORE') or
+            max(1, round(len(self.comprehensive_categories) * interval_hours / 48))
+        )
+        
+        # Stores are scraped in parallel; each store's worker count is set by
+        # SCRAPER_CONCURRENCY, e.g. "1" or "Tesco=2,Aldi=1"
+        self.engine = ScrapeEngine(
+            self.scrapers,
+            concurrency=parse_concurrency(os.getenv('SCRAPER_CONCURRENCY'))
+        )
+        # 'local' scrapes in this process; 'celery' hands every (store, term)
+        # pair to the Celery workers in app.tasks
+        self.queue = os.getenv('SCRAPE_QUEUE', 'local')
+        # Celery jobs a worker started but never finished are queued again
+        # after this long; jobs still waiting in the broker only after the
+        # much longer queue timeout
+        self.job_stale_after = timedelta(minutes=float(os.getenv('SCRAPE_JOB_STALE_MINUTES', 60)))
+        self.job_queue_timeout = timedelta(hours=float(os.getenv('SCRAPE_JOB_QUEUE_TIMEOUT_HOURS', 24)))
+        
+        # Only the replica holding the leader lock runs jobs
+        with self.app.app_context():
+            self.election = LeaderElection(create_leader_lock(self.app, db.engine))
+    
+    def run_job(self, job_id, func, interval, timeout):
+        """Run a job if this replica is the leader and the job is due.
+        
+        The job's state is recorded in SchedulerState, so a restarted or
+        newly elected leader skips cycles whose data is still fresh. `func`
+        gets the run's JobLease and stops once it is no longer active; a
+        heartbeat thread keeps the lease confirmed while it runs.
+        """
+        if not self.election.is_leader:
+            logger.debug(f"Skipping {job_id}: not the scheduler leader")
+            return False
+        
+        with self.app.app_context():
+            state = SchedulerState.get(job_id)
+            due, reason = state.due(interval, timeout, self.election.identity)
+            if not due:
+                db.session.commit()
+                logger.info(f"Skipping {job_id}: {reason}")
+                return False
+            state.start(self.election.identity)
+            db.session.commit()
+            lease = JobLease(self.election, job_id, state.fence)
+        
+        finished = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(lease, finished),
+                                     name=f'heartbeat-{job_id}', daemon=True)
+        heartbeat.start()
+        error = None
+        try:
+            func(lease)
+        except Exception as e:
+            error = e
+            logger.error(f"{job_id} failed: {e}")
+        finally:
+            finished.set()
+            heartbeat.join()
+        
+        with self.app.app_context():
+            if not lease.confirm():
+                # Another leader owns the job now; its state is not ours to close
+                db.session.rollback()
+                return False
+            SchedulerState.get(job_id).finish(error)
+            db.session.commit()
+        return error is None
+    
+    def _heartbeat(self, lease, finished):
+        """Confirm a running job's lease until it finishes or is lost"""
+        while not finished.wait(self.election.interval):
+            with self.app.app_context():
+                try:
+                    lease.confirm()
+                    db.session.commit()
+                except Exception as e:
+                    logger.error(f"Heartbeat for {lease.job_id} failed: {e}")
+                    db.session.rollback()
+            if lease.lost.is_set():
+                return
     
-    def update_prices(self):
-        """Update prices for all popular items across all stores"""
+    def update_prices(self, lease=None):
+        """Update prices for all popular items across all stores.
+        
+        Progress is kept in a ScrapeCycle ledger, so after an interruption
+        the next run picks up the unfinished cycle instead of starting over.
+        With a lease, the cycle stops as soon as this replica stops leading.
+        """
         with self.app.app_context():
             logger.info("Starting price update job")
             
-            for category in self.comprehensive_categories:
-                self._update_item_prices(category)
+            cycle, resumed = ScrapeCycle.resume_or_start(self.plan_cycle, self.election.identity)
+            
+            if self.queue == 'celery':
+                # Queued jobs may still be sitting in the broker; only
+                # failed and long-silent ones are sent again
+                cycle.requeue(statuses=('failed',), stale_after=self.job_stale_after,
+                                      queued_after=self.job_queue_timeout)
+                self._enqueue(cycle)
+                logger.info(f"Price update jobs for cycle {cycle.id} queued")
+                return
+            
+            if resumed:
+                # The process that owned these jobs is gone
+                reset = cycle.requeue(statuses=('queued', 'running', 'failed'))
+                logger.info(f"Resuming cycle {cycle.id}: {reset} unfinished jobs reset, "
+                            f"{len(cycle.pending_pairs())} of {cycle.total_jobs} to run")
+            
+            self._scrape(cycle=cycle, lease=lease)
+            if lease is None or lease.confirm():
+                cycle.finish_if_complete()
+            else:
+                db.session.rollback()
             
             logger.info("Price update job completed")
     
+    def plan_cycle(self):
+        """(store, term) pairs for a new cycle"""
+        store_names = list(self.scrapers)
+        if self.planner == 'demand':
+            return plan_refresh(store_names, self.comprehensive_categories, self.budget_per_store)
+        return [(store_name, term) for term in self.comprehensive_categories for store_name in store_names]
+    
+    def requeue_stale_jobs(self):
+        """Send a running Celery cycle's failed or long-silent jobs back to the queue"""
+        if self.queue != 'celery' or not self.election.is_leader:
+            return 0
+        with self.app.app_context():
+            cycle = ScrapeCycle.query.filter_by(status='running').order_by(ScrapeCycle.id.desc()).first()
+            if cycle is None:
+                return 0
+            reset = cycle.requeue(statuses=('failed',), stale_after=self.job_stale_after,
+                                      queued_after=self.job_queue_timeout)
+            if reset:
+                logger.info(f"Re-queueing {reset} stale jobs in cycle {cycle.id}")
+                self._enqueue(cycle)
+            return reset
+    
+    def _enqueue(self, cycle):
+        from app.tasks import enqueue_pairs
+        pairs = cycle.pending_pairs()
+        # Marked first: eager-mode tasks finish before enqueue_pairs returns.
+        # Pairs that fail to queue are marked failed, so the next requeue
+        # check sends them again.
+        cycle.mark_queued(pairs)
+        queued = set(enqueue_pairs(pairs, cycle.id))
+        for store_name, term in pairs:
+            if (store_name, term) not in queued:
+                ScrapeJob.find(cycle.id, store_name, term).finish(error='Could not queue the scrape task')
+        db.session.commit()
+    
     def _update_item_prices(self, item):
         """Update prices for a specific item across all stores"""
         logger.info(f"Updating prices for: {item}")
         
         with self.app.app_context():
-            for store_name, scraper in self.scrapers.items():
-                try:
-                    # Get store from database
-                    store = Store.query.filter_by(name=store_name).first()
-                    if not store:
-                        store = Store(name=store_name, is_active=True, scraper_enabled=True)
-                        db.session.add(store)
-                        db.session.commit()
-                    
-                    # Scrape products
-                    products_data = scraper.search_products(item)
-                    
-                    for product_data in products_data:
-                        self._save_product(product_data, store.id, item)
-                    
-                    # Update last scraped time
-                    store.last_scraped = datetime.utcnow()
-                    db.session.commit()
-                    
-                    logger.info(f"Updated {len(products_data)} products for {store_name}")
-                    
-                except Exception as e:
-                    logger.error(f"Error updating {store_name} for {item}: {e}")
+            self._scrape([item])
     
-    def _save_product(self, product_data, store_id, search_term):
-        """Save or update product in database"""
-        try:
-            # Check if product exists
-            existing = Product.query.filter_by(
-                name=product_data['product'],
-                store_id=store_id
-            ).first()
-            
-            if existing:
-                # Update existing product
-                old_price = existing.price
-                existing.price = product_data['price']
-                existing.last_updated = datetime.utcnow()
-                existing.is_active = True
-                
-                # Record price history if price changed
-                if old_price != product_data['price']:
-                    PriceHistory.record_price(existing.id, product_data['price'])
-            else:
-                # Create new product
-                product = Product(
-                    name=product_data['product'],
-                    store_id=store_id,
-                    price=product_data['price'],
-                    unit=product_data['unit'],
-                    image_url=product_data['image'],
-                    store_url=product_data['url'],
-                    search_term=search_term.lower(),
-                    is_active=True
-                )
-                db.session.add(product)
-                db.session.flush()  # Get the ID
+    def _scrape(self, items=None, cycle=None, lease=None):
+        """Scrape items (or a cycle's pending jobs) on every store concurrently and save results as they arrive.
+        
+        Under a lease, no result is saved once the lease is inactive, and
+        ledger writes are fenced so they are dropped after a takeover.
+        """
+        stores = self._get_stores()
+        if cycle is not None:
+            pairs = cycle.pending_pairs()
+            cycle.mark_queued(pairs)
+        else:
+            pairs = [(store_name, item) for item in items for store_name in self.scrapers]
+        
+        def record(store_name, item, item_count=None, error=None, seconds=None):
+            if cycle is None:
+                return
+            try:
+                if lease is not None and not lease.confirm():
+                    db.session.rollback()
+                    return
+                job = ScrapeJob.find(cycle.id, store_name, item)
+                job.finish(item_count, error, seconds)
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"Error recording job {store_name}/{item} in cycle {cycle.id}: {e}")
+                db.session.rollback()
+        
+        def mark_started(store_name, item):
+            try:
+                if lease is not None and not lease.confirm():
+                    db.session.rollback()
+                    return
+                ScrapeJob.mark_started(cycle.id, store_name, item)
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"Error starting job {store_name}/{item} in cycle {cycle.id}: {e}")
+                db.session.rollback()
+        
+        def save_results(store_name, item, products_data, seconds):
+            if lease is not None and not lease.active():
+                return
+            try:
+                stats = save_scrape_results(stores[store_name], item, products_data)
+                logger.info(f"Updated {len(products_data)} products for {store_name}")
+                error = f"{stats['failed']} products failed to save" if stats['failed'] else None
+                record(store_name, item, len(products_data), error, seconds)
                 
-                # Record initial price
-                PriceHistory.record_price(product.id, product_data['price'])
-            
-            db.session.commit()
-            
-        except Exception as e:
-            logger.error(f"Error saving product {product_data['product']}: {e}")
-            db.session.rollback()
+            except Exception as e:
+                logger.error(f"Error updating {store_name} for {item}: {e}")
+                db.session.rollback()
+                record(store_name, item, len(products_data), e, seconds)
+        
+        def log_error(store_name, item, error, seconds):
+            logger.error(f"Error updating {store_name} for {item}: {error}")
+            record(store_name, item, None, error, seconds)
+        
+        stats = self.engine.run_pairs(pairs, save_results, on_error=log_error,
+                                      should_continue=lease.active if lease is not None else None,
+                                      on_start=mark_started if cycle is not None else None)
+        for store_name, store_stats in stats.items():
+            rate = f"{store_stats['rate']:.3f} req/s" if store_stats['rate'] else 'n/a'
+            logger.info(f"{store_name}: {store_stats['jobs']} jobs, {store_stats['products']} products, "
+                        f"{store_stats['errors']} errors in {store_stats['seconds']:.1f}s, rate {rate}")
+        return stats
+    
+    def rollup_history(self, lease=None):
+        """Roll aged-out price history up into daily/weekly buckets"""
+        if lease is not None and not lease.active():
+            return
+        with self.app.app_context():
+            try:
+                ensure_partitions()
+                rollup_price_history()
+            except Exception as e:
+                logger.error(f"Price history rollup failed: {e}")
+                db.session.rollback()
+    
+    def archive_products(self, lease=None):
+        """Move long-inactive products and their history to the archive tables"""
+        if lease is not None and not lease.active():
+            return
+        with self.app.app_context():
+            try:
+                archive_dead_products()
+            except Exception as e:
+                logger.error(f"Product archival failed: {e}")
+                db.session.rollback()
+    
+    def _get_stores(self):
+        """Get or create the Store row for every configured scraper"""
+        stores = {store.name: store for store in Store.query.filter(Store.name.in_(self.scrapers)).all()}
+        for store_name in self.scrapers:
+            if store_name not in stores:
+                store = Store(name=store_name, is_active=True, scraper_enabled=True)
+                db.session.add(store)
+                stores[store_name] = store
+        db.session.commit()
+        return stores
 
 def start_scheduler():
     """Start the background scheduler"""
     scheduler = BackgroundScheduler()
     price_updater = PriceUpdateScheduler()
+    price_updater.election.start()
+    atexit.register(price_updater.election.stop)
     
-    # Schedule price updates every 2 days (48 hours)
+    # Every replica checks often, but only the leader runs a cycle, and only
+    # once the last one is older than the scrape interval
+    cycle_timeout = timedelta(hours=float(os.getenv('SCRAPE_CYCLE_TIMEOUT_HOURS', 12)))
+    check_minutes = int(os.getenv('SCHEDULER_CHECK_MINUTES', 15))
+    
+    # Check for a due price update now and then every few minutes
     scheduler.add_job(
-        func=price_updater.update_prices,
+        func=partial(price_updater.run_job, 'price_update', price_updater.update_prices,
+                     price_updater.scrape_interval, cycle_timeout),
         trigger="interval",
-        hours=48,
+        minutes=check_minutes,
+        next_run_time=datetime.now(),
+        max_instances=1,
+        coalesce=True,
         id='price_update_job'
     )
     
-    # Run initial update
+    # Re-queue Celery jobs that failed or went missing in the current cycle
+    scheduler.add_job(
+        func=price_updater.requeue_stale_jobs,
+        trigger="interval",
+        minutes=check_minutes,
+        max_instances=1,
+        coalesce=True,
+        id='scrape_requeue_job'
+    )
+    
+    # Downsample aged-out price history once a day
     scheduler.add_job(
-        func=price_updater.update_prices,
-        trigger="date",
-        run_date=datetime.now(),
-        id='initial_price_update'
+        func=partial(price_updater.run_job, 'price_history_rollup', price_updater.rollup_history,
+                     timedelta(hours=24), cycle_timeout),
+        trigger="interval",
+        minutes=check_minutes,
+        max_instances=1,
+        coalesce=True,
+        id='price_history_rollup_job'
+    )
+    
+    # Archive products that vanished upstream long ago once a day
+    scheduler.add_job(
+        func=partial(price_updater.run_job, 'product_archive', price_updater.archive_products,
+                     timedelta(hours=24), cycle_timeout),
+        trigger="interval",
+        minutes=check_minutes,
+        max_instances=1,
+        coalesce=True,
+        id='product_archive_job'
     )
     
     scheduler.start()
@@ -138,6 +359,7 @@ def start_scheduler():
     return scheduler
 
 if __name__ == '__main__':
+    start_metrics_server()
     scheduler = start_scheduler()
     try:
         # Keep the script running
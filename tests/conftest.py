@@ -0,0 +1,75 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+STORES = ['Tesco', 'SuperValu', 'Dunnes', 'Lidl', 'Aldi']
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    """The app on a throwaway SQLite database, with caching, rate limits and demand tracking off"""
+    database = tmp_path_factory.mktemp('db') / 'test.db'
+    os.environ.update({
+        'DATABASE_URL': f'sqlite:///{database}',
+        'RATELIMIT_ENABLED': 'false',
+        'CACHE_ENABLED': 'false',
+        'DEMAND_TRACKING_ENABLED': 'false',
+    })
+    from app import create_app, db
+    from app.models import Store
+    from app.search import ensure_search_index
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        ensure_search_index()
+        db.session.add_all(Store(name=name, website=f'https://{name.lower()}.example') for name in STORES)
+        db.session.commit()
+    return app
+
+
+@pytest.fixture(scope='session')
+def add_products(app):
+    """Add `count` active products spread across every store"""
+    from app import db
+    from app.models import Product, Store
+
+    def add(count, name, **columns):
+        with app.app_context():
+            store_ids = [store.id for store in Store.query.order_by(Store.id)]
+            now = datetime.utcnow()
+            db.session.add_all(Product(
+                name=f'{name} {index}', store_id=store_ids[index % len(store_ids)], price=1.0 + index,
+                unit='1L', search_term=name.lower(), is_active=True,
+                last_updated=now - timedelta(minutes=index), **columns
+            ) for index in range(count))
+            db.session.commit()
+    return add
+
+
+@pytest.fixture
+def count_queries(app):
+    """count_queries(fn) -> (fn's result, SQL statements it ran)"""
+    from app import db
+
+    def count(fn):
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            result = fn()
+        finally:
+            event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+        return result, len(statements)
+    return count
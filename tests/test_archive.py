@@ -0,0 +1,103 @@
+"""Mark and sweep: vanished products are deactivated after a grace period, then archived."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.archive import ARCHIVE_AFTER_DAYS, archive_dead_products
+from app.ingestion import SWEEP_GRACE_MS, ingest_products
+from app.models import (ArchivedPriceHistory, ArchivedProduct, CanonicalProduct, PriceHistory, PriceHistoryRollup,
+                        Product, Store)
+
+TERM = 'sweeptest'
+
+
+@pytest.fixture
+def store_id(app):
+    with app.app_context():
+        yield Store.query.filter_by(name='Lidl').first().id
+        db.session.rollback()
+        ids = [product.id for product in Product.query.filter_by(search_term=TERM)]
+        archived = [product.id for product in ArchivedProduct.query.filter_by(search_term=TERM)]
+        PriceHistory.query.filter(PriceHistory.product_id.in_(ids)).delete()
+        PriceHistoryRollup.query.filter(PriceHistoryRollup.product_id.in_(ids)).delete()
+        ArchivedPriceHistory.query.filter(ArchivedPriceHistory.product_id.in_(archived)).delete()
+        ArchivedProduct.query.filter_by(search_term=TERM).delete()
+        Product.query.filter_by(search_term=TERM).delete()
+        CanonicalProduct.query.filter_by(search_term=TERM).delete()
+        db.session.commit()
+
+
+def ingest(store_id, *names):
+    return ingest_products(store_id, TERM, [{'store': 'Lidl', 'product': name, 'price': 1.0} for name in names])
+
+
+def product(name, store_name='Lidl'):
+    return Product.query.populate_existing().join(Store).filter(
+        Product.search_term == TERM, Product.name == name, Store.name == store_name
+    ).one()
+
+
+def last_seen(name, hours_ago):
+    row = product(name)
+    row.seen_generation -= int(hours_ago * 3600 * 1000)
+    db.session.commit()
+
+
+def test_products_missing_past_the_grace_period_are_deactivated(store_id):
+    ingest(store_id, 'Sweep Gone', 'Sweep Recent', 'Sweep Kept')
+    last_seen('Sweep Gone', SWEEP_GRACE_MS / 3600000 + 1)
+    last_seen('Sweep Recent', 1)
+
+    stats = ingest(store_id, 'Sweep Kept')
+
+    assert stats['deactivated'] == 1
+    assert [product(name).is_active for name in ('Sweep Gone', 'Sweep Recent', 'Sweep Kept')] == [False, True, True]
+
+
+def test_an_empty_result_set_deactivates_nothing(store_id):
+    ingest(store_id, 'Sweep Gone')
+    last_seen('Sweep Gone', SWEEP_GRACE_MS / 3600000 + 1)
+
+    assert ingest(store_id)['deactivated'] == 0
+    assert product('Sweep Gone').is_active
+
+
+def test_a_returning_product_is_reactivated_with_its_id(store_id):
+    ingest(store_id, 'Sweep Back', 'Sweep Kept')
+    original = product('Sweep Back').id
+    last_seen('Sweep Back', SWEEP_GRACE_MS / 3600000 + 1)
+    ingest(store_id, 'Sweep Kept')
+
+    ingest(store_id, 'Sweep Back')
+
+    assert (product('Sweep Back').id, product('Sweep Back').is_active) == (original, True)
+
+
+def test_archiving_moves_dead_products_and_their_history(store_id):
+    ingest(store_id, 'Sweep Dead Milk 1L', 'Sweep Young Milk 1L')
+    for other in Store.query.filter(Store.name.in_(['Tesco', 'Aldi'])):
+        ingest_products(other.id, TERM, [{'store': other.name, 'product': 'Sweep Dead Milk 1L', 'price': 1.1}])
+    dead, young = product('Sweep Dead Milk 1L'), product('Sweep Young Milk 1L')
+    canonical_id = dead.canonical_id
+    assert db.session.get(CanonicalProduct, canonical_id).product_count == 3
+
+    now = datetime.utcnow()
+    long_ago = now - timedelta(days=ARCHIVE_AFTER_DAYS + 1)
+    dead.is_active, dead.last_updated = False, long_ago
+    young.is_active, young.last_updated = False, now - timedelta(days=1)
+    db.session.add(PriceHistoryRollup(product_id=dead.id, resolution='day', bucket_start=long_ago, min_price=0.9,
+                                      max_price=1.0, close_price=1.0, samples=2))
+    db.session.commit()
+    dead_id = dead.id
+
+    assert archive_dead_products(now) == 1
+
+    db.session.expire_all()
+    assert db.session.get(Product, dead_id) is None
+    assert db.session.get(Product, young.id) is not None
+    assert db.session.get(ArchivedProduct, dead_id).name == 'Sweep Dead Milk 1L'
+    history = ArchivedPriceHistory.query.filter_by(product_id=dead_id).order_by(ArchivedPriceHistory.resolution)
+    assert [(row.resolution, row.price) for row in history] == [('day', 1.0), ('raw', 1.0)]
+    assert PriceHistory.query.filter_by(product_id=dead_id).count() == 0
+    assert db.session.get(CanonicalProduct, canonical_id).product_count == 2
@@ -0,0 +1,78 @@
+"""Basket optimiser: unit-price costing of terms, the cheapest split and request validation."""
+import numpy as np
+import pytest
+
+from app import basket, db
+from app.models import Product, Store
+from app.units import normalize
+
+PRODUCTS = [
+    # store, term, name, price, size
+    ('Tesco', 'basketmilk', 'Basket Milk 2L', 2.00, '2L'),
+    ('Tesco', 'basketmilk', 'Basket Milk 1L', 1.20, '1L'),
+    ('Aldi', 'basketmilk', 'Basket Milk 1L', 0.90, '1L'),
+    ('Tesco', 'basketbread', 'Basket Bread', 1.50, ''),
+]
+
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        stores = {store.name: store.id for store in Store.query}
+        db.session.add_all(Product(name=name, store_id=stores[store], price=price, unit=size, search_term=term,
+                                   is_active=True, **normalize(price, size))
+                           for store, term, name, price, size in PRODUCTS)
+        db.session.commit()
+    yield app.test_client()
+    with app.app_context():
+        Product.query.filter(Product.search_term.in_({term for _, term, *_ in PRODUCTS})).delete()
+        db.session.commit()
+
+
+def test_split_buys_each_item_where_its_unit_price_is_lowest(client):
+    body = client.post('/api/basket', json={
+        'items': [{'term': 'basketmilk', 'quantity': 2}, 'basketbread'], 'max_stores': 2
+    }).get_json()
+
+    # Milk is costed at its commonest pack, 1L, from the cheapest litre
+    assert body['single_store']['store'] == 'Tesco'
+    assert body['single_store']['total'] == 3.5 and body['single_store']['missing'] == []
+    split = body['split']
+    assert split['stores'] == ['Aldi', 'Tesco'] and split['total'] == 3.3
+    assert split['savings'] == 0.2
+    milk, bread = split['assignments']
+    assert (milk['store'], milk['base_unit'], milk['pack_quantity'], milk['line_total']) == ('Aldi', 'l', 1.0, 1.8)
+    assert (bread['store'], bread['line_total']) == ('Tesco', 1.5)
+
+
+def test_a_single_store_split_matches_the_best_store(client):
+    body = client.post('/api/basket', json={'items': ['basketmilk', 'basketbread'], 'max_stores': 1}).get_json()
+
+    assert body['split']['stores'] == ['Tesco']
+    assert body['split']['total'] == body['single_store']['total']
+
+
+@pytest.mark.parametrize('payload', [
+    {'items': []},
+    {'items': ['milk'], 'max_stores': 9},
+    {'items': [{'term': 'milk', 'quantity': 0}]},
+    {'items': [{'canonical_id': 'abc'}]},
+    ['milk'],
+])
+def test_invalid_baskets_are_rejected(client, payload):
+    assert client.post('/api/basket', json=payload).status_code == 400
+
+
+def test_vectorised_and_pure_python_splits_agree(monkeypatch):
+    inf = np.inf
+    costs = np.array([[1.0, 2.0, inf], [3.0, 1.0, 2.5], [inf, inf, 4.0], [2.0, 2.0, 1.0]])
+    quantities = np.array([2.0, 1.0, 1.0, 3.0])
+
+    vectorised = basket.best_split(costs, quantities, 2)
+    monkeypatch.setattr(basket, 'np', None)
+    rows = [[None if value == inf else value for value in row] for row in costs.tolist()]
+    pure = basket.best_split(rows, quantities.tolist(), 2)
+
+    assert vectorised[0] == pure[0] == (0, 2)
+    assert vectorised[1] == list(pure[1])
+    assert vectorised[2:] == pytest.approx(pure[2:])
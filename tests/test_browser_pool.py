@@ -0,0 +1,113 @@
+"""BrowserPool against the benchmark's client-rendered stub store; skipped without Chromium."""
+import asyncio
+import concurrent.futures
+import time
+
+import pytest
+
+pytest.importorskip('playwright.async_api')
+
+from app.scraper.browser import BLOCKED_HOSTS, BrowserPool
+from app.scraper.parsing import parse_listing
+from benchmarks.bench_browser_pool import PRODUCTS_PER_PAGE, SPEC, start_store_server
+
+TRACKER_DELAY = 0.3
+
+
+@pytest.fixture(scope='module')
+def chromium():
+    from playwright.sync_api import sync_playwright
+    try:
+        with sync_playwright() as playwright:
+            playwright.chromium.launch().close()
+    except Exception as e:
+        pytest.skip(f'Chromium is not available: {e}')
+
+
+@pytest.fixture(scope='module')
+def store(chromium):
+    server = start_store_server(TRACKER_DELAY)
+    yield f'http://store.localhost:{server.server_port}'
+    server.shutdown()
+
+
+@pytest.fixture
+def make_pool(chromium):
+    pools = []
+
+    def make(**options):
+        options.setdefault('blocked_hosts', BLOCKED_HOSTS | {'tracker.localhost'})
+        pool = BrowserPool(**options)
+        pools.append(pool)
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.close()
+
+
+def render_all(pool, store_name, urls, threads):
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        return list(executor.map(lambda url: pool.render(store_name, url, SPEC.item), urls))
+
+
+def test_blocking_skips_media_and_trackers_but_keeps_products(make_pool, store):
+    blocking, plain = make_pool(block=True), make_pool(block=False)
+
+    for pool in (blocking, plain):
+        status, headers, html = pool.render('Store', f'{store}/search?q=milk', SPEC.item)
+        assert status == 200 and headers['content-type'] == 'text/html'
+        assert len(parse_listing(html.encode('utf-8'), SPEC, store)) == PRODUCTS_PER_PAGE
+
+    # Product images (some ids repeat), the web font and the tracker script
+    assert blocking.stats['blocked'] > PRODUCTS_PER_PAGE // 2
+    assert plain.stats['blocked'] == 0
+
+
+def test_each_store_is_held_to_its_page_limit(make_pool, store):
+    pool = make_pool(concurrency={'Capped': 2, '*': 4}, block=False)
+    urls = [f'{store}/search?q=term{index}' for index in range(6)]
+
+    started = time.perf_counter()
+    results = render_all(pool, 'Capped', urls, threads=6)
+    elapsed = time.perf_counter() - started
+
+    assert all(status == 200 for status, _, _ in results)
+    # Unblocked, every page waits TRACKER_DELAY for the tracker: three rounds of two
+    assert pool.stats['pages_opened'] == 2
+    assert elapsed >= 3 * TRACKER_DELAY
+
+    # The cap is per store: another store runs more pages at once
+    render_all(pool, 'Other', urls[:4], threads=4)
+    assert pool.stats['pages_opened'] - 2 > 2
+
+
+def test_pages_are_reused_then_recycled(make_pool, store):
+    pool = make_pool(recycle_after=2)
+
+    for index in range(5):
+        pool.render('Store', f'{store}/search?q=term{index}', SPEC.item)
+
+    assert pool.stats['navigations'] == 5
+    assert pool.stats['pages_opened'] == 3
+    assert pool.stats['pages_recycled'] == 2
+
+
+def test_cancelled_render_closes_its_page_and_frees_the_slot(make_pool, store):
+    hanging = start_store_server(tracker_delay=60)
+    try:
+        pool = make_pool(concurrency={'*': 1}, block=False)
+        url = f'http://hanging.localhost:{hanging.server_port}/search?q=milk'
+        # What render() does once its wait for the loop times out
+        future = asyncio.run_coroutine_threadsafe(pool._render('Store', url, SPEC.item, 120), pool._loop)
+        with pytest.raises(concurrent.futures.TimeoutError):
+            future.result(3)
+        future.cancel()
+
+        # The store's only slot is free again, and the abandoned page is not reused
+        status, _, _ = pool.render('Store', f'{store}/search?q=bread', SPEC.item, timeout=10)
+        assert status == 200
+        assert pool.stats['errors'] == 1
+        assert pool.stats['pages_opened'] == 2
+    finally:
+        hanging.shutdown()
@@ -0,0 +1,62 @@
+"""Conditional GET: ETags and Last-Modified follow the data, and matching requests get 304."""
+import pytest
+
+from app import db
+from app.ingestion import save_scrape_results
+from app.models import PriceHistory, Product, Store
+
+TERM = 'etagtest'
+URL = f'/api/prices?product={TERM}'
+
+
+def scrape(app, price):
+    with app.app_context():
+        store = Store.query.filter_by(name='SuperValu').first()
+        save_scrape_results(store, TERM, [{'store': 'SuperValu', 'product': 'Etagtest Jam', 'price': price}])
+
+
+@pytest.fixture
+def client(app):
+    scrape(app, 2.5)
+    yield app.test_client()
+    with app.app_context():
+        ids = [product.id for product in Product.query.filter_by(search_term=TERM)]
+        PriceHistory.query.filter(PriceHistory.product_id.in_(ids)).delete()
+        Product.query.filter_by(search_term=TERM).delete()
+        db.session.commit()
+
+
+def test_matching_etag_gets_an_empty_304(client):
+    first = client.get(URL)
+    etag = first.headers['ETag']
+
+    again = client.get(URL, headers={'If-None-Match': etag})
+
+    assert first.status_code == 200 and first.headers['Cache-Control'].startswith('public')
+    assert again.status_code == 304 and again.get_data() == b''
+    assert again.headers['ETag'] == etag
+
+
+def test_last_modified_answers_if_modified_since(client):
+    last_modified = client.get(URL).headers['Last-Modified']
+
+    assert client.get(URL, headers={'If-Modified-Since': last_modified}).status_code == 304
+    assert client.get(URL, headers={'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'}).status_code == 200
+
+
+def test_etag_changes_with_the_arguments_and_the_data(app, client):
+    etag = client.get(URL).headers['ETag']
+    assert client.get(f'{URL}&limit=5').headers['ETag'] != etag
+
+    scrape(app, 2.0)
+
+    response = client.get(URL, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['products'][0]['price'] == 2.0
+
+
+def test_errors_carry_no_validators(client):
+    response = client.get('/api/prices?product=')
+    assert response.status_code == 400
+    assert 'ETag' not in response.headers
@@ -0,0 +1,85 @@
+"""Search demand: decaying popularity, score period rebasing and refresh planning."""
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.demand import select_pairs
+from app.models import SearchDemand
+from app.models.search_demand import (DEMAND_EPOCH, DEMAND_HALF_LIFE_DAYS, DEMAND_PERIOD_HALF_LIVES,
+                                      demand_weight, score_period)
+
+HALF_LIFE = timedelta(days=DEMAND_HALF_LIFE_DAYS)
+PERIOD = HALF_LIFE * DEMAND_PERIOD_HALF_LIVES
+TERMS = ('demandtest hot', 'demandtest cold', 'demandtest searched')
+
+
+@pytest.fixture
+def session(app):
+    with app.app_context():
+        yield db.session
+        db.session.rollback()
+        SearchDemand.query.filter(SearchDemand.term.in_(TERMS)).delete()
+        db.session.commit()
+
+
+def searched(term, moments, period):
+    return SearchDemand(term=term, search_count=len(moments), score_period=period,
+                        score=sum(demand_weight(moment, period) for moment in moments))
+
+
+def test_popularity_halves_every_half_life():
+    moment = DEMAND_EPOCH + PERIOD * 3 + timedelta(days=2)
+    demand = searched('demandtest hot', [moment] * 4, score_period(moment))
+
+    assert demand.popularity(moment) == pytest.approx(4.0)
+    assert demand.popularity(moment + HALF_LIFE) == pytest.approx(2.0)
+    assert demand.popularity(moment + 3 * HALF_LIFE) == pytest.approx(0.5)
+
+
+def test_weights_stay_finite_centuries_after_the_epoch():
+    moment = datetime(2400, 1, 1)
+    assert math.isfinite(demand_weight(moment))
+    assert demand_weight(moment) <= 2.0 ** DEMAND_PERIOD_HALF_LIVES
+
+
+def test_rescaling_to_a_new_period_keeps_popularity_and_order(session):
+    start = DEMAND_EPOCH + PERIOD * 5
+    old_period = score_period(start)
+    hot = searched('demandtest hot', [start + timedelta(days=day) for day in range(10)], old_period)
+    cold = searched('demandtest cold', [start], old_period)
+    session.add_all([hot, cold])
+    session.commit()
+    later = start + PERIOD + timedelta(days=3)
+    before = {demand.term: demand.popularity(later) for demand in (hot, cold)}
+
+    SearchDemand.rescale_scores(score_period(later))
+    session.commit()
+    # New searches land on the new period's scale
+    fresh = searched('demandtest searched', [later] * 2, score_period(later))
+    session.add(fresh)
+    session.commit()
+
+    rows = {demand.term: demand for demand in SearchDemand.query.filter(SearchDemand.term.in_(TERMS))}
+    assert {row.score_period for row in rows.values()} == {score_period(later)}
+    for term, popularity in before.items():
+        assert rows[term].popularity(later) == pytest.approx(popularity)
+    ranked = [demand.term for demand in SearchDemand.top(limit=1000) if demand.term in TERMS]
+    assert ranked == sorted(TERMS, key=lambda term: -rows[term].popularity(later))
+
+
+def test_popular_terms_are_refreshed_first_and_recent_pairs_wait():
+    now = datetime(2026, 5, 1, 12)
+    terms = {'milk': 50.0, 'bread': 1.0, 'eggs': 0.0}
+    last_scraped = {('Tesco', 'milk'): now - timedelta(hours=24), ('Tesco', 'bread'): now - timedelta(hours=24),
+                    ('Tesco', 'eggs'): now - timedelta(hours=1)}
+
+    assert select_pairs(terms, last_scraped, ['Tesco'], budget=1, now=now) == [('Tesco', 'milk')]
+    assert select_pairs(terms, last_scraped, ['Tesco'], budget=5, now=now) == [
+        ('Tesco', 'milk'), ('Tesco', 'bread')
+    ]
+    # Never scraped goes first whatever its popularity
+    assert select_pairs(terms, {('Aldi', 'milk'): now - timedelta(hours=24)}, ['Aldi'], budget=2, now=now) == [
+        ('Aldi', 'bread'), ('Aldi', 'eggs')
+    ]
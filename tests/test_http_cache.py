@@ -0,0 +1,78 @@
+"""Scraper HTTP cache: conditional revalidation and recovery from lost bodies."""
+import os
+
+import pytest
+import requests
+
+from app.scraper.base_scraper import BaseScraper
+from app.scraper.http_cache import HttpCache
+from app.scraper.rate_limit import host_limiter
+
+URL = 'https://shop.test/search'
+
+
+class FakeScraper(BaseScraper):
+    def search_products(self, query):
+        return []
+
+
+def make_response(status, body=b'', headers=None):
+    response = requests.Response()
+    response.status_code = status
+    response._content = body
+    response.headers.update(headers or {})
+    response.url = URL
+    return response
+
+
+@pytest.fixture
+def scraper(tmp_path, monkeypatch):
+    host_limiter.configure('shop.test', 1000.0)
+    scraper = FakeScraper('Test')
+    scraper.http_cache = HttpCache(str(tmp_path), 'on')
+    scraper.sent = []
+    scraper.responses = []
+
+    def get(url, timeout=None, headers=None, **kwargs):
+        scraper.sent.append(dict(headers or {}))
+        return scraper.responses.pop(0)
+
+    monkeypatch.setattr(scraper.session, 'get', get)
+    return scraper
+
+
+def test_not_modified_serves_the_stored_body(scraper):
+    scraper.responses = [make_response(200, b'<html>v1</html>', {'ETag': '"v1"'}), make_response(304)]
+
+    first = scraper._make_request(URL)
+    second = scraper._make_request(URL)
+
+    assert not first.from_cache
+    assert scraper.sent[1]['If-None-Match'] == '"v1"'
+    assert second.from_cache and second.unchanged
+    assert second.content == b'<html>v1</html>'
+    assert scraper.http_cache.stats['revalidated'] == 1
+
+
+def test_not_modified_without_a_body_refetches_unconditionally(scraper):
+    scraper.responses = [make_response(200, b'<html>v1</html>', {'ETag': '"v1"'}),
+                         make_response(304),
+                         make_response(200, b'<html>v2</html>', {'ETag': '"v2"'})]
+    scraper._make_request(URL)
+    key = scraper.http_cache.key(URL)
+    os.remove(scraper.http_cache._path(key, '.z'))
+
+    response = scraper._make_request(URL)
+
+    assert response is not None and response.content == b'<html>v2</html>'
+    assert 'If-None-Match' in scraper.sent[1]
+    assert 'If-None-Match' not in scraper.sent[2]
+    assert scraper.http_cache.load(key)['etag'] == '"v2"'
+
+
+def test_temp_files_are_unique_per_process(scraper, monkeypatch):
+    written = []
+    monkeypatch.setattr(os, 'replace', lambda tmp, path: written.append(tmp))
+    scraper.http_cache._write(os.path.join(scraper.http_cache.directory, 'ab', 'entry.json'), b'{}')
+
+    assert f'.{os.getpid()}.' in written[0]
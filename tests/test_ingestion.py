@@ -0,0 +1,86 @@
+"""Bulk ingestion: one upsert per batch, price history for changes only, duplicate merging."""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from app import db
+from app.ingestion import ingest_products, merge_duplicate_products
+from app.models import CanonicalProduct, PriceHistory, Product, Store
+
+TERM = 'ingesttest'
+
+
+def scraped(name, price, unit='1L'):
+    return {'store': 'Tesco', 'product': name, 'price': price, 'unit': unit}
+
+
+@pytest.fixture
+def store_id(app):
+    with app.app_context():
+        yield Store.query.filter_by(name='Tesco').first().id
+        db.session.rollback()
+        ids = [product.id for product in Product.query.filter_by(search_term=TERM)]
+        PriceHistory.query.filter(PriceHistory.product_id.in_(ids)).delete()
+        Product.query.filter_by(search_term=TERM).delete()
+        CanonicalProduct.query.filter_by(search_term=TERM).delete()
+        db.session.commit()
+
+
+def history(name):
+    return [entry.price for entry in PriceHistory.query.join(Product).filter(
+        Product.name == name).order_by(PriceHistory.id)]
+
+
+def test_second_run_updates_rows_in_place_and_records_only_changes(store_id):
+    first = ingest_products(store_id, TERM, [scraped('Ingest Milk', 1.0), scraped('Ingest Bread', 2.0)])
+    ids = {product.name: product.id for product in Product.query.filter_by(search_term=TERM)}
+
+    second = ingest_products(store_id, TERM, [scraped('Ingest Milk', 1.2), scraped('Ingest Bread', 2.0),
+                                              scraped('Ingest Eggs', 3.0, '6 pack')])
+
+    assert (first['inserted'], first['updated']) == (2, 0)
+    assert (second['inserted'], second['updated'], second['price_changes']) == (1, 2, 1)
+    products = {product.name: product for product in Product.query.filter_by(search_term=TERM)}
+    assert {name: products[name].id for name in ids} == ids
+    assert products['Ingest Milk'].price == 1.2
+    assert (products['Ingest Eggs'].quantity, products['Ingest Eggs'].base_unit) == (6.0, 'each')
+    assert history('Ingest Milk') == [1.0, 1.2]
+    assert history('Ingest Bread') == [2.0]
+
+
+def test_invalid_and_repeated_products_in_a_result_set(store_id):
+    stats = ingest_products(store_id, TERM, [scraped('Ingest Milk', 1.0), scraped('Ingest Milk', 1.1),
+                                             scraped('Ingest Free', 0), scraped('', 2.0)])
+
+    assert (stats['inserted'], stats['rejected']) == (1, 2)
+    assert [(product.name, product.price) for product in Product.query.filter_by(search_term=TERM)] == [
+        ('Ingest Milk', 1.1)
+    ]
+
+
+def test_merge_keeps_the_newest_duplicate_and_moves_its_history(store_id):
+    now = datetime.utcnow()
+    # Duplicates can only exist in databases from before the unique index
+    db.session.execute(text('DROP INDEX uq_products_store_name'))
+    try:
+        old, new = (Product(name='Ingest Dup', store_id=store_id, price=price, unit='1L', search_term=TERM,
+                            last_updated=now - timedelta(days=age)) for price, age in ((1.0, 3), (1.5, 1)))
+        db.session.add_all([old, new])
+        db.session.flush()
+        db.session.add_all([PriceHistory(product_id=old.id, price=1.0, recorded_at=now - timedelta(days=3)),
+                            PriceHistory(product_id=new.id, price=1.5, recorded_at=now - timedelta(days=1))])
+        db.session.commit()
+        new_id = new.id
+
+        assert merge_duplicate_products() == 1
+    finally:
+        db.session.rollback()
+        db.session.execute(text(
+            'CREATE UNIQUE INDEX IF NOT EXISTS uq_products_store_name ON products (store_id, name)'
+        ))
+        db.session.commit()
+
+    db.session.expire_all()
+    assert [(product.id, product.price) for product in Product.query.filter_by(name='Ingest Dup')] == [(new_id, 1.5)]
+    assert history('Ingest Dup') == [1.0, 1.5]
@@ -0,0 +1,92 @@
+"""Cross-store matching: match keys, MinHash banding and canonical product assignment."""
+import pytest
+
+from app import db, matching
+from app.ingestion import ingest_products
+from app.matching import band_keys, key_tokens, minhash, shingles
+from app.models import CanonicalBand, CanonicalProduct, PriceHistory, Product, Store
+
+TERM = 'matchtest'
+
+
+def keys(name, quantity=1.0, base_unit='l'):
+    return set(band_keys(minhash(shingles(key_tokens(name))), quantity, base_unit))
+
+
+def test_match_keys_drop_store_names_sizes_and_filler():
+    assert key_tokens('Tesco Fresh Milk 1L') == key_tokens('SuperValu Fresh Milk 1 Litre') == 'fresh milk'
+    assert key_tokens('Dunnes Stores Pack of 6 Free Range Eggs') == 'eggs free range'
+
+
+def test_numpy_and_pure_python_signatures_agree(monkeypatch):
+    grams = shingles(key_tokens('Strawberry Greek Style Yoghurt'))
+    with_numpy = minhash(grams)
+    monkeypatch.setattr(matching, 'np', None)
+    assert minhash(grams) == with_numpy
+
+
+def test_similar_names_share_a_band_only_within_one_size():
+    assert keys('Greek Style Yoghurt') & keys('Greek Style Yogurt')
+    assert not keys('Greek Style Yoghurt') & keys('Greek Style Yoghurt', quantity=0.5)
+    assert not keys('Greek Style Yoghurt') & keys('Smoked Streaky Rashers')
+
+
+@pytest.fixture
+def stores(app):
+    with app.app_context():
+        yield {store.name: store.id for store in Store.query}
+        db.session.rollback()
+        ids = [product.id for product in Product.query.filter_by(search_term=TERM)]
+        canonical_ids = [canonical.id for canonical in CanonicalProduct.query.filter_by(search_term=TERM)]
+        PriceHistory.query.filter(PriceHistory.product_id.in_(ids)).delete()
+        Product.query.filter_by(search_term=TERM).delete()
+        CanonicalBand.query.filter(CanonicalBand.canonical_id.in_(canonical_ids)).delete()
+        CanonicalProduct.query.filter_by(search_term=TERM).delete()
+        db.session.commit()
+
+
+def ingest(stores, store_name, *names):
+    return ingest_products(stores[store_name], TERM, [
+        {'store': store_name, 'product': name, 'price': 1.0 + index, 'unit': size}
+        for index, (name, size) in enumerate(names)
+    ])
+
+
+def groups():
+    """Product names grouped by canonical product"""
+    grouped = {}
+    for product in Product.query.filter_by(search_term=TERM):
+        grouped.setdefault(product.canonical_id, set()).add(product.name)
+    return sorted(grouped.values(), key=sorted)
+
+
+def test_equivalent_products_from_different_stores_share_a_canonical_product(stores):
+    ingest(stores, 'Tesco', ('Tesco Greek Style Yoghurt', '500g'), ('Tesco Greek Style Yoghurt Tub', '1kg'))
+    ingest(stores, 'Aldi', ('Aldi Greek Style Yogurt', '500g'), ('Aldi Smoked Streaky Rashers', '500g'))
+    stats = ingest(stores, 'Lidl', ('Lidl Greek Style Yoghurt 500g', ''))
+
+    assert stats['matched'] == 1
+    assert groups() == [
+        {'Aldi Greek Style Yogurt', 'Lidl Greek Style Yoghurt 500g', 'Tesco Greek Style Yoghurt'},
+        {'Aldi Smoked Streaky Rashers'},
+        {'Tesco Greek Style Yoghurt Tub'},
+    ]
+    counts = {canonical.name: canonical.product_count
+              for canonical in CanonicalProduct.query.filter_by(search_term=TERM, quantity=0.5)}
+    assert counts == {'Greek Style Yoghurt': 3, 'Smoked Streaky Rashers': 1}
+
+
+def test_a_store_never_has_two_products_in_one_canonical_product(stores):
+    ingest(stores, 'Tesco', ('Tesco Greek Style Yoghurt', '500g'), ('Tesco Greek Style Yogurt', '500g'))
+
+    assert len(groups()) == 2
+
+
+def test_reingesting_keeps_assignments_and_counts(stores):
+    ingest(stores, 'Tesco', ('Tesco Greek Style Yoghurt', '500g'))
+    ingest(stores, 'Aldi', ('Aldi Greek Style Yogurt', '500g'))
+
+    stats = ingest(stores, 'Tesco', ('Tesco Greek Style Yoghurt', '500g'))
+
+    assert stats['matched'] == 0
+    assert [canonical.product_count for canonical in CanonicalProduct.query.filter_by(search_term=TERM)] == [2]
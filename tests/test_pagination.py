@@ -0,0 +1,88 @@
+"""Keyset pagination and NDJSON streaming of product listings."""
+import json
+
+import pytest
+
+from app import db
+from app.models import Product, Store
+from app.units import normalize
+
+CATEGORY = 'Paging Test'
+# Repeated prices make the id tie-breaker matter
+PRICES = [2.0, 1.0, 2.0, 3.0, 1.0, 2.0, 0.5, 3.0]
+SIZES = ['1L', '500g', '2L', 'assorted', '1kg', '6 pack', '250ml', '1L']
+
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        store_ids = [store.id for store in Store.query.order_by(Store.id)]
+        db.session.add_all(Product(
+            name=f'Paging {index}', store_id=store_ids[index % len(store_ids)], price=price, unit=size,
+            search_term='pagingtest', category=CATEGORY, is_active=True, **normalize(price, size)
+        ) for index, (price, size) in enumerate(zip(PRICES, SIZES)))
+        db.session.commit()
+    yield app.test_client()
+    with app.app_context():
+        Product.query.filter_by(category=CATEGORY).delete()
+        db.session.commit()
+
+
+def expected_order(app, key):
+    with app.app_context():
+        return [product.name for product in sorted(Product.query.filter_by(category=CATEGORY), key=key)]
+
+
+def walk(client, limit, **args):
+    names, cursor, pages = [], None, 0
+    while True:
+        query = {'limit': limit, **args, **({'cursor': cursor} if cursor else {})}
+        body = client.get(f'/api/products/category/{CATEGORY}', query_string=query).get_json()
+        names += [product['name'] for product in body['products']]
+        pages += 1
+        cursor = body['next_cursor']
+        if cursor is None:
+            return names, pages
+
+
+def test_pages_follow_price_then_id_without_gaps_or_repeats(app, client):
+    names, pages = walk(client, 3)
+
+    assert names == expected_order(app, lambda product: (product.price, product.id))
+    assert pages == 3
+
+
+def test_value_sort_groups_by_unit_and_skips_unknown_sizes(app, client):
+    names, _ = walk(client, 2, sort='value')
+
+    expected = expected_order(app, lambda product: (product.base_unit or '', product.price_per_unit or 0, product.id))
+    assert names == [name for name in expected if name != 'Paging 3']
+
+
+def test_a_page_is_not_shifted_by_rows_added_before_it(app, client):
+    first = client.get(f'/api/products/category/{CATEGORY}?limit=4').get_json()
+    with app.app_context():
+        db.session.add(Product(name='Paging cheap', store_id=Store.query.first().id, price=0.1, unit='1L',
+                               search_term='pagingtest', category=CATEGORY, is_active=True))
+        db.session.commit()
+
+    second = client.get(f'/api/products/category/{CATEGORY}?limit=4&cursor={first["next_cursor"]}').get_json()
+
+    seen = [product['name'] for product in first['products'] + second['products']]
+    assert 'Paging cheap' not in seen
+    assert len(set(seen)) == len(PRICES)
+
+
+@pytest.mark.parametrize('query', ['cursor=not-a-cursor', 'sort=name'])
+def test_bad_cursor_or_sort_is_a_client_error(client, query):
+    response = client.get(f'/api/products/category/{CATEGORY}?{query}')
+    assert response.status_code == 400
+
+
+def test_ndjson_streams_every_product_in_order(app, client):
+    response = client.get(f'/api/products/category/{CATEGORY}?format=ndjson')
+
+    assert response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert [json.loads(line)['name'] for line in lines] == expected_order(
+        app, lambda product: (product.price, product.id))
@@ -0,0 +1,63 @@
+"""Price history reads across the raw, daily and weekly retention tiers."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import PriceHistory, PriceHistoryRollup, Product, Store
+from app.timeseries import DAILY_DAYS, RAW_DAYS, get_price_history, rollup_price_history
+
+NOW = datetime(2026, 6, 10, 12, 0)
+# One change in each tier once the rollup has run
+WEEK_TIER = NOW - timedelta(days=DAILY_DAYS + 60)
+DAY_TIER = NOW - timedelta(days=RAW_DAYS + 30)
+RAW_TIER = NOW - timedelta(days=5)
+
+
+@pytest.fixture
+def product(app):
+    with app.app_context():
+        product = Product(name='History Test Milk', store_id=Store.query.first().id, price=2.0, unit='1L',
+                          search_term='milk')
+        db.session.add(product)
+        db.session.flush()
+        db.session.add_all([
+            PriceHistory(product_id=product.id, price=2.0, recorded_at=WEEK_TIER),
+            PriceHistory(product_id=product.id, price=1.8, recorded_at=WEEK_TIER + timedelta(hours=1)),
+            PriceHistory(product_id=product.id, price=2.2, recorded_at=DAY_TIER),
+            PriceHistory(product_id=product.id, price=2.4, recorded_at=RAW_TIER),
+        ])
+        db.session.commit()
+        rollup_price_history(NOW)
+        yield product
+        db.session.rollback()
+        PriceHistory.query.filter_by(product_id=product.id).delete()
+        PriceHistoryRollup.query.filter_by(product_id=product.id).delete()
+        db.session.delete(product)
+        db.session.commit()
+
+
+def test_rollup_leaves_one_tier_per_period(product):
+    tiers = {rollup.resolution: rollup for rollup in PriceHistoryRollup.query.filter_by(product_id=product.id)}
+    assert set(tiers) == {'day', 'week'}
+    assert (tiers['week'].min_price, tiers['week'].max_price, tiers['week'].close_price) == (1.8, 2.0, 1.8)
+    assert PriceHistory.query.filter_by(product_id=product.id).count() == 1
+
+
+def test_auto_reads_each_period_at_its_stored_resolution(product):
+    points = get_price_history(product.id, NOW - timedelta(days=DAILY_DAYS + 90), NOW)
+    assert [point['resolution'] for point in points] == ['week', 'day', 'raw']
+
+
+def test_day_resolution_falls_back_to_weeks_for_old_periods(product):
+    points = get_price_history(product.id, NOW - timedelta(days=DAILY_DAYS + 90), NOW, resolution='day')
+
+    assert [(point['resolution'], point['price']) for point in points] == [
+        ('week', 1.8), ('day', 2.2), ('day', 2.4)
+    ]
+    assert points[2]['recorded_at'] == RAW_TIER.replace(hour=0, minute=0).isoformat()
+
+
+def test_week_resolution_buckets_every_tier(product):
+    points = get_price_history(product.id, NOW - timedelta(days=DAILY_DAYS + 90), NOW, resolution='week')
+    assert [point['resolution'] for point in points] == ['week'] * 3
@@ -0,0 +1,67 @@
+"""Price summaries: refreshed in place by ingestion, and equal to a full rebuild."""
+import pytest
+
+from app import db
+from app.ingestion import ingest_products
+from app.models import PriceHistory, PriceSummary, Product, Store
+
+TERM = 'summarytest'
+CATEGORY = 'Summary Test'
+
+
+@pytest.fixture
+def stores(app):
+    with app.app_context():
+        PriceSummary.rebuild()
+        db.session.commit()
+        yield {store.name: store.id for store in Store.query}
+        db.session.rollback()
+        ids = [product.id for product in Product.query.filter_by(search_term=TERM)]
+        PriceHistory.query.filter(PriceHistory.product_id.in_(ids)).delete()
+        Product.query.filter_by(search_term=TERM).delete()
+        PriceSummary.rebuild()
+        db.session.commit()
+
+
+def ingest(store_name, store_id, *prices):
+    ingest_products(store_id, TERM, [{'store': store_name, 'product': f'Summary {store_name} {index}',
+                                      'price': price, 'category': CATEGORY} for index, price in enumerate(prices)])
+
+
+def snapshot():
+    return {(summary.scope, summary.key): (summary.product_count, summary.store_count, summary.min_price,
+                                           summary.max_price, round(summary.avg_price or 0, 6))
+            for summary in PriceSummary.query.populate_existing()}
+
+
+def test_refresh_aggregates_the_term_category_and_store(stores):
+    ingest('Tesco', stores['Tesco'], 1.0, 3.0)
+    ingest('Aldi', stores['Aldi'], 2.0)
+
+    term = PriceSummary.get('search_term', TERM).to_dict()
+    assert (term['product_count'], term['store_count']) == (3, 2)
+    assert term['price_range'] == {'min': 1.0, 'max': 3.0, 'avg': 2.0}
+    assert PriceSummary.get('store_term', f"{stores['Tesco']}:{TERM}").product_count == 2
+    assert PriceSummary.get('category', CATEGORY).product_count == 3
+
+
+def test_repeated_refreshes_update_the_same_rows(stores):
+    ingest('Tesco', stores['Tesco'], 1.0, 3.0)
+    rows = PriceSummary.query.count()
+
+    ingest('Tesco', stores['Tesco'], 2.0, 4.0)
+
+    assert PriceSummary.query.count() == rows
+    assert PriceSummary.query.filter_by(scope='search_term', key=TERM).count() == 1
+    assert PriceSummary.get('search_term', TERM).to_dict()['price_range'] == {'min': 2.0, 'max': 4.0, 'avg': 3.0}
+
+
+def test_incremental_refreshes_match_a_full_rebuild(stores):
+    ingest('Tesco', stores['Tesco'], 1.0, 3.0)
+    ingest('Lidl', stores['Lidl'], 0.5)
+    ingest('Tesco', stores['Tesco'], 1.5)
+    incremental = snapshot()
+
+    PriceSummary.rebuild()
+
+    assert snapshot() == incremental
@@ -0,0 +1,37 @@
+"""Product listings must cost the same number of queries whatever their size.
+
+Each endpoint is requested for a small and a large result set; a per-row
+lookup (the store of every product, say) would make the large one cost more.
+"""
+import pytest
+
+SMALL = 3
+LARGE = 20
+
+
+@pytest.fixture(scope='module')
+def client(app, add_products):
+    add_products(SMALL, 'Milk', category='Dairy', brand='Avonmore', promotion='3 for 2')
+    add_products(LARGE, 'Bread', category='Bakery', brand='Brennans', promotion='Half price')
+    return app.test_client()
+
+
+@pytest.mark.parametrize('small_url, large_url, key', [
+    ('/api/prices?product=milk', '/api/prices?product=bread', 'products'),
+    ('/search?q=milk', '/search?q=bread', 'products'),
+    (f'/api/trending?limit={SMALL}', f'/api/trending?limit={LARGE}', 'products'),
+    ('/api/products/category/Dairy', '/api/products/category/Bakery', 'products'),
+    ('/api/products/brand/Avonmore', '/api/products/brand/Brennans', 'products'),
+    (f'/api/products/promotions?limit={SMALL}', f'/api/products/promotions?limit={LARGE}', 'promotions'),
+])
+def test_query_count_does_not_grow_with_results(client, count_queries, small_url, large_url, key):
+    # One-off work (search backend detection, cache fallback) happens here
+    client.get(small_url)
+
+    small, small_queries = count_queries(lambda: client.get(small_url))
+    large, large_queries = count_queries(lambda: client.get(large_url))
+
+    assert small.status_code == large.status_code == 200
+    assert len(small.get_json()[key]) == SMALL
+    assert len(large.get_json()[key]) == LARGE
+    assert small_queries == large_queries
@@ -0,0 +1,70 @@
+"""Adaptive per-host token buckets: spacing, multiplicative decrease, additive recovery."""
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.scraper.rate_limit import HostRateLimiter, TokenBucket, parse_retry_after
+
+
+def test_queued_reservations_are_spaced_by_the_rate():
+    bucket = TokenBucket(rate=2.0, burst=1)
+    now = bucket.updated
+
+    assert [bucket.reserve(now) for _ in range(3)] == [0.0, 0.5, 1.0]
+    # Time spent since refills the bucket
+    assert bucket.reserve(now + 2.0) == pytest.approx(0.0)
+
+
+def test_concurrent_throttles_halve_the_rate_once_and_pause_for_retry_after():
+    bucket = TokenBucket(rate=4.0)
+    now = bucket.updated
+
+    bucket.throttled(now, retry_after=10.0)
+    bucket.throttled(now + 0.1)
+
+    assert bucket.rate == 2.0
+    assert bucket.epoch == 2
+    assert bucket.reserve(now + 1.0) >= 9.0
+
+
+def test_rate_never_drops_below_its_floor():
+    bucket = TokenBucket(rate=10.0)
+    for _ in range(20):
+        bucket.throttled(bucket.updated + 1.0)
+    assert bucket.rate == pytest.approx(10.0 * TokenBucket.MIN_RATE_FRACTION)
+
+
+@pytest.mark.parametrize('ceiling', [0.5, 2.0, 20.0])
+def test_halved_rate_recovers_in_about_the_same_time_for_any_ceiling(ceiling):
+    bucket = TokenBucket(rate=ceiling)
+    bucket.throttled(bucket.updated)
+
+    elapsed = 0.0
+    while bucket.rate < ceiling:
+        elapsed += 1 / bucket.rate
+        bucket.succeeded()
+
+    assert elapsed == pytest.approx(0.5 / TokenBucket.STEP_FRACTION, rel=0.25)
+
+
+def test_limiter_adapts_each_host_to_its_own_responses():
+    limiter = HostRateLimiter()
+    limiter.configure('a.test', 4.0)
+    limiter.configure('a.test', 100.0)
+    limiter.configure('b.test', 4.0)
+
+    limiter.feedback('a.test', 429)
+    limiter.feedback('b.test', 500)
+
+    assert limiter.rates() == {'a.test': 2.0, 'b.test': 4.0}
+    assert limiter.rate('c.test') is None
+
+
+def test_retry_after_accepts_seconds_and_http_dates():
+    later = datetime.now(timezone.utc) + timedelta(seconds=120)
+
+    assert parse_retry_after('30') == 30.0
+    assert parse_retry_after(format_datetime(later, usegmt=True)) == pytest.approx(120, abs=2)
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
@@ -0,0 +1,59 @@
+"""ScrapedProduct records and validate_batch."""
+import math
+
+import pytest
+
+from app.scraper.records import ScrapedProduct, as_records, validate_batch
+
+
+def record(name='Milk', price=1.5, unit='1L', url='https://shop.test/milk', image='https://shop.test/milk.jpg'):
+    return ScrapedProduct.create('Tesco', name, price, unit, url, image)
+
+
+def test_create_normalises_raw_scraped_values():
+    product = ScrapedProduct.create('Tesco', '  Milk 2L ', '2.5', ' 2L ', None, '', brand='', category='Dairy')
+
+    assert (product.name, product.price, product.unit, product.url) == ('Milk 2L', 2.5, '2L', '')
+    assert (product.brand, product.category) == (None, 'Dairy')
+    assert not hasattr(product, '__dict__')
+
+
+def test_dict_round_trip_keeps_every_field():
+    product = ScrapedProduct.create('Aldi', 'Eggs', 3.0, '12 pack', 'https://aldi.test/eggs', '',
+                                    brand='Farm', promotion='2 for 5')
+
+    assert as_records([product.to_dict(), product]) == [product, product]
+    assert 'category' not in product.to_dict()
+
+
+@pytest.mark.parametrize('bad', [
+    record(name=''),
+    record(price=0),
+    record(price=-1.0),
+    record(price=math.inf),
+    record(price=math.nan),
+])
+def test_products_without_a_name_or_usable_price_are_rejected(bad):
+    good = record()
+    valid, rejected = validate_batch([good, bad])
+
+    assert len(valid) == 1 and valid[0] is good
+    # NaN prices never compare equal, so check identity
+    assert len(rejected) == 1 and rejected[0] is bad
+
+
+def test_valid_products_get_sizes_and_unit_prices():
+    valid, _ = validate_batch([record(), record(name='Beans', price=2.0, unit='4 x 400g'),
+                               record(name='Eggs 12pk', price=3.0, unit='each'),
+                               record(name='Hamper', price=30.0, unit='assorted')])
+
+    assert [(product.quantity, product.base_unit, product.price_per_unit) for product in valid] == [
+        (1.0, 'l', 1.5), (1.6, 'kg', 1.25), (12.0, 'each', 0.25), (None, None, None)
+    ]
+
+
+def test_bad_urls_are_cleared_not_rejected():
+    valid, rejected = validate_batch([record(url='/product/milk', image='javascript:void(0)')])
+
+    assert not rejected
+    assert (valid[0].url, valid[0].image) == ('', '')
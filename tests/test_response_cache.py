@@ -0,0 +1,72 @@
+"""Response cache: hits on normalized keys, invalidation by data generation, Redis fallback."""
+import pytest
+
+from app import cache, db
+from app.cache import LRUCache
+from app.ingestion import save_scrape_results
+from app.models import PriceHistory, Product, Store
+
+TERM = 'cachetest'
+
+
+@pytest.fixture
+def client(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'CACHE_ENABLED', True)
+    monkeypatch.setattr(cache, '_redis', None)
+    monkeypatch.setattr(cache, '_redis_url', None)
+    monkeypatch.setattr(cache, 'local', LRUCache())
+    yield app.test_client()
+    with app.app_context():
+        ids = [product.id for product in Product.query.filter_by(search_term=TERM)]
+        PriceHistory.query.filter(PriceHistory.product_id.in_(ids)).delete()
+        Product.query.filter_by(search_term=TERM).delete()
+        db.session.commit()
+
+
+def ingest(app, *products):
+    with app.app_context():
+        store = Store.query.filter_by(name='Dunnes').first()
+        save_scrape_results(store, TERM, [{'store': 'Dunnes', 'product': name, 'price': price, 'unit': '1kg'}
+                                    for name, price in products])
+
+
+def prices(client, query):
+    response = client.get(f'/api/prices?product={query}')
+    return response.headers['X-Cache'], [product['price'] for product in response.get_json()['products']]
+
+
+def test_repeated_and_equivalent_requests_hit(app, client):
+    ingest(app, ('Cachetest Flour', 1.5))
+
+    assert prices(client, 'cachetest') == ('MISS', [1.5])
+    assert prices(client, 'cachetest') == ('HIT', [1.5])
+    assert prices(client, '%20CacheTest%20') == ('HIT', [1.5])
+    assert cache.stats()['backend'] == 'local'
+
+
+def test_ingestion_bumps_the_generation_and_drops_cached_responses(app, client):
+    ingest(app, ('Cachetest Flour', 1.5))
+    prices(client, 'cachetest')
+    generation = cache.generation()
+
+    ingest(app, ('Cachetest Flour', 1.2), ('Cachetest Sugar', 2.0))
+
+    assert cache.generation() > generation
+    assert prices(client, 'cachetest') == ('MISS', [1.2, 2.0])
+    assert prices(client, 'cachetest') == ('HIT', [1.2, 2.0])
+
+
+def test_failing_redis_falls_back_to_the_local_cache(app, client, monkeypatch):
+    class DownRedis:
+        def __getattr__(self, name):
+            def fail(*args, **kwargs):
+                raise ConnectionError('Redis is down')
+            return fail
+
+    ingest(app, ('Cachetest Flour', 1.5))
+    monkeypatch.setattr(cache, '_redis', DownRedis())
+    monkeypatch.setattr(cache, '_redis_down_until', 0.0)
+
+    assert prices(client, 'cachetest') == ('MISS', [1.5])
+    assert prices(client, 'cachetest') == ('HIT', [1.5])
+    assert cache.backend == 'local'
@@ -0,0 +1,92 @@
+"""Scheduler jobs are fenced: a replica that loses the lock stops, and cannot
+overwrite the run of the leader that took the job over."""
+from datetime import datetime, timedelta
+import threading
+import time
+
+from app import db
+from app.leader import JobLease
+from app.models import SchedulerState
+from app.models.scheduler_state import HEARTBEAT_STALE
+from app.scraper.engine import ScrapeEngine
+
+INTERVAL = timedelta(hours=6)
+TIMEOUT = timedelta(hours=12)
+
+
+class Election:
+    def __init__(self, identity):
+        self.identity = identity
+        self.is_leader = True
+
+
+def start(job_id, election):
+    state = SchedulerState.get(job_id)
+    state.start(election.identity)
+    db.session.commit()
+    return JobLease(election, job_id, state.fence)
+
+
+def test_live_foreign_run_is_not_taken_over(app):
+    with app.app_context():
+        start('lease-live', Election('old'))
+        due, reason = SchedulerState.get('lease-live').due(INTERVAL, TIMEOUT, 'new')
+        assert not due
+        assert 'already running on old' in reason
+
+
+def test_run_with_stale_heartbeat_is_taken_over_and_fenced(app):
+    with app.app_context():
+        old = start('lease-stale', Election('old'))
+        state = SchedulerState.get('lease-stale')
+        state.heartbeat_at = datetime.utcnow() - HEARTBEAT_STALE - timedelta(seconds=1)
+        db.session.commit()
+        assert state.due(INTERVAL, TIMEOUT, 'new') == (True, None)
+
+        new = start('lease-stale', Election('new'))
+        assert new.fence == old.fence + 1
+        # The old leader's late writes are refused and it stops
+        assert not old.confirm()
+        db.session.rollback()
+        assert not old.active()
+        assert new.confirm()
+        db.session.commit()
+
+
+def test_lease_is_inactive_once_the_lock_is_lost(app):
+    with app.app_context():
+        election = Election('leader')
+        lease = start('lease-lock', election)
+        assert lease.confirm()
+        election.is_leader = False
+        assert not lease.active()
+        assert not lease.confirm()
+        db.session.rollback()
+
+
+class Scraper:
+    def __init__(self):
+        self.calls = []
+
+    def search_products(self, term):
+        self.calls.append(term)
+        time.sleep(0.01)
+        return [{'term': term}]
+
+
+def test_engine_stops_between_pairs_when_told_to():
+    scraper = Scraper()
+    engine = ScrapeEngine({'Tesco': scraper}, concurrency={'*': 1})
+    saved = []
+    keep_going = threading.Event()
+    keep_going.set()
+
+    def on_result(store_name, term, products, seconds):
+        saved.append(term)
+        if len(saved) == 2:
+            keep_going.clear()
+
+    engine.run_pairs([('Tesco', f'term{index}') for index in range(50)], on_result,
+                     should_continue=keep_going.is_set)
+    assert len(saved) == 2
+    assert len(scraper.calls) < 50
@@ -0,0 +1,88 @@
+"""Cycle resume and requeue: only jobs that are really lost run again."""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import ScrapeCycle, ScrapeJob
+from app.scraper.engine import ScrapeEngine
+
+PAIRS = [('Tesco', 'milk'), ('Aldi', 'milk'), ('Tesco', 'bread'), ('Aldi', 'bread'), ('Lidl', 'eggs')]
+STALE = timedelta(minutes=60)
+QUEUE_TIMEOUT = timedelta(hours=24)
+
+
+@pytest.fixture
+def cycle(app):
+    with app.app_context():
+        cycle, resumed = ScrapeCycle.resume_or_start(lambda: PAIRS, 'leader')
+        assert not resumed
+        yield cycle
+        db.session.rollback()
+        ScrapeJob.query.delete()
+        ScrapeCycle.query.delete()
+        db.session.commit()
+
+
+def set_job(cycle, pair, **values):
+    ScrapeJob.query.filter_by(cycle_id=cycle.id, store_name=pair[0], search_term=pair[1]).update(values)
+    db.session.commit()
+
+
+def test_unfinished_cycle_resumes_with_only_its_open_jobs(cycle):
+    set_job(cycle, PAIRS[0], status='done')
+    set_job(cycle, PAIRS[1], status='failed')
+
+    resumed, was_resumed = ScrapeCycle.resume_or_start(lambda: pytest.fail('a resumed cycle is not replanned'), 'next')
+    assert was_resumed and resumed.id == cycle.id
+    assert resumed.resumed_count == 1
+    assert resumed.pending_pairs() == PAIRS[2:]
+
+    assert cycle.requeue(statuses=('failed',)) == 1
+    assert resumed.pending_pairs() == [PAIRS[1]] + PAIRS[2:]
+
+
+def test_requeue_waits_for_the_queue_timeout_on_queued_jobs(cycle):
+    now = datetime.utcnow()
+    cycle.mark_queued(PAIRS)
+    # Waiting in a long broker queue: left alone
+    set_job(cycle, PAIRS[0], queued_at=now - 2 * STALE)
+    # Started by a worker that went silent: sent again
+    set_job(cycle, PAIRS[1], status='running', queued_at=now - 3 * STALE, started_at=now - 2 * STALE)
+    # Running but recently started: left alone
+    set_job(cycle, PAIRS[2], status='running', queued_at=now - 3 * STALE, started_at=now)
+    # Queued for longer than any broker backlog: sent again
+    set_job(cycle, PAIRS[3], queued_at=now - QUEUE_TIMEOUT - STALE)
+    set_job(cycle, PAIRS[4], status='failed')
+
+    assert cycle.requeue(statuses=('failed',), stale_after=STALE, queued_after=QUEUE_TIMEOUT) == 3
+    assert set(cycle.pending_pairs()) == {PAIRS[1], PAIRS[3], PAIRS[4]}
+
+
+def test_started_jobs_count_their_staleness_from_the_start(cycle):
+    cycle.mark_queued(PAIRS[:1])
+    set_job(cycle, PAIRS[0], queued_at=datetime.utcnow() - 2 * STALE)
+    job = ScrapeJob.mark_started(cycle.id, *PAIRS[0])
+    db.session.commit()
+    assert job.status == 'running' and job.attempts == 1
+
+    assert cycle.requeue(statuses=(), stale_after=STALE, queued_after=QUEUE_TIMEOUT) == 0
+    job.finish(3, seconds=1.5)
+    db.session.commit()
+    assert job.status == 'done' and job.started_at < job.finished_at
+
+
+class Scraper:
+    def search_products(self, term):
+        return [term]
+
+
+def test_engine_reports_each_start_before_its_result():
+    events = []
+    engine = ScrapeEngine({'Tesco': Scraper(), 'Aldi': Scraper()}, concurrency={'*': 2})
+    engine.run_pairs(PAIRS[:4], lambda store, term, products, seconds: events.append(('result', store, term)),
+                     on_start=lambda store, term: events.append(('start', store, term)))
+
+    assert len(events) == 8
+    for pair in PAIRS[:4]:
+        assert events.index(('start',) + pair) < events.index(('result',) + pair)
@@ -0,0 +1,65 @@
+"""Product search: the FTS5 index, its triggers, ranking and the LIKE fallback."""
+import pytest
+
+from app import db, search
+from app.models import Product, Store
+
+TERM = 'searchtest'
+PRODUCTS = [
+    # name, brand, price
+    ('Zesta Semi Skimmed Milk 1L', 'Zesta', 1.20),
+    ('Zesta Whole Milk 2L', 'Zesta', 2.10),
+    ('Quorvo Crème Fraîche 200ml', 'Quorvo', 1.50),
+    ('Quorvo Oat Drink 1L', 'Zesta Farms', 0.90),
+]
+
+
+@pytest.fixture
+def products(app):
+    with app.app_context():
+        store_id = Store.query.filter_by(name='Lidl').first().id
+        rows = [Product(name=name, brand=brand, price=price, store_id=store_id, unit='1L', search_term=TERM)
+                for name, brand, price in PRODUCTS]
+        db.session.add_all(rows)
+        db.session.commit()
+        yield rows
+        db.session.rollback()
+        Product.query.filter_by(search_term=TERM).delete()
+        db.session.commit()
+
+
+def names(query):
+    return [product.name for product in Product.search_products(query)]
+
+
+def test_sqlite_uses_the_fts5_index(products):
+    assert search.search_backend() == 'fts5'
+
+
+def test_every_token_matches_as_a_prefix(products):
+    assert names('zesta semi skim') == ['Zesta Semi Skimmed Milk 1L']
+    assert names('quorvo creme') == ['Quorvo Crème Fraîche 200ml']
+    assert names('zesta nosuchword') == []
+    assert names('  ') == []
+
+
+def test_name_matches_rank_above_cheaper_brand_only_matches(products):
+    # The oat drink is cheapest, but only its brand says Zesta
+    found = names('zesta')
+    assert set(found[:2]) == {'Zesta Semi Skimmed Milk 1L', 'Zesta Whole Milk 2L'}
+    assert found[2:] == ['Quorvo Oat Drink 1L']
+
+
+def test_index_follows_renames_deactivation_and_deletes(products):
+    products[0].name = 'Zesta Lactose Free Milk 1L'
+    products[1].is_active = False
+    db.session.delete(products[3])
+    db.session.commit()
+
+    assert names('zesta') == ['Zesta Lactose Free Milk 1L']
+    assert names('skimmed') == []
+
+
+def test_like_fallback_finds_the_same_products(products, monkeypatch):
+    monkeypatch.setitem(search._backends, str(db.engine.url), 'like')
+    assert set(names('zesta milk')) == {'Zesta Semi Skimmed Milk 1L', 'Zesta Whole Milk 2L'}
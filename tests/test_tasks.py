@@ -0,0 +1,106 @@
+"""Celery scrape pipeline: eager end-to-end runs and one process per store queue."""
+from types import SimpleNamespace
+
+import pytest
+from celery import Celery
+
+from app import db, tasks
+from app.models import PriceHistory, Product, ScrapeCycle, ScrapeJob
+from app.scraper.records import ScrapedProduct
+
+TERM = 'eagertest'
+PAIRS = [('Tesco', TERM), ('Aldi', TERM)]
+
+
+class FakeScraper:
+    def __init__(self, store_name):
+        self.store_name = store_name
+
+    def search_products(self, query):
+        return [ScrapedProduct.create(self.store_name, f'{self.store_name} {query} {size}', price, size)
+                for size, price in (('1L', 1.5), ('2L', 2.5))]
+
+
+@pytest.fixture
+def eager(app, monkeypatch):
+    monkeypatch.setitem(tasks.celery.conf, 'task_always_eager', True)
+    monkeypatch.setattr(tasks, '_app', app)
+    monkeypatch.setattr(tasks, '_scrapers', {store_name: FakeScraper(store_name) for store_name, _ in PAIRS})
+    yield
+    with app.app_context():
+        ids = [product.id for product in Product.query.filter_by(search_term=TERM)]
+        PriceHistory.query.filter(PriceHistory.product_id.in_(ids)).delete()
+        Product.query.filter_by(search_term=TERM).delete()
+        ScrapeJob.query.delete()
+        ScrapeCycle.query.delete()
+        db.session.commit()
+
+
+def test_enqueue_pairs_scrapes_and_ingests_every_pair(app, eager):
+    with app.app_context():
+        cycle, _ = ScrapeCycle.resume_or_start(lambda: PAIRS, 'test')
+        cycle.mark_queued(PAIRS)
+        cycle_id = cycle.id
+
+    assert tasks.enqueue_pairs(PAIRS, cycle_id) == PAIRS
+
+    with app.app_context():
+        products = Product.query.filter_by(search_term=TERM).all()
+        assert sorted((product.store.name, product.price) for product in products) == [
+            ('Aldi', 1.5), ('Aldi', 2.5), ('Tesco', 1.5), ('Tesco', 2.5)
+        ]
+        jobs = ScrapeJob.query.filter_by(cycle_id=cycle_id).all()
+        assert [(job.status, job.attempts, job.item_count) for job in jobs] == [('done', 1, 2)] * 2
+        assert all(job.duration is not None for job in jobs)
+        assert db.session.get(ScrapeCycle, cycle_id).status == 'finished'
+
+
+def test_rerun_of_a_pair_updates_rather_than_duplicates(app, eager):
+    tasks.enqueue_pairs(PAIRS)
+    tasks.enqueue_pairs(PAIRS)
+
+    with app.app_context():
+        assert Product.query.filter_by(search_term=TERM).count() == 4
+
+
+def fake_worker(queues, pool='prefork', concurrency=1):
+    celery = Celery('test')
+    celery.amqp.queues.select(queues)
+    return SimpleNamespace(app=celery, pool_cls=pool, concurrency=concurrency, hostname='test@worker')
+
+
+@pytest.mark.parametrize('queues, pool, concurrency', [
+    (['scrape.tesco'], 'prefork', 1),
+    (['scrape.tesco', 'scrape.aldi'], 'threads', 8),
+    (['ingest'], 'prefork', 8),
+])
+def test_single_process_workers_may_consume_scrape_queues(queues, pool, concurrency):
+    tasks.check_scrape_pool(fake_worker(queues, pool, concurrency))
+
+
+def test_prefork_worker_with_several_children_refuses_scrape_queues():
+    with pytest.raises(SystemExit, match='scrape.tesco'):
+        tasks.check_scrape_pool(fake_worker(['scrape.tesco', 'ingest'], 'prefork', 4))
+
+
+def test_second_worker_stands_by_on_a_claimed_queue(app, monkeypatch, tmp_path):
+    monkeypatch.setenv('SCHEDULER_LOCK', 'file')
+    monkeypatch.setenv('SCHEDULER_LOCK_FILE', str(tmp_path / 'queue.lock'))
+    monkeypatch.setattr(tasks, '_app', app)
+    first = fake_worker(['scrape.tesco', 'scrape.aldi', 'ingest'])
+    second = fake_worker(['scrape.tesco', 'ingest'])
+
+    tasks.claim_scrape_queues(first)
+    claimed = dict(tasks._queue_elections)
+    tasks._queue_elections.clear()
+    try:
+        tasks.claim_scrape_queues(second)
+
+        assert set(first.app.amqp.queues.consume_from) == {'scrape.tesco', 'scrape.aldi', 'ingest'}
+        assert set(second.app.amqp.queues.consume_from) == {'ingest'}
+        assert claimed['scrape.tesco'].is_leader
+        assert not tasks._queue_elections['scrape.tesco'].is_leader
+    finally:
+        tasks.release_scrape_queues()
+        tasks._queue_elections.update(claimed)
+        tasks.release_scrape_queues()
@@ -0,0 +1,51 @@
+"""Pack-size parsing: separators, multipacks and sizes found in product names."""
+import pytest
+
+from app.units import normalize, parse_quantity, parse_unit, unit_prices
+
+
+@pytest.mark.parametrize('size, expected', [
+    ('1L', (1.0, 'l')),
+    ('500ml', (0.5, 'l')),
+    ('1.5kg', (1.5, 'kg')),
+    ('1,5kg', (1.5, 'kg')),
+    ('1,000g', (1.0, 'kg')),
+    ('2,500.5g', (2.5005, 'kg')),
+    ('4 x 330ml', (1.32, 'l')),
+    ('330ml x 4', (1.32, 'l')),
+    ('4pk 500ml', (2.0, 'l')),
+    ('6 pack of 330ml', (1.98, 'l')),
+    ('500ml 4pk', (2.0, 'l')),
+    ('12 pack', (12.0, 'each')),
+    ('pack of 4', (4.0, 'each')),
+    ('half dozen', (6.0, 'each')),
+    ('per kg', (1.0, 'kg')),
+    ('', (1.0, 'each')),
+    ('assorted', (None, None)),
+])
+def test_parse_unit(size, expected):
+    assert parse_unit(size) == expected
+
+
+@pytest.mark.parametrize('size, name, expected', [
+    ('each', 'Milk 2L', (2.0, 'l')),
+    ('', 'Eggs 12pk', (12.0, 'each')),
+    (None, 'Free Range Eggs 6 pack', (6.0, 'each')),
+    ('', 'Sliced Pan', (1.0, 'each')),
+    ('500g', 'Butter 1kg', (0.5, 'kg')),
+])
+def test_parse_quantity_falls_back_to_the_name(size, name, expected):
+    assert parse_quantity(size, name) == expected
+
+
+def test_unit_prices_matches_normalize():
+    prices = [3.0, 2.0, 1.5, 4.0]
+    sizes = ['', 'each', '1,000g', 'assorted']
+    names = ['Eggs 12pk', 'Milk 2L', 'Flour', 'Mystery box']
+
+    quantities, base_units, per_unit = unit_prices(prices, sizes, names)
+
+    expected = [normalize(*row) for row in zip(prices, sizes, names)]
+    assert quantities == [row['quantity'] for row in expected]
+    assert base_units == [row['base_unit'] for row in expected]
+    assert per_unit == pytest.approx([row['price_per_unit'] for row in expected])